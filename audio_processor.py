@@ -1,188 +1,575 @@
+import gc
 import numpy as np
-from scipy import signal
 from collections import deque
+from callback_stats import CallbackStats
+from effects import (Equalizer, Echo, Reverb, PitchShift,
+                     Distortion, Compressor, Gain, EFFECTS, FILTER_CACHE, Scratch,
+                     compile_chain)
+
+def pause_gc(mode='freeze'):
+    """Aparta el GC cíclico del hilo de audio mientras dura el stream.
+    
+    'freeze' hace una recolección y congela los objetos existentes (las
+    pasadas del GC ya no los recorren); 'disable' además lo desactiva hasta
+    resume_gc(). Con None no hace nada.
+    """
+    if mode is None:
+        return
+    gc.collect()
+    gc.freeze()
+    if mode == 'disable':
+        gc.disable()
+
+
+def resume_gc(mode='freeze'):
+    """Deshace pause_gc() al parar el stream"""
+    if mode is None:
+        return
+    gc.enable()
+    gc.unfreeze()
+
+
+class ProcessingPlan:
+    """Cadena compilada, lista para que el hilo de audio la ejecute.
+    
+    La cadena es una lista en orden topológico. Cada entrada puede llevar
+    'inputs' (ids de entradas anteriores, None = señal de entrada); sin
+    'inputs' toma la salida de la entrada anterior, así que las cadenas
+    serie de siempre siguen valiendo. Si una entrada tiene varias fuentes
+    se mezclan (media) en un buffer de mezcla; si alimenta a varias, las
+    ramas comparten su salida sin copias. La salida del plan es lo que llega
+    a los nodos 'output' o, si no hay, la mezcla de las hojas.
+    
+    Los buffers de mezcla se asignan por vivacidad: uno se reutiliza en
+    cuanto ningún valor vivo puede apuntar a él (un efecto puede devolver
+    su propia entrada, así que su salida cuenta como alias de ella).
+    
+    Los bloques son (muestras, canales); los nodos deben estar compilados
+    con el mismo número de canales que el plan.
+    """
+    
+    def __init__(self, chain, nodes, crossfade=0, channels=1):
+        self.chain = chain
+        self.nodes = nodes
+        self.channels = channels
+        # Nodos direccionables por id del editor (para set_param)
+        self.by_id = {node.id: node for node in nodes if node.id is not None}
+        # Rampa de entrada (sin²) para el fundido desde el plan anterior, una
+        # columna por canal para aplicarla sin difundir
+        fade = np.sin(0.5 * np.pi * np.arange(1, crossfade + 1) / crossfade) ** 2
+        self.fade = np.tile(fade[:, np.newaxis], (1, channels)).astype(np.float32)
+        
+        self._compile()
+        
+        self._values = [None] * self._n_values
+        self._capacity = 0
+        self._buffers = []
+    
+    def _compile(self):
+        """Orden de ejecución, puntos de mezcla y asignación de buffers"""
+        remaining = iter(self.nodes)
+        positions = {}       # id del editor -> valor que produce
+        steps = []           # (nodo o None, valores de entrada)
+        consumed = set()
+        outputs = []
+        
+        for effect in self.chain:
+            if 'inputs' in effect:
+                sources = []
+                for input_id in effect['inputs']:
+                    if input_id is None:
+                        sources.append(0)
+                    elif input_id in positions:
+                        sources.append(positions[input_id])
+                    else:
+                        raise ValueError(f"'{input_id}' no es una entrada anterior: "
+                                         "la cadena no está en orden topológico")
+                sources = sources or [0]
+            else:
+                sources = [len(steps)]  # valor de la entrada anterior
+            
+            node = next(remaining) if effect['type'] in EFFECTS else None
+            steps.append((node, tuple(sources)))
+            consumed.update(sources)
+            value = len(steps)
+            if effect.get('id') is not None:
+                positions[effect['id']] = value
+            if effect['type'] == 'output':
+                outputs.append(value)
+        
+        # Tipos de nodo, parámetros estructurales y conexiones: si coincide con
+        # el plan activo se hereda el estado
+        self.structure = tuple((type(node), node.layout if node is not None else (), sources)
+                               for node, sources in steps)
+        
+        # Sumidero: los nodos de salida o, si no hay, las hojas
+        sinks = outputs or [value for value in range(1, len(steps) + 1) if value not in consumed]
+        if len(sinks) > 1:
+            steps.append((None, tuple(sinks)))
+        output = len(steps) if len(sinks) > 1 else (sinks[0] if sinks else 0)
+        
+        # Último paso en que se lee cada valor (la salida vive hasta el final)
+        last_use = {output: len(steps)}
+        for index, (_, sources) in enumerate(steps):
+            for source in sources:
+                last_use[source] = max(last_use.get(source, -1), index)
+        
+        # Vivacidad: los valores comparten huecos y los buffers de mezcla se
+        # reciclan cuando ningún valor vivo puede apuntar a ellos
+        free_slots, free_buffers = [], []
+        slot_of = {0: 0}
+        n_slots = 1
+        aliases = {0: ()}   # buffers a los que puede apuntar cada valor
+        alive = {}          # buffer -> valores vivos que pueden apuntar a él
+        n_buffers = 0
+        schedule = []
+        latency = {0: 0}
+        
+        for index, (node, sources) in enumerate(steps):
+            value = index + 1
+            buffer = None
+            if len(sources) > 1:
+                if free_buffers:
+                    buffer = free_buffers.pop()
+                else:
+                    buffer = n_buffers
+                    n_buffers += 1
+                aliases[value] = (buffer,)
+            else:
+                aliases[value] = aliases[sources[0]]
+            
+            if value in last_use:
+                for aliased in aliases[value]:
+                    alive.setdefault(aliased, set()).add(value)
+            
+            # Liberar lo que ya no se lee después de este paso
+            for source in set(sources):
+                if last_use[source] == index:
+                    free_slots.append(slot_of[source])
+                    for aliased in aliases[source]:
+                        alive[aliased].discard(source)
+                        if not alive[aliased]:
+                            free_buffers.append(aliased)
+            if value in last_use:
+                if free_slots:
+                    slot_of[value] = free_slots.pop()
+                else:
+                    slot_of[value] = n_slots
+                    n_slots += 1
+            elif buffer is not None:
+                free_buffers.append(buffer)  # salida sin lectores
+            
+            schedule.append((node.process_block if node is not None else None,
+                             tuple(slot_of[source] for source in sources),
+                             slot_of.get(value, n_slots), buffer))
+            latency[value] = (node.latency if node is not None else 0) + \
+                max(latency[source] for source in sources)
+        
+        # Un valor sin lectores se escribe en un hueco extra que nadie lee
+        self._n_values = n_slots + 1
+        self._n_buffers = n_buffers
+        self.schedule = schedule
+        self.output = slot_of[output]
+        # Latencia algorítmica del camino más largo hasta la salida
+        self.latency = latency[output]
+    
+    def _allocate(self, n):
+        """Reserva los buffers de mezcla (solo cuando crece el bloque)"""
+        self._capacity = n
+        self._buffers = [np.zeros((n, self.channels), dtype=np.float32)
+                         for _ in range(self._n_buffers)]
+    
+    def run(self, audio):
+        """Ejecuta el plan sobre un bloque float32 (muestras, canales)"""
+        values = self._values
+        values[0] = audio
+        n = len(audio)
+        if n > self._capacity:
+            self._allocate(n)
+        
+        for step, sources, target, buffer in self.schedule:
+            if buffer is None:
+                x = values[sources[0]]
+            else:
+                # Punto de mezcla: media de las ramas
+                x = self._buffers[buffer][:n]
+                np.add(values[sources[0]], values[sources[1]], out=x)
+                for source in sources[2:]:
+                    np.add(x, values[source], out=x)
+                x *= 1.0 / len(sources)
+            values[target] = x if step is None else step(x)
+        return values[self.output]
+    
+    def prime(self, n):
+        """Reserva de antemano lo que necesita un bloque de n muestras.
+        
+        Procesa un bloque de silencio: se reservan los buffers de mezcla y
+        el scratch de cada nodo (también el de objetos internos, como líneas
+        de retardo y sobremuestreadores, así que no se llama a reset), y el
+        primer bloque del plan en el hilo de audio ya no crea arrays. Con
+        silencio los nodos quedan como recién creados, salvo las posiciones
+        de lectura/escritura. También se reservan los buffers de las rampas
+        (set_param, cambio con la misma estructura).
+        """
+        for node in self.nodes:
+            node.reserve(n)
+        self.run(np.zeros((n, self.channels), dtype=np.float32))
+
 
 class AudioProcessor:
-    """Procesa audio aplicando una cadena de efectos"""
+    """Procesa audio aplicando una cadena de efectos.
+    
+    set_chain compila un plan nuevo (sin tocar los nodos en uso) y lo publica
+    con una sola asignación de referencia; el hilo de audio lo recoge al
+    inicio del siguiente bloque. Si la estructura es la misma (solo cambian
+    parámetros) el plan nuevo hereda el estado y los valores del activo y
+    llega a los suyos con las rampas de set_param; si no, se hace un
+    fundido corto entre ambos. No hay locks en el camino de audio.
+    
+    set_param cambia un solo parámetro sin recompilar: el cambio viaja en
+    una cola y el nodo lo alcanza con una rampa dentro del DSP.
     
-    def __init__(self, sample_rate=44100):
+    Procesa `channels` canales a la vez: cada efecto trabaja sobre el bloque
+    (muestras, canales) completo, con estado independiente por canal.
+    block_size es el bloque del stream si se conoce: lo que depende de él
+    (la partición automática de las convoluciones) se compila para ese
+    tamaño, aunque cualquier bloque sigue funcionando.
+    """
+    
+    def __init__(self, sample_rate=44100, crossfade=0.02, channels=1, block_size=None):
         self.sample_rate = sample_rate
+        self.crossfade = crossfade  # segundos de fundido en cambios de estructura
+        self.channels = channels
+        self.block_size = block_size
         self.chain = []
         
-        # Buffers para efectos con memoria
-        self.echo_buffer = deque(maxlen=int(sample_rate * 2))  # 2 segundos max
-        self.reverb_buffer = deque(maxlen=int(sample_rate * 1))  # 1 segundo
+        empty = ProcessingPlan([], [], channels=channels)
+        self._published = empty  # último plan compilado (escribe cualquier hilo)
+        self._active = empty     # plan en uso (solo el hilo de audio)
+        self._fading = None      # plan saliente durante un fundido
+        self._fade_pos = 0
         
-    def set_chain(self, chain):
-        """Establece la cadena de procesamiento"""
-        self.chain = chain
+        # Cambios de parámetros pendientes (GUI -> audio) y nodos en rampa
+        self._param_updates = deque()
+        self._smoothing = []
         
-    def process(self, audio_data):
-        """Procesa el audio a través de la cadena de efectos"""
-        if len(audio_data) == 0:
-            return audio_data
+        # Salud del callback (lo alimenta el hilo de audio de la app)
+        self.stats = CallbackStats(sample_rate)
         
-        audio = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32)
+        # Buffers del fundido y del adaptador int16
+        self.scratch = Scratch(channels)
         
-        for effect in self.chain:
-            effect_type = effect['type']
-            params = effect['params']
-            
-            if effect_type == 'equalizer':
-                audio = self.apply_equalizer(audio, params)
-            elif effect_type == 'echo':
-                audio = self.apply_echo(audio, params)
-            elif effect_type == 'reverb':
-                audio = self.apply_reverb(audio, params)
-            elif effect_type == 'pitch':
-                audio = self.apply_pitch(audio, params)
-            elif effect_type == 'distortion':
-                audio = self.apply_distortion(audio, params)
-            elif effect_type == 'compressor':
-                audio = self.apply_compressor(audio, params)
-            elif effect_type == 'gain':
-                audio = self.apply_gain(audio, params)
-        
-        # Normalizar y convertir de vuelta
-        audio = np.clip(audio, -32768, 32767).astype(np.int16)
-        return audio.tobytes()
+        # Nodos de los apply_* (tipo de efecto -> nodo con su estado)
+        self._effect_nodes = {}
+        
+    def set_chain(self, chain, crossfade=None):
+        """Compila la cadena y la publica para el hilo de audio.
+        
+        Puede llamarse desde cualquier hilo: el diseño de filtros y la reserva
+        de buffers ocurren aquí, nunca dentro del callback (las rampas de
+        set_param también se diseñan en el hilo que las pide). Con block_size
+        conocido el plan se ceba para ese bloque (ProcessingPlan.prime).
+        """
+        plan = self.compile_plan(chain, crossfade)
+        if self.block_size:
+            plan.prime(self.block_size)
+        self.publish(plan)
     
-    def apply_equalizer(self, audio, params):
-        """Aplica ecualización de 3 bandas"""
-        low_gain = params.get('low', 0)
-        mid_gain = params.get('mid', 0)
-        high_gain = params.get('high', 0)
-        
-        # Filtros de banda
-        # Graves: 0-250 Hz
-        if low_gain != 0:
-            sos_low = signal.butter(2, 250, 'lp', fs=self.sample_rate, output='sos')
-            low_band = signal.sosfilt(sos_low, audio)
-            audio = audio + low_band * (10 ** (low_gain / 20) - 1)
-        
-        # Medios: 250-4000 Hz
-        if mid_gain != 0:
-            sos_mid = signal.butter(2, [250, 4000], 'bp', fs=self.sample_rate, output='sos')
-            mid_band = signal.sosfilt(sos_mid, audio)
-            audio = audio + mid_band * (10 ** (mid_gain / 20) - 1)
-        
-        # Agudos: 4000+ Hz
-        if high_gain != 0:
-            sos_high = signal.butter(2, 4000, 'hp', fs=self.sample_rate, output='sos')
-            high_band = signal.sosfilt(sos_high, audio)
-            audio = audio + high_band * (10 ** (high_gain / 20) - 1)
-        
-        return audio
+    def compile_plan(self, chain, crossfade=None):
+        """Compila la cadena en un plan para el formato actual, sin publicarlo.
+        
+        Sirve para tener planes listos de antemano (preset_bank.py); cada
+        plan se publica una sola vez, porque sus nodos guardan estado.
+        """
+        if crossfade is None:
+            crossfade = self.crossfade
+        nodes = compile_chain(chain, self.sample_rate, self.channels, self.block_size)
+        return ProcessingPlan(chain, nodes, int(crossfade * self.sample_rate),
+                              self.channels)
     
-    def apply_echo(self, audio, params):
-        """Aplica efecto de eco"""
-        delay = params.get('delay', 0.3)
-        feedback = params.get('feedback', 0.5)
-        mix = params.get('mix', 0.5)
+    def publish(self, plan):
+        """Publica un plan ya compilado: el hilo de audio lo recoge en el siguiente bloque"""
+        if plan.channels != self.channels:
+            raise ValueError(f"El plan es de {plan.channels} canales y el procesador "
+                             f"de {self.channels}")
+        active = self._active
+        if plan.structure == active.structure:
+            # Mismos nodos con otros valores: las rampas con que _activate
+            # los llevará desde los del plan activo se diseñan aquí
+            for node, previous in zip(plan.nodes, active.nodes):
+                node.plan_takeover(previous)
+        self.chain = plan.chain
+        self._published = plan
+    
+    def configure(self, sample_rate=None, channels=None, block_size=None):
+        """Cambia la frecuencia de muestreo, el número de canales y/o el bloque.
         
-        delay_samples = int(delay * self.sample_rate)
+        Recompila la cadena, así que los coeficientes de los filtros, las
+        longitudes de las líneas de retardo y las rampas se recalculan para
+        el formato nuevo. Solo con el stream parado: el estado de los efectos
+        empieza de cero.
+        """
+        sample_rate = sample_rate or self.sample_rate
+        channels = channels or self.channels
+        block_size = block_size or self.block_size
+        if (sample_rate, channels, block_size) == (self.sample_rate, self.channels,
+                                                   self.block_size):
+            return
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_size = block_size
+        self.stats.sample_rate = sample_rate
+        self.scratch = Scratch(channels)
+        self._effect_nodes = {}
+        empty = ProcessingPlan([], [], channels=channels)
+        self._active = empty
+        self._fading = None
+        self._smoothing = []
+        self._param_updates.clear()
+        self.set_chain(self.chain, crossfade=0)
+    
+    def set_param(self, node_id, name, value):
+        """Cambia un parámetro de un nodo por su id, sin recompilar y desde cualquier hilo.
         
-        # Añadir al buffer
-        for sample in audio:
-            self.echo_buffer.append(sample)
+        El hilo de audio lo aplica al inicio del siguiente bloque y el nodo
+        llega al valor nuevo con una rampa, conservando su estado. Los
+        filtros que la rampa necesita se diseñan aquí (Effect.plan_ramp),
+        en el hilo que llama. El valor queda también en self.chain.
+        """
+        self.record_param(node_id, name, value)
+        # El plan publicado y, si aún no lo ha recogido, el que está sonando
+        published, active = self._published, self._active
+        for plan in (published,) if published is active else (published, active):
+            node = plan.by_id.get(node_id)
+            if node is not None:
+                node.plan_ramp(name, value)
+        self._param_updates.append((node_id, name, value))
+    
+    def record_param(self, node_id, name, value):
+        """Anota el valor del parámetro en self.chain, sin tocar los nodos.
         
-        # Crear eco
-        output = audio.copy()
-        buffer_list = list(self.echo_buffer)
+        Lo que se recompila desde la cadena (configure, el arranque del
+        proceso DSP) parte así de los últimos valores y no de los del último
+        set_chain. La cadena se copia en vez de modificarse: sus dicts pueden
+        ser del que llamó a set_chain (los de BUILTIN_PRESETS, por ejemplo).
+        """
+        self.chain = [dict(effect, params=dict(effect.get('params') or {}, **{name: value}))
+                      if effect.get('id') == node_id else effect
+                      for effect in self.chain]
+    
+    @property
+    def nodes(self):
+        """Nodos del plan en uso"""
+        return self._active.nodes
         
-        if len(buffer_list) >= delay_samples:
-            delayed = np.array(buffer_list[-len(audio)-delay_samples:-delay_samples])
-            if len(delayed) == len(audio):
-                output = audio * (1 - mix) + delayed * feedback * mix
+    def get_latency(self):
+        """Latencia algorítmica total de la cadena, en segundos"""
+        return self._published.latency / self.sample_rate
+    
+    def latency_report(self, block_size, input_latency=None, output_latency=None,
+                       worker_blocks=0):
+        """Latencia de ida y vuelta (micrófono -> altavoz), en segundos, por partes.
         
+        input_latency/output_latency son las que PortAudio reporta para el
+        stream abierto (ya incluyen el buffer del bloque); si no se conocen
+        se cuenta un bloque por sentido. worker_blocks es el margen del
+        DSPWorker, si el DSP corre fuera del callback.
+        """
+        block = block_size / self.sample_rate
+        if input_latency is None:
+            input_latency = block
+        if output_latency is None:
+            output_latency = block
+        algorithmic = self.get_latency()
+        worker = worker_blocks * block
+        return {
+            'block': block,
+            'input': input_latency,
+            'output': output_latency,
+            'algorithmic': algorithmic,
+            'worker': worker,
+            'round_trip': input_latency + output_latency + algorithmic + worker,
+        }
+    
+    def get_stats(self):
+        """Métricas del callback (plazos perdidos, xruns, histograma de carga) y de la caché de filtros"""
+        stats = self.stats.snapshot()
+        stats['filter_cache'] = FILTER_CACHE.stats()
+        return stats
+    
+    def _activate(self, plan):
+        """Cambia al plan publicado (hilo de audio, límite de bloque)"""
+        active = self._active
+        smoothing = []
+        if plan.structure == active.structure:
+            # Sin fundido: cada nodo sigue desde el estado y los valores del
+            # activo y llega a los suyos con rampas, como al mover un slider
+            for node, previous in zip(plan.nodes, active.nodes):
+                if node.take_over(previous):
+                    smoothing.append(node)
+        elif len(plan.fade) and active.nodes:
+            self._fading = active
+            self._fade_pos = 0
+        self._active = plan
+        self._smoothing = smoothing
+    
+    def _apply_param_updates(self, n):
+        """Aplica los cambios pendientes y avanza las rampas (hilo de audio)"""
+        updates = self._param_updates
+        while updates:
+            node_id, name, value = updates.popleft()
+            node = self._active.by_id.get(node_id)
+            if node is not None:
+                node.set_param(name, value)
+                if node not in self._smoothing:
+                    self._smoothing.append(node)
+        
+        if self._smoothing:
+            self._smoothing = [node for node in self._smoothing if node.advance(n)]
+    
+    def _crossfade(self, previous, audio):
+        """Funde la salida del plan saliente con la del nuevo"""
+        fade = self._active.fade
+        start = self._fade_pos
+        count = min(len(audio), len(fade) - start)
+        
+        output = self.scratch.get('crossfade', len(audio))
+        output[:] = audio
+        # previous + (audio - previous) * fade en el tramo del fundido
+        head = output[:count]
+        head -= previous[:count]
+        head *= fade[start:start + count]
+        head += previous[:count]
+        
+        self._fade_pos += count
+        if self._fade_pos >= len(fade):
+            self._fading = None
         return output
     
-    def apply_reverb(self, audio, params):
-        """Aplica efecto de reverberación"""
-        room_size = params.get('room_size', 0.5)
-        damping = params.get('damping', 0.5)
-        mix = params.get('mix', 0.3)
+    def run(self, audio):
+        """Aplica el plan a un bloque float32 (muestras, canales) o mono 1-D.
         
-        # Reverb simple con múltiples delays
-        delays = [int(room_size * self.sample_rate * d) for d in [0.029, 0.037, 0.041, 0.043]]
-        gains = [0.7, 0.6, 0.5, 0.4]
+        La escala completa es 1.0.
+        """
+        if audio.ndim == 1:
+            return self._run(audio[:, np.newaxis])[:, 0]
+        return self._run(audio)
+    
+    def _run(self, audio):
+        # Un plan nuevo se recoge solo fuera de un fundido en curso
+        plan = self._published
+        if plan is not self._active and self._fading is None:
+            self._activate(plan)
+        if self._param_updates or self._smoothing:
+            self._apply_param_updates(len(audio))
         
-        reverb = np.zeros_like(audio)
+        output = self._active.run(audio)
         
-        for delay, gain in zip(delays, gains):
-            if delay < len(audio):
-                delayed = np.pad(audio, (delay, 0), mode='constant')[:len(audio)]
-                reverb += delayed * gain * (1 - damping)
+        if self._fading is not None:
+            output = self._crossfade(self._fading.run(audio), output)
+        return output
+    
+    def process_into(self, indata, outdata):
+        """Procesa un bloque float32 (frames, canales) escribiendo en outdata.
         
-        return audio * (1 - mix) + reverb * mix
+        Camino sin copias intermedias para sounddevice: indata y outdata son
+        los buffers de PortAudio, ya en el formato (frames, canales) de los
+        efectos, y el resultado se recorta directamente sobre outdata. Si el
+        dispositivo tiene otro número de canales se pasa por un buffer
+        intermedio; los canales de salida sobrantes repiten el último.
+        """
+        channels = self.channels
+        if indata.shape[1] != channels:
+            audio = self.scratch.get('input', len(indata))
+            audio[:] = indata[:, :channels]
+            indata = audio
+        audio = self._run(indata)
+        if outdata.shape[1] == channels:
+            np.clip(audio, -1.0, 1.0, out=outdata)
+            return
+        clipped = self.scratch.get('output', len(audio))
+        np.clip(audio, -1.0, 1.0, out=clipped)
+        outdata[:, :channels] = clipped
+        outdata[:, channels:] = clipped[:, -1:]
     
-    def apply_pitch(self, audio, params):
-        """Cambia el pitch del audio"""
-        semitones = params.get('semitones', 0)
-        fine = params.get('fine', 0)
+    def process(self, audio_data):
+        """Adaptador int16 (bytes, canales entrelazados) para PyAudio sobre el camino float32"""
+        if len(audio_data) == 0:
+            return audio_data
         
-        # Calcular factor de pitch
-        total_cents = semitones * 100 + fine
-        pitch_factor = 2 ** (total_cents / 1200)
+        # Frames entrelazados: (frames, canales) sin copiar
+        pcm = np.frombuffer(audio_data, dtype=np.int16).reshape(-1, self.channels)
+        n = len(pcm)
+        audio = self.scratch.get('input', n)
+        audio[:] = pcm
+        audio *= 1 / 32768.0
         
-        if pitch_factor == 1.0:
-            return audio
+        output = self.scratch.get('output', n)
+        np.multiply(self._run(audio), 32768.0, out=output)
+        np.clip(output, -32768, 32767, out=output)
+        pcm = self.scratch.get('pcm', n, np.int16)
+        pcm[:] = output
+        # PyAudio pide bytes: esta es la única copia nueva por bloque
+        return pcm.tobytes()
+    
+    # Aplicación de un efecto suelto sobre bloques consecutivos: un nodo por
+    # tipo que conserva su estado (colas, solapes) entre llamadas
+    
+    @staticmethod
+    def _channels_of(audio):
+        """Canales de un bloque mono 1-D o (muestras, canales)"""
+        return 1 if audio.ndim == 1 else audio.shape[1]
+    
+    def _effect_node(self, effect_class, audio, params):
+        """Nodo de los apply_*: el de la llamada anterior si no cambia de forma.
         
-        # Resample para cambiar pitch
-        indices = np.round(np.arange(0, len(audio), pitch_factor))
-        indices = indices[indices < len(audio)].astype(int)
+        Los parámetros nuevos llegan con las rampas de set_param, como en la
+        cadena; un cambio estructural o de canales crea un nodo nuevo.
+        """
+        channels = self._channels_of(audio)
+        values = dict(effect_class.defaults, **(params or {}))
+        node = self._effect_nodes.get(effect_class)
+        if (node is None or node.channels != channels
+                or any(node.params[name] != values[name] for name in node.structural)):
+            node = effect_class(values, self.sample_rate, channels)
+            self._effect_nodes[effect_class] = node
+            return node
         
-        return audio[indices]
+        # Contra el objetivo en curso: en plena rampa no se vuelve a pedir
+        targets = {name: target for name, (target, _) in node.targets.items()}
+        changed = {name: value for name, value in values.items()
+                   if name in node.params and value != targets.get(name, node.params[name])}
+        if changed:
+            node.plan_ramps(changed, node.params)
+            for name, value in changed.items():
+                node.set_param(name, value)
+        node.advance(len(audio))
+        return node
+    
+    def apply_equalizer(self, audio, params):
+        """Aplica ecualización de 3 bandas"""
+        return self._effect_node(Equalizer, audio, params).process(audio)
+    
+    def apply_echo(self, audio, params):
+        """Aplica efecto de eco"""
+        return self._effect_node(Echo, audio, params).process(audio)
+    
+    def apply_reverb(self, audio, params):
+        """Aplica efecto de reverberación"""
+        return self._effect_node(Reverb, audio, params).process(audio)
+    
+    def apply_pitch(self, audio, params):
+        """Cambia el pitch del audio"""
+        return self._effect_node(PitchShift, audio, params).process(audio)
     
     def apply_distortion(self, audio, params):
         """Aplica distorsión al audio"""
-        drive = params.get('drive', 0.5)
-        tone = params.get('tone', 0.5)
-        mix = params.get('mix', 0.5)
-        
-        # Normalizar
-        audio_norm = audio / 32768.0
-        
-        # Aplicar distorsión (soft clipping)
-        driven = audio_norm * (1 + drive * 10)
-        distorted = np.tanh(driven) * 32768.0
-        
-        # Filtro de tono
-        if tone < 0.5:
-            # Más graves
-            cutoff = 1000 + tone * 6000
-            sos = signal.butter(2, cutoff, 'lp', fs=self.sample_rate, output='sos')
-            distorted = signal.sosfilt(sos, distorted)
-        else:
-            # Más agudos
-            cutoff = 500 + (tone - 0.5) * 4000
-            sos = signal.butter(2, cutoff, 'hp', fs=self.sample_rate, output='sos')
-            distorted = signal.sosfilt(sos, distorted)
-        
-        return audio * (1 - mix) + distorted * mix
+        return self._effect_node(Distortion, audio, params).process(audio)
     
     def apply_compressor(self, audio, params):
         """Aplica compresión dinámica"""
-        threshold = params.get('threshold', -20)
-        ratio = params.get('ratio', 4)
-        attack = params.get('attack', 0.01)
-        release = params.get('release', 0.1)
-        
-        # Convertir a dB
-        audio_db = 20 * np.log10(np.abs(audio) / 32768.0 + 1e-10)
-        
-        # Aplicar compresión
-        gain_reduction = np.zeros_like(audio_db)
-        mask = audio_db > threshold
-        gain_reduction[mask] = (audio_db[mask] - threshold) * (1 - 1/ratio)
-        
-        # Aplicar ganancia
-        gain_linear = 10 ** (-gain_reduction / 20)
-        compressed = audio * gain_linear
-        
-        return compressed
+        return self._effect_node(Compressor, audio, params).process(audio)
     
     def apply_gain(self, audio, params):
         """Aplica ganancia simple"""
-        volume = params.get('volume', 1.0)
-        return audio * volume
+        return self._effect_node(Gain, audio, params).process(audio)
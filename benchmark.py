@@ -0,0 +1,687 @@
+"""
+Benchmark de los nodos de efecto y de los presets
+Ejecuta: python benchmark.py [--output resultados.json] [--compare anterior.json]
+
+Mide cada efecto (los mismos nodos que usan los apply_* de AudioProcessor)
+y cada preset predefinido con bloques de 64 a 4096 muestras a 44.1 y
+48 kHz: ns/muestra, factor de tiempo real (RTF), peor bloque y, tras el
+calentamiento, bytes (pico de tracemalloc) y asignaciones por bloque.
+Con --channels 1 2 4 se repite con bloques de varios canales; ns/muestra
+es por frame, así que muestra cómo escala el coste con los canales.
+Con --suite worker simula un callback en tiempo real con un hilo de
+interfaz que compite por el GIL, y compara el DSP en el callback contra
+el hilo DSP (dsp_worker.py) con varios márgenes y el proceso del motor
+(dsp_process.py, con su propio callback sobre un reloj sin dispositivo). Con --suite kernels compara los núcleos Numba (kernels.py) con
+el camino NumPy y comprueba que la salida es idéntica. Con --suite
+distortion mide el coste y el aliasing de la distorsión por factor de
+sobremuestreo. Con --suite filters compara el cambio de preset y el
+barrido del tono con y sin la caché de filtros. Con --suite convolution
+mide la reverb por convolución por tamaño de partición y largo de IR.
+Con --suite startup mide el arranque en frío y en caliente
+de la interfaz y del modo sin interfaz (headless.py). Con --suite switch
+compara el cambio de preset en pleno stream con set_chain y con el banco
+de presets precompilados (preset_bank.py).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+import numpy as np
+import kernels
+from audio_processor import AudioProcessor
+from dsp_worker import DSPWorker
+from dsp_process import DSPProcess
+from effects import EFFECTS, FILTER_CACHE, Convolution, Reverb, PitchShift, Distortion
+from preset_bank import PresetBank
+from presets import BUILTIN_PRESETS
+from wav_io import encode
+
+BLOCK_SIZES = (64, 128, 256, 512, 1024, 2048, 4096)
+SAMPLE_RATES = (44100, 48000)
+# Arranques que mide --suite startup (argumentos del intérprete)
+STARTUP_TARGETS = (
+    ("intérprete", ['-c', 'pass']),
+    ("import del motor", ['-c', 'import audio_processor']),
+    ("sin interfaz (robot)", ['headless.py', 'robot', '--check']),
+    ("interfaz", ['main_app_sounddevice.py', '--startup-check']),
+)
+
+
+def legacy_reverb(audio, params, sample_rate):
+    """Reverb original (delays con np.pad por bloque), como referencia"""
+    room_size = params.get('room_size', 0.5)
+    damping = params.get('damping', 0.5)
+    mix = params.get('mix', 0.3)
+
+    delays = [int(room_size * sample_rate * d) for d in [0.029, 0.037, 0.041, 0.043]]
+    gains = [0.7, 0.6, 0.5, 0.4]
+
+    reverb = np.zeros_like(audio)
+
+    for delay, gain in zip(delays, gains):
+        if delay < len(audio):
+            delayed = np.pad(audio, (delay, 0), mode='constant')[:len(audio)]
+            reverb += delayed * gain * (1 - damping)
+
+    return audio * (1 - mix) + reverb * mix
+
+
+def make_blocks(block_size, sample_rate, seconds, channels=1):
+    """Bloques de ruido float32 (escala 1.0) que suman `seconds` de audio.
+
+    Mono son 1-D; con más canales, (muestras, canales).
+    """
+    rng = np.random.default_rng(0)
+    n_blocks = max(int(seconds * sample_rate / block_size), 1)
+    shape = block_size if channels == 1 else (block_size, channels)
+    return [(rng.standard_normal(shape) * 0.1).astype(np.float32)
+            for _ in range(n_blocks)]
+
+
+def time_blocks(process, block_size, sample_rate, seconds=2.0):
+    """Procesa `seconds` de ruido en bloques y devuelve (µs/bloque, factor tiempo real)"""
+    result = measure(process, block_size, sample_rate, seconds, allocations=False)
+    return result['us_per_block'], result['rtf']
+
+
+def traced_block(process, block):
+    """(bytes, asignaciones) de un bloque, con tracemalloc ya arrancado.
+
+    bytes es el pico por encima de lo reservado antes del bloque; las
+    asignaciones son las del bloque que siguen vivas al terminar (diferencia
+    de instantáneas, sin las de tracemalloc). Un bloque puede quedar bajo el
+    límite de bytes con muchas reservas pequeñas: la cuenta las delata.
+    """
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    before = tracemalloc.take_snapshot().filter_traces(ignore)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    process(block)
+    peak = tracemalloc.get_traced_memory()[1] - current
+    after = tracemalloc.take_snapshot().filter_traces(ignore)
+    count = sum(stat.count_diff for stat in after.compare_to(before, 'traceback')
+                if stat.count_diff > 0)
+    return peak, count
+
+
+def measure(process, block_size, sample_rate, seconds=1.0, allocations=True, channels=1):
+    """Mide una función de proceso por bloques y devuelve un dict de métricas"""
+    blocks = make_blocks(block_size, sample_rate, seconds, channels)
+
+    # Calentamiento: buffers de los nodos, caches de diseño, etc.
+    for block in blocks[:4]:
+        process(block)
+
+    durations = []
+    for block in blocks:
+        start = time.perf_counter()
+        process(block)
+        durations.append(time.perf_counter() - start)
+
+    per_block = sum(durations) / len(durations)
+    result = {
+        'block_size': block_size,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'us_per_block': per_block * 1e6,
+        'max_us_per_block': max(durations) * 1e6,
+        'ns_per_sample': per_block / block_size * 1e9,
+        'rtf': per_block / (block_size / sample_rate),
+    }
+
+    if allocations:
+        # Memoria asignada por encima del estado estable durante cada bloque
+        # (tracemalloc va aparte: ralentiza mucho y falsearía los tiempos)
+        tracemalloc.start()
+        peaks, counts = zip(*(traced_block(process, block) for block in blocks[:16]))
+        tracemalloc.stop()
+        result['alloc_bytes_per_block'] = int(np.median(peaks))
+        result['allocs_per_block'] = int(np.median(counts))
+
+    return result
+
+
+def print_header():
+    print(f"{'caso':<26} {'fs':>6} {'bloque':>6} {'can':>3} {'ns/muestra':>10} {'RTF':>8} "
+          f"{'peor µs':>10} {'bytes/bl':>9} {'asig/bl':>7}")
+
+
+def print_result(result):
+    print(f"{result['name']:<26} {result['sample_rate']:>6} {result['block_size']:>6} "
+          f"{result['channels']:>3} {result['ns_per_sample']:>10.1f} {result['rtf']:>8.4f} "
+          f"{result['max_us_per_block']:>10.1f} {result.get('alloc_bytes_per_block', 0):>9} "
+          f"{result.get('allocs_per_block', 0):>7}")
+
+
+def write_ir(path, seconds, sample_rate, rng):
+    """WAV estéreo de ruido con caída exponencial: una sala sintética de RT60 ~ seconds"""
+    n = int(seconds * sample_rate)
+    decay = np.exp(-6.9 * np.arange(n) / n)[:, np.newaxis]
+    with wave.open(path, 'wb') as dst:
+        dst.setnchannels(2)
+        dst.setsampwidth(2)
+        dst.setframerate(sample_rate)
+        dst.writeframes(encode(rng.standard_normal((n, 2)) * decay * 0.5))
+
+
+def bench_effects(block_sizes=BLOCK_SIZES, sample_rates=SAMPLE_RATES, seconds=1.0,
+                  channel_counts=(1,)):
+    """Cada tipo de efecto con sus parámetros por defecto.
+
+    Los que por defecto no hacen nada llevan parámetros propios: la
+    convolución una IR sintética de 1 s y 'linear' una ganancia y un
+    ecualizador fusionados (lo que deja chain_optimizer.py).
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        ir_path = os.path.join(folder, 'ir.wav')
+        write_ir(ir_path, 1.0, 48000, np.random.default_rng(0))
+        params = {
+            'convolution': {'ir': ir_path},
+            'linear': {'stages': [{'type': 'gain', 'params': {'volume': 1.2}},
+                                  {'type': 'equalizer',
+                                   'params': {'low': 4, 'mid': -2, 'high': 3}}]},
+        }
+        for effect_type, effect_class in EFFECTS.items():
+            for sample_rate in sample_rates:
+                for block_size in block_sizes:
+                    for channels in channel_counts:
+                        node = effect_class(params.get(effect_type, {}), sample_rate, channels)
+                        result = measure(node.process, block_size, sample_rate, seconds,
+                                         channels=channels)
+                        result['name'] = f"effect:{effect_type}"
+                        results.append(result)
+                        print_result(result)
+    return results
+
+
+def bench_presets(block_sizes=BLOCK_SIZES, sample_rates=SAMPLE_RATES, seconds=1.0,
+                  channel_counts=(1,)):
+    """Cada preset predefinido sobre el AudioProcessor completo"""
+    results = []
+    for preset_id, chain in BUILTIN_PRESETS.items():
+        for sample_rate in sample_rates:
+            for block_size in block_sizes:
+                for channels in channel_counts:
+                    processor = AudioProcessor(sample_rate=sample_rate, channels=channels)
+                    processor.set_chain(chain)
+                    result = measure(processor.run, block_size, sample_rate, seconds,
+                                     channels=channels)
+                    result['name'] = f"preset:{preset_id}"
+                    results.append(result)
+                    print_result(result)
+    return results
+
+
+def save_results(results, filename):
+    with open(filename, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+        }, f, indent=2)
+
+
+def compare(results, filename):
+    """Compara con un JSON anterior (speedup > 1: ahora es más rápido)"""
+    with open(filename, 'r') as f:
+        previous = json.load(f)
+    # Los resultados sin 'channels' son de antes del soporte multicanal (mono)
+    before = {(r['name'], r['sample_rate'], r['block_size'], r.get('channels', 1)): r
+              for r in previous['results']}
+
+    print(f"\n📊 Comparación con {filename}")
+    print(f"{'caso':<26} {'fs':>6} {'bloque':>6} {'can':>3} {'antes ns':>9} {'ahora ns':>9} "
+          f"{'speedup':>8}")
+    for result in results:
+        key = (result['name'], result['sample_rate'], result['block_size'], result['channels'])
+        if key not in before:
+            continue
+        old = before[key]['ns_per_sample']
+        new = result['ns_per_sample']
+        print(f"{key[0]:<26} {key[1]:>6} {key[2]:>6} {key[3]:>3} {old:>9.1f} {new:>9.1f} "
+              f"{old / new:>7.2f}x")
+
+
+def bench_reverb(sample_rate=44100, block_sizes=(256, 1024, 4096)):
+    """Compara la reverb Freeverb contra la reverb original"""
+    print("🌊 Reverb: Freeverb vs original")
+    print(f"{'room':>6} {'bloque':>7} {'original µs':>12} {'freeverb µs':>12} {'RTF':>8}")
+    for room_size in (0.1, 0.5, 0.9):
+        params = {'room_size': room_size, 'damping': 0.5, 'mix': 0.3}
+        for block_size in block_sizes:
+            legacy_us, _ = time_blocks(
+                lambda a: legacy_reverb(a, params, sample_rate), block_size, sample_rate)
+            node = Reverb(params, sample_rate)
+            node_us, rtf = time_blocks(node.process, block_size, sample_rate)
+            print(f"{room_size:>6} {block_size:>7} {legacy_us:>12.1f} {node_us:>12.1f} {rtf:>8.4f}")
+
+
+def bench_pitch(sample_rate=44100, block_sizes=(256, 1024, 4096)):
+    """Mide el pitch shifter contra su presupuesto (5 % del bloque)"""
+    print("🎵 Pitch shifter (presupuesto: RTF < 0.05)")
+    print(f"{'semitonos':>9} {'bloque':>7} {'µs/bloque':>10} {'RTF':>8}")
+    for semitones in (-12, -5, 7, 12):
+        for block_size in block_sizes:
+            node = PitchShift({'semitones': semitones}, sample_rate)
+            node_us, rtf = time_blocks(node.process, block_size, sample_rate)
+            print(f"{semitones:>9} {block_size:>7} {node_us:>10.1f} {rtf:>8.4f}")
+
+
+def aliasing_db(node, sample_rate, frequency=4700, seconds=1.0):
+    """Energía fuera de los armónicos de un seno saturado, relativa a los armónicos (dB)"""
+    n = int(seconds * sample_rate)
+    tone = (np.sin(2 * np.pi * frequency * np.arange(n) / sample_rate) * 0.9).astype(np.float32)
+    output = np.concatenate([node.process(tone[i:i + 512]).copy() for i in range(0, n, 512)])
+    output = output[n // 8:]  # sin el transitorio inicial
+    spectrum = np.abs(np.fft.rfft(output * np.hanning(len(output)))) ** 2
+    freqs = np.fft.rfftfreq(len(output), 1 / sample_rate)
+    harmonic = freqs < 60
+    for k in range(1, int(sample_rate / 2 / frequency) + 1):
+        harmonic |= np.abs(freqs - k * frequency) < 60
+    return 10 * np.log10(spectrum[~harmonic].sum() / spectrum[harmonic].sum())
+
+
+def bench_distortion(sample_rate=48000, block_sizes=(128, 1024), channel_counts=(1, 2),
+                     seconds=1.0):
+    """Coste, latencia y aliasing de la distorsión por factor de sobremuestreo"""
+    print(f"📢 Distorsión sobremuestreada ({sample_rate} Hz, drive máximo, seno de 4.7 kHz)")
+    print(f"{'factor':>6} {'aliasing dB':>11} {'latencia':>8} {'can':>3} {'bloque':>6} "
+          f"{'µs/bloque':>10} {'RTF':>8} {'bytes/bl':>9} {'asig/bl':>7}")
+    results = []
+    for factor in Distortion.FACTORS:
+        # Sin filtro de tono ni mezcla seca: solo la no linealidad
+        node = Distortion({'drive': 1.0, 'mix': 1.0, 'oversample': factor}, sample_rate)
+        node.tone_filter.set_sos(None)
+        alias = aliasing_db(node, sample_rate)
+        for channels in channel_counts:
+            for block_size in block_sizes:
+                node = Distortion({'oversample': factor}, sample_rate, channels)
+                result = measure(node.process, block_size, sample_rate, seconds,
+                                 channels=channels)
+                result.update({'name': f"distortion x{factor}", 'aliasing_db': alias,
+                               'latency': node.latency})
+                print(f"{factor:>6} {alias:>11.1f} {node.latency:>8} {channels:>3} "
+                      f"{block_size:>6} {result['us_per_block']:>10.1f} {result['rtf']:>8.4f} "
+                      f"{result['alloc_bytes_per_block']:>9} {result['allocs_per_block']:>7}")
+                results.append(result)
+    return results
+
+
+def bench_filters(sample_rate=48000, block_size=256, rounds=20):
+    """Cambio de preset y barrido del tono con y sin FILTER_CACHE"""
+    scrub = [round(value, 2) for value in np.linspace(0, 0.49, 50)]
+    scrub = (scrub + scrub[::-1]) * 4  # el slider va y vuelve
+    chain = [{'type': 'equalizer', 'id': 'eq', 'params': {'low': 4, 'mid': -2, 'high': 3}},
+             {'type': 'distortion', 'id': 'dist', 'params': {'tone': 0.2}}]
+    audio = (np.random.default_rng(0).standard_normal((block_size, 1)) * 0.1).astype(np.float32)
+    maxsize = FILTER_CACHE.maxsize
+
+    print(f"📢 Caché de filtros ({sample_rate} Hz, bloques de {block_size})")
+    print(f"{'':<10} {'cambio de preset µs':>20} {'barrido µs/bloque':>18} {'aciertos':>9} {'fallos':>7}")
+    results = []
+    for label, size in (("sin caché", 0), ("con caché", maxsize)):
+        FILTER_CACHE.clear()
+        FILTER_CACHE.maxsize = size
+        processor = AudioProcessor(sample_rate=sample_rate)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for preset in BUILTIN_PRESETS.values():
+                processor.set_chain(preset)
+        switch = (time.perf_counter() - start) / (rounds * len(BUILTIN_PRESETS))
+
+        processor.set_chain(chain)
+        blocks = 0
+        start = time.perf_counter()
+        for tone in scrub:
+            processor.set_param('dist', 'tone', tone)
+            for _ in range(2):
+                processor.run(audio)
+                blocks += 1
+        per_block = (time.perf_counter() - start) / blocks
+        stats = FILTER_CACHE.stats()
+        print(f"{label:<10} {switch * 1e6:>20.0f} {per_block * 1e6:>18.1f} "
+              f"{stats['hits']:>9} {stats['misses']:>7}")
+        results.append({'name': label, 'switch_us': switch * 1e6,
+                        'scrub_us_per_block': per_block * 1e6, **stats})
+    FILTER_CACHE.maxsize = maxsize
+    return results
+
+
+def bench_switch(sample_rate=48000, block_size=256, rounds=5):
+    """Cambio de preset en pleno stream: set_chain contra el banco de presets.
+    
+    Mide la llamada en el hilo de la interfaz, el primer bloque tras el
+    cambio en el hilo de audio y lo que reservan los bloques del fundido.
+    """
+    audio = (np.random.default_rng(0).standard_normal((block_size, 1)) * 0.1).astype(np.float32)
+    fade_blocks = int(np.ceil(0.02 * sample_rate / block_size)) + 1
+    
+    print(f"📢 Cambio de preset ({sample_rate} Hz, bloques de {block_size})")
+    print(f"{'':<10} {'llamada µs':>11} {'1er bloque µs':>14} {'fundido µs/bl':>15} "
+          f"{'bytes reservados':>17} {'asignaciones':>12}")
+    results = []
+    for label in ("set_chain", "banco"):
+        processor = AudioProcessor(sample_rate=sample_rate)
+        bank = PresetBank(processor, block_size=block_size)
+        processor.run(audio)
+        calls, firsts, fades, allocated, allocations = [], [], [], 0, 0
+        # La última vuelta solo cuenta reservas (tracemalloc falsea los tiempos)
+        for traced in [False] * rounds + [True]:
+            for preset_id, chain in BUILTIN_PRESETS.items():
+                # Reponer los planes y parar el hilo: no compite con la medida
+                bank.start()
+                bank.wait()
+                bank.stop()
+                start = time.perf_counter()
+                if label == "banco":
+                    bank.select(preset_id)
+                else:
+                    processor.set_chain(chain)
+                elapsed = time.perf_counter() - start
+                
+                if traced:
+                    tracemalloc.start()
+                    for _ in range(fade_blocks):
+                        peak, count = traced_block(processor.run, audio)
+                        allocated = max(allocated, peak)
+                        allocations = max(allocations, count)
+                    tracemalloc.stop()
+                    continue
+                calls.append(elapsed)
+                times = []
+                for _ in range(fade_blocks):
+                    start = time.perf_counter()
+                    processor.run(audio)
+                    times.append(time.perf_counter() - start)
+                firsts.append(times[0])
+                fades.append(statistics.mean(times))
+        call, first, fade = (statistics.median(values) for values in (calls, firsts, fades))
+        print(f"{label:<10} {call * 1e6:>11.0f} {first * 1e6:>14.0f} {fade * 1e6:>15.0f} "
+              f"{allocated:>17} {allocations:>12}")
+        results.append({'name': label, 'call_us': call * 1e6, 'first_block_us': first * 1e6,
+                        'fade_us_per_block': fade * 1e6, 'allocated_bytes': allocated,
+                        'allocations': allocations})
+    return results
+
+
+def bench_convolution(sample_rate=48000, ir_seconds=(1.0, 3.0, 6.0), channels=(1, 2)):
+    """Reverb por convolución: coste por partición (bloque = partición) y largo de IR"""
+    print(f"📢 Convolución por particiones ({sample_rate} Hz, bloque = partición)")
+    print(f"{'IR s':>5} {'can':>3} {'partición':>9} {'latencia ms':>11} {'µs/bloque':>10} "
+          f"{'RTF':>8} {'bytes/bl':>9} {'asig/bl':>7}")
+    rng = np.random.default_rng(0)
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for seconds in ir_seconds:
+            path = os.path.join(folder, f"ir_{seconds}.wav")
+            write_ir(path, seconds, sample_rate, rng)
+            for count in channels:
+                for partition in Convolution.PARTITIONS:
+                    node = Convolution({'ir': path, 'partition': partition}, sample_rate, count)
+                    result = measure(node.process, partition, sample_rate, 2.0, channels=count)
+                    result.update({'name': f"convolution {seconds}s", 'partition': partition})
+                    print(f"{seconds:>5} {count:>3} {partition:>9} "
+                          f"{partition / sample_rate * 1000:>11.1f} {result['us_per_block']:>10.1f} "
+                          f"{result['rtf']:>8.4f} {result['alloc_bytes_per_block']:>9} "
+                          f"{result['allocs_per_block']:>7}")
+                    results.append(result)
+    return results
+
+
+def launch(arguments, cache_dir):
+    """Segundos hasta que termina `python arguments`, o el error si falla.
+
+    Las cachés de bytecode y de Numba van a cache_dir: vacía es un arranque
+    en frío (todo se compila), ya llena es uno en caliente.
+    """
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=os.path.join(cache_dir, 'pycache'),
+               NUMBA_CACHE_DIR=os.path.join(cache_dir, 'numba'))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # sin escribir .pyc no hay arranque en caliente
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + arguments, env=env, capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return None, lines[-1] if lines else f"código {result.returncode}"
+    return elapsed, result.stdout.strip()
+
+
+def bench_startup(runs=5):
+    """Arranque en frío (sin cachés de bytecode ni de Numba) y en caliente.
+
+    La caché de disco del sistema no se puede vaciar sin permisos: el frío
+    medido aquí es el del primer arranque tras instalar o actualizar.
+    """
+    print(f"📢 Arranque (mediana de {runs} arranques en caliente)")
+    print(f"{'':<22} {'frío ms':>9} {'caliente ms':>12}")
+    results = []
+    for name, arguments in STARTUP_TARGETS:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold, output = launch(arguments, cache_dir)
+            if cold is None:
+                print(f"{name:<22} ❌ no arrancó: {output}")
+                continue
+            warm = [launch(arguments, cache_dir)[0] for _ in range(runs)]
+        warm = statistics.median(warm)
+        print(f"{name:<22} {cold * 1000:>9.0f} {warm * 1000:>12.0f}")
+        results.append({'name': name, 'cold_ms': cold * 1000, 'warm_ms': warm * 1000})
+    return results
+
+
+def busy_gui(stop, burst=0.004, pause=0.02):
+    """Imita una interfaz ocupada: ráfagas de Python puro que retienen el GIL"""
+    while not stop.is_set():
+        end = time.perf_counter() + burst
+        while time.perf_counter() < end:
+            pass
+        time.sleep(pause)
+
+
+def simulate_stream(process_into, block_size, sample_rate, seconds, channels=1):
+    """Llama a process_into al ritmo del dispositivo y cuenta los bloques tarde.
+    
+    Un bloque llega tarde si su callback termina después de que el
+    dispositivo necesite la salida (un periodo después de su llegada).
+    """
+    period = block_size / sample_rate
+    blocks = make_blocks(block_size, sample_rate, seconds, channels)
+    blocks = [block.reshape(block_size, channels) for block in blocks]
+    outdata = np.zeros((block_size, channels), dtype=np.float32)
+    late = 0
+    start = time.perf_counter()
+    for index, block in enumerate(blocks):
+        arrival = start + index * period
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        process_into(block, outdata)
+        if time.perf_counter() > arrival + period:
+            late += 1
+    return late, len(blocks)
+
+
+def bench_worker(preset_id='rockstar', sample_rate=48000, block_sizes=(128, 256, 512),
+                 margins=(1, 2, 3, 4), seconds=5.0, channels=1):
+    """Huecos por modo: DSP en el callback contra hilo y proceso DSP con cada margen.
+    
+    "tarde" son callbacks que terminaron fuera de plazo (en modo directo,
+    casi siempre por el DSP; con hilo DSP solo copian, así que es la espera
+    por el GIL); "sin salida" son callbacks que no encontraron el bloque
+    procesado a tiempo. En modo proceso el callback corre en el motor, al
+    ritmo de un reloj (backend 'clock'), y "tarde" son sus plazos perdidos:
+    la interfaz ocupada sigue en este proceso.
+    """
+    print(f"🧵 Hilo/proceso DSP con interfaz ocupada ({preset_id}, {sample_rate} Hz, "
+          f"{channels} can)")
+    print(f"{'modo':<14} {'bloque':>6} {'+latencia ms':>12} {'tarde':>6} {'sin salida':>10} "
+          f"{'bloques':>8} {'huecos %':>8}")
+    results = []
+    stop = threading.Event()
+    gui = threading.Thread(target=busy_gui, args=(stop,), daemon=True)
+    gui.start()
+    try:
+        for block_size in block_sizes:
+            modes = [(None, 0)]
+            modes += [(DSPWorker, margin) for margin in margins]
+            modes += [(DSPProcess, margin) for margin in (0,) + tuple(margins)]
+            for engine, margin in modes:
+                processor = AudioProcessor(sample_rate=sample_rate, channels=channels)
+                processor.set_chain(BUILTIN_PRESETS[preset_id])
+                if engine is DSPProcess:
+                    worker = engine(processor, block_size, margin, backend='clock')
+                    worker.start()
+                    time.sleep(seconds)
+                    snapshot = worker.snapshot()
+                    worker.stop()
+                    late = snapshot['callback']['deadline_misses']
+                    total = snapshot['callback']['callbacks']
+                    underruns = snapshot['underruns']
+                    added = worker.latency
+                    mode = f"proceso m={margin}"
+                elif engine is not None:
+                    worker = engine(processor, block_size, margin)
+                    worker.start()
+                    late, total = simulate_stream(worker.process_into, block_size,
+                                                  sample_rate, seconds, channels)
+                    worker.stop()
+                    underruns = worker.underruns
+                    added = worker.latency
+                    mode = f"hilo m={margin}"
+                else:
+                    late, total = simulate_stream(processor.process_into, block_size,
+                                                  sample_rate, seconds, channels)
+                    underruns = 0
+                    added = 0.0
+                    mode = "callback"
+                dropouts = late + underruns
+                print(f"{mode:<14} {block_size:>6} {added * 1000:>12.1f} {late:>6} {underruns:>10} "
+                      f"{total:>8} {dropouts / total * 100:>7.1f}%")
+                results.append({'mode': mode, 'block_size': block_size, 'margin': margin,
+                                'added_latency_ms': added * 1000, 'late': late,
+                                'underruns': underruns, 'blocks': total})
+    finally:
+        stop.set()
+        gui.join()
+    return results
+
+
+def bench_kernels(sample_rate=48000, block_sizes=(128, 1024), channels=2, seconds=1.0):
+    """Efectos con recursión por muestra: backend NumPy contra Numba"""
+    if not kernels.available():
+        print("ℹ️ Numba no está instalado: solo hay backend NumPy (pip install numba)")
+        return []
+    cases = [
+        ('echo', {'delay': 0.002}),
+        ('echo', {'delay': 0.3}),
+        ('reverb', {}),
+        ('compressor', {}),
+    ]
+    print(f"🚀 Núcleos JIT ({sample_rate} Hz, {channels} can)")
+    print(f"{'efecto':<24} {'bloque':>6} {'numpy µs':>9} {'numba µs':>9} {'speedup':>8} "
+          f"{'idéntico':>8}")
+    results = []
+    previous = kernels.backend
+    try:
+        for effect_type, params in cases:
+            for block_size in block_sizes:
+                blocks = make_blocks(block_size, sample_rate, seconds, channels)
+                timing = {}
+                outputs = {}
+                for backend in kernels.BACKENDS:
+                    kernels.set_backend(backend)
+                    node = EFFECTS[effect_type](params, sample_rate, channels)
+                    outputs[backend] = np.concatenate([node.process(b).copy() for b in blocks])
+                    node = EFFECTS[effect_type](params, sample_rate, channels)
+                    timing[backend], _ = time_blocks(node.process, block_size, sample_rate,
+                                                     seconds)
+                identical = np.array_equal(outputs['numpy'], outputs['numba'])
+                name = f"{effect_type} {params}" if params else effect_type
+                print(f"{name:<24} {block_size:>6} {timing['numpy']:>9.1f} "
+                      f"{timing['numba']:>9.1f} {timing['numpy'] / timing['numba']:>7.2f}x "
+                      f"{'sí' if identical else 'NO':>8}")
+                results.append({'name': name, 'block_size': block_size,
+                                'numpy_us': timing['numpy'], 'numba_us': timing['numba'],
+                                'identical': identical})
+    finally:
+        kernels.set_backend(previous)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de Voice Modifier")
+    parser.add_argument('--suite', choices=['full', 'reverb', 'pitch', 'worker', 'kernels',
+                                            'distortion', 'filters', 'convolution',
+                                            'startup', 'switch'],
+                        default='full',
+                        help="full: efectos y presets; reverb/pitch: comparativas; "
+                             "worker: huecos del hilo/proceso DSP por margen; "
+                             "kernels: núcleos Numba contra NumPy; "
+                             "distortion: coste y aliasing por sobremuestreo; "
+                             "filters: caché de coeficientes de filtros; "
+                             "convolution: reverb por convolución por partición; "
+                             "startup: arranque en frío y en caliente; "
+                             "switch: cambio de preset con el banco precompilado")
+    parser.add_argument('-o', '--output', default='benchmark_results.json',
+                        help="JSON donde guardar los resultados")
+    parser.add_argument('--compare', help="JSON de una ejecución anterior")
+    parser.add_argument('--seconds', type=float, default=1.0,
+                        help="Segundos de audio por caso (default: 1.0)")
+    parser.add_argument('--block-sizes', type=int, nargs='+', default=list(BLOCK_SIZES))
+    parser.add_argument('--sample-rates', type=int, nargs='+', default=list(SAMPLE_RATES))
+    parser.add_argument('--channels', type=int, nargs='+', default=[1],
+                        help="Canales por bloque (p. ej. 1 2 4)")
+    args = parser.parse_args()
+
+    if args.suite == 'reverb':
+        bench_reverb()
+        return
+    if args.suite == 'pitch':
+        bench_pitch()
+        return
+    if args.suite == 'worker':
+        bench_worker(seconds=max(args.seconds, 2.0), channels=args.channels[0])
+        return
+    if args.suite == 'kernels':
+        bench_kernels()
+        return
+    if args.suite == 'distortion':
+        bench_distortion()
+        return
+    if args.suite == 'filters':
+        bench_filters()
+        return
+    if args.suite == 'convolution':
+        bench_convolution()
+        return
+    if args.suite == 'startup':
+        bench_startup()
+        return
+    if args.suite == 'switch':
+        bench_switch()
+        return
+
+    print_header()
+    results = bench_effects(args.block_sizes, args.sample_rates, args.seconds, args.channels)
+    results += bench_presets(args.block_sizes, args.sample_rates, args.seconds, args.channels)
+
+    save_results(results, args.output)
+    print(f"\n💾 Resultados guardados en {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
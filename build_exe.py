@@ -8,7 +8,9 @@ import os
 PyInstaller.__main__.run([
     'main_app.py',
     '--name=VoiceModifierPro',
-    '--onefile',
+    # Carpeta en vez de --onefile: un único .exe se descomprime entero en
+    # una carpeta temporal en cada arranque, lo que cuesta segundos
+    '--onedir',
     '--windowed',
     '--icon=NONE',
     '--hidden-import=scipy.special._cdflib',
@@ -0,0 +1,113 @@
+"""
+Métricas de salud del callback de audio en tiempo real
+"""
+import numpy as np
+
+
+class CallbackStats:
+    """Tiempos de proceso y xruns del callback de audio.
+
+    record() y record_xruns() se llaman desde el hilo de audio: solo
+    actualizan contadores y escriben en un anillo preasignado (sin listas,
+    sin prints, sin reservar arrays). snapshot() calcula el resumen y el
+    histograma desde cualquier otro hilo; una lectura puede mezclar dos
+    callbacks consecutivos, lo que no importa para mostrar métricas.
+    """
+
+    WINDOW = 2048  # callbacks en la ventana del histograma
+    # Bordes del histograma, en % del plazo del bloque (frames / fs)
+    BINS = np.array([0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 150, 200, np.inf])
+
+    def __init__(self, sample_rate=44100):
+        self.sample_rate = sample_rate
+        self._loads = np.zeros(self.WINDOW)
+        self.reset()
+
+    def reset(self):
+        """Pone a cero los contadores (al iniciar un stream)"""
+        self.callbacks = 0
+        self.deadline_misses = 0
+        self.input_underflows = 0
+        self.input_overflows = 0
+        self.output_underflows = 0
+        self.output_overflows = 0
+        self.errors = 0
+        self.last_error = None
+        self.worst_load = 0.0
+        self.last_frames = 0
+        self._pos = 0
+        self._loads[:] = 0
+
+    def record(self, elapsed, frames):
+        """Registra un callback: `elapsed` segundos para `frames` muestras"""
+        load = elapsed * self.sample_rate / frames
+        self._loads[self._pos] = load
+        self._pos = (self._pos + 1) % self.WINDOW
+        self.callbacks += 1
+        self.last_frames = frames
+        if load > 1.0:
+            self.deadline_misses += 1
+        if load > self.worst_load:
+            self.worst_load = load
+
+    def record_xruns(self, input_underflow, input_overflow, output_underflow, output_overflow):
+        """Cuenta los flags de estado que PortAudio pasa al callback"""
+        if input_underflow:
+            self.input_underflows += 1
+        if input_overflow:
+            self.input_overflows += 1
+        if output_underflow:
+            self.output_underflows += 1
+        if output_overflow:
+            self.output_overflows += 1
+
+    def record_error(self, error):
+        """Guarda la excepción para mostrarla fuera del hilo de audio"""
+        self.errors += 1
+        self.last_error = error
+
+    @property
+    def xruns(self):
+        return (self.input_underflows + self.input_overflows
+                + self.output_underflows + self.output_overflows)
+
+    def snapshot(self):
+        """Resumen de las métricas (carga en fracción del plazo del bloque)"""
+        count = min(self.callbacks, self.WINDOW)
+        loads = self._loads[:count].copy()
+        histogram, _ = np.histogram(loads * 100, bins=self.BINS)
+        deadline = self.last_frames / self.sample_rate if self.last_frames else 0.0
+
+        return {
+            'callbacks': self.callbacks,
+            'deadline_ms': deadline * 1000,
+            'deadline_misses': self.deadline_misses,
+            'input_underflows': self.input_underflows,
+            'input_overflows': self.input_overflows,
+            'output_underflows': self.output_underflows,
+            'output_overflows': self.output_overflows,
+            'xruns': self.xruns,
+            'errors': self.errors,
+            'last_error': repr(self.last_error) if self.last_error is not None else None,
+            'mean_load': float(loads.mean()) if count else 0.0,
+            'p99_load': float(np.percentile(loads, 99)) if count else 0.0,
+            'worst_load': self.worst_load,
+            'histogram': {
+                'bins_percent': self.BINS.tolist(),
+                'counts': histogram.tolist(),
+            },
+        }
+
+    def summary(self):
+        """Texto corto para la interfaz"""
+        stats = self.snapshot()
+        text = (f"Carga media {stats['mean_load'] * 100:.0f}% · "
+                f"p99 {stats['p99_load'] * 100:.0f}% · "
+                f"peor {stats['worst_load'] * 100:.0f}% "
+                f"(plazo {stats['deadline_ms']:.1f} ms)\n"
+                f"Plazos perdidos: {stats['deadline_misses']} de {stats['callbacks']} · "
+                f"Underflows: {stats['input_underflows']}/{stats['output_underflows']} · "
+                f"Overflows: {stats['input_overflows']}/{stats['output_overflows']} (entrada/salida)")
+        if stats['errors']:
+            text += f"\n⚠️ Errores: {stats['errors']} · último: {stats['last_error']}"
+        return text
@@ -0,0 +1,205 @@
+"""
+Optimizador de cadenas: quita nodos sin efecto y funde etapas lineales contiguas
+Ejecuta: python chain_optimizer.py preset.json [--rate 48000]
+
+Es un paso entre build_processing_chain y AudioProcessor.set_chain para
+cadenas que no se editan en vivo (render.py, headless.py): los nodos
+quitados o fundidos dejan de existir en el plan, así que set_param ya no
+los encuentra. Cada efecto declara cuándo no hace nada (is_identity) y si
+es lineal (linear/transfer); el resultado debe sonar igual que la cadena
+original salvo redondeos de float32 (ver compare_chains).
+"""
+import argparse
+import numpy as np
+from effects import EFFECTS
+
+
+def _params(effect):
+    """Parámetros del efecto con los valores por defecto de su clase"""
+    return dict(EFFECTS[effect['type']].defaults, **(effect.get('params') or {}))
+
+
+def _label(entry):
+    effect = entry['effect']
+    key = entry['key']
+    return f"{effect['type']} '{key}'" if effect.get('id') is not None else \
+        f"{effect['type']} (#{key[1] + 1})"
+
+
+def _normalize(chain):
+    """Entradas con fuentes explícitas: {'key', 'effect', 'sources'} (None = señal de entrada)"""
+    entries = []
+    previous = None
+    for index, effect in enumerate(chain):
+        key = effect.get('id')
+        if key is None:
+            key = ('#', index)
+        if 'inputs' in effect:
+            sources = list(effect['inputs']) or [None]
+        else:
+            sources = [previous]  # como ProcessingPlan: la entrada anterior
+        entries.append({'key': key, 'effect': effect, 'sources': sources})
+        previous = key
+    return entries
+
+
+def _denormalize(entries, series):
+    """Vuelve al formato de cadena (serie sin 'inputs' si la original lo era)"""
+    referenced = {source for entry in entries for source in entry['sources']}
+    chain = []
+    for index, entry in enumerate(entries):
+        effect = {name: value for name, value in entry['effect'].items() if name != 'inputs'}
+        if isinstance(entry['key'], tuple) and entry['key'] in referenced and not series:
+            effect['id'] = f"opt{index}"
+            entry['id'] = effect['id']
+        chain.append(effect)
+    if not series:
+        ids = {entry['key']: entry.get('id', entry['key']) for entry in entries}
+        for effect, entry in zip(chain, entries):
+            effect['inputs'] = [None if source is None else ids[source]
+                                for source in entry['sources']]
+    return chain
+
+
+def _consumers(entries):
+    """key -> número de veces que otras entradas la leen"""
+    counts = {}
+    for entry in entries:
+        for source in entry['sources']:
+            counts[source] = counts.get(source, 0) + 1
+    return counts
+
+
+def _remove_dead(entries, report):
+    """Con nodos 'output', lo que no llega a ninguno se calcula para nada"""
+    if not any(entry['effect']['type'] == 'output' for entry in entries):
+        return entries
+    while True:
+        counts = _consumers(entries)
+        dead = [entry for entry in entries
+                if entry['effect']['type'] != 'output' and not counts.get(entry['key'])]
+        if not dead:
+            return entries
+        for entry in dead:
+            report.append(f"quitado {_label(entry)}: no llega a la salida")
+        entries = [entry for entry in entries if entry not in dead]
+
+
+def _remove_identities(entries, report):
+    """Quita los nodos que devuelven la entrada tal cual y reconecta a sus lectores"""
+    has_outputs = any(entry['effect']['type'] == 'output' for entry in entries)
+    for entry in list(entries):
+        effect_class = EFFECTS.get(entry['effect']['type'])
+        if effect_class is None or len(entry['sources']) != 1:
+            continue  # 'input'/'output', o un punto de mezcla (la media sí hace algo)
+        if not effect_class.is_identity(_params(entry['effect'])):
+            continue
+        source = entry['sources'][0]
+        counts = _consumers(entries)
+        if not counts.get(entry['key']) and not has_outputs:
+            # Es una hoja y sale mezclada con las demás: solo se quita si su
+            # fuente pasa a ser hoja en su lugar
+            if source is None and len(entries) > 1:
+                continue
+            if source is not None and counts.get(source, 0) > 1:
+                continue
+        entries.remove(entry)
+        for other in entries:
+            other['sources'] = [source if key == entry['key'] else key
+                                for key in other['sources']]
+        report.append(f"quitado {_label(entry)}: sin efecto con estos parámetros")
+    return entries
+
+
+def _fuse_linear(entries, report):
+    """Funde las series de ganancias y ecualizadores en un solo nodo"""
+    counts = _consumers(entries)
+    groups = {}  # key -> grupo (lista de entradas) al que pertenece
+    for entry in entries:
+        effect_class = EFFECTS.get(entry['effect']['type'])
+        if effect_class is None or not effect_class.linear:
+            continue
+        source = entry['sources'][0] if len(entry['sources']) == 1 else None
+        if source in groups and counts.get(source) == 1:
+            group = groups.pop(source)  # solo la última del grupo admite otra detrás
+            group.append(entry)
+        else:
+            group = [entry]
+        groups[entry['key']] = group
+
+    fused = []
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        last = group[-1]
+        stages = [{'type': entry['effect']['type'], 'params': _params(entry['effect'])}
+                  for entry in group]
+        if all(stage['type'] == 'gain' for stage in stages):
+            volume = float(np.prod([stage['params']['volume'] for stage in stages]))
+            effect = {'type': 'gain', 'params': {'volume': volume}}
+        else:
+            effect = {'type': 'linear', 'params': {'stages': stages}}
+        if last['effect'].get('id') is not None:
+            effect['id'] = last['effect']['id']
+        # Ocupa el lugar de la última: sus lectores no cambian
+        last_index = entries.index(last)
+        entries[last_index] = {'key': last['key'], 'effect': effect,
+                               'sources': group[0]['sources']}
+        fused.extend(group[:-1])
+        report.append(f"fundidos {' + '.join(_label(entry) for entry in group)}: "
+                      + ("una ganancia" if effect['type'] == 'gain' else "una cascada SOS"))
+    return [entry for entry in entries if not any(entry is other for other in fused)]
+
+
+def optimize_chain(chain):
+    """Devuelve (cadena optimizada, informe con una línea por cambio).
+
+    No modifica la cadena recibida. Acepta el formato de build_processing_chain
+    (con 'inputs') y las cadenas serie de presets.py, y devuelve el mismo.
+    """
+    series = not any('inputs' in effect for effect in chain)
+    report = []
+    entries = _normalize(chain)
+    entries = _remove_dead(entries, report)
+    entries = _remove_identities(entries, report)
+    entries = _fuse_linear(entries, report)
+    # Una fusión puede dejar una ganancia de 1.0
+    entries = _remove_identities(entries, report)
+    return _denormalize(entries, series), report
+
+
+def compare_chains(chain, optimized, sample_rate=44100, channels=1, seconds=1.0,
+                   block_size=1024, seed=0):
+    """Máxima diferencia absoluta entre ambas cadenas con el mismo ruido de entrada"""
+    from audio_processor import AudioProcessor  # el optimizador no necesita el motor
+
+    rng = np.random.default_rng(seed)
+    audio = (rng.standard_normal((int(seconds * sample_rate), channels)) * 0.1).astype(np.float32)
+    outputs = []
+    for candidate in (chain, optimized):
+        processor = AudioProcessor(sample_rate=sample_rate, channels=channels)
+        processor.set_chain(candidate)
+        outputs.append(np.concatenate([processor.run(audio[i:i + block_size]).copy()
+                                       for i in range(0, len(audio), block_size)]))
+    return float(np.abs(outputs[0] - outputs[1]).max())
+
+
+def main():
+    from node_graph import load_graph, build_processing_chain
+
+    parser = argparse.ArgumentParser(description="Optimiza un preset y comprueba que suena igual")
+    parser.add_argument('preset', help="Preset guardado desde el editor (.json)")
+    parser.add_argument('-r', '--rate', type=int, default=44100, help="Frecuencia de muestreo")
+    args = parser.parse_args()
+
+    chain = build_processing_chain(load_graph(args.preset))
+    optimized, report = optimize_chain(chain)
+    print(f"🧹 {len(chain)} nodos -> {len(optimized)}")
+    for line in report:
+        print(f"   - {line}")
+    error = compare_chains(chain, optimized, args.rate)
+    print(f"✅ Diferencia máxima con la cadena original: {error:.1e}")
+
+
+if __name__ == "__main__":
+    main()
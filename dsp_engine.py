@@ -0,0 +1,206 @@
+"""
+Proceso del motor de audio: abre el stream y ejecuta el DSP sin interfaz
+Lo arranca DSPProcess (dsp_process.py); no se ejecuta a mano.
+
+Es también el módulo principal del proceso hijo: con spawn, el hijo
+importa el __main__ del padre, que en las apps importaría Tk y la interfaz
+entera. DSPProcess lo arranca con este módulo como __main__, así que el
+motor solo carga numpy, los efectos y el backend de audio que se pida.
+"""
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
+from time import perf_counter
+import numpy as np
+from audio_processor import AudioProcessor, pause_gc, resume_gc
+from dsp_process import MessageRing
+from dsp_worker import DSPWorker
+
+REPORT_INTERVAL = 0.25  # segundos entre envíos de métricas
+CONTROL_POLL = 0.01     # segundos entre lecturas de la cola de control
+
+
+def float_callback(target, stats):
+    """Callback float32 (sounddevice y reloj): como el de las apps, sin prints"""
+    def callback(indata, outdata, frames, time_info, status):
+        start = perf_counter()
+        if status:
+            stats.record_xruns(status.input_underflow, status.input_overflow,
+                               status.output_underflow, status.output_overflow)
+        try:
+            target.process_into(indata, outdata)
+        except Exception as e:
+            stats.record_error(e)
+            outdata[:] = indata
+        stats.record(perf_counter() - start, frames)
+    return callback
+
+
+@contextmanager
+def sounddevice_stream(config, target, stats):
+    import sounddevice as sd
+
+    with sd.Stream(samplerate=config['sample_rate'], blocksize=config['block_size'],
+                   device=config['device'], channels=config['channels'], dtype=np.float32,
+                   latency=config['latency'], callback=float_callback(target, stats)) as stream:
+        yield stream.latency
+
+
+@contextmanager
+def pyaudio_stream(config, target, stats):
+    import pyaudio
+
+    def callback(in_data, frame_count, time_info, status):
+        start = perf_counter()
+        if status:
+            stats.record_xruns(status & pyaudio.paInputUnderflow,
+                               status & pyaudio.paInputOverflow,
+                               status & pyaudio.paOutputUnderflow,
+                               status & pyaudio.paOutputOverflow)
+        try:
+            processed = target.process(in_data)
+        except Exception as e:
+            stats.record_error(e)
+            processed = in_data
+        stats.record(perf_counter() - start, frame_count)
+        return (processed, pyaudio.paContinue)
+
+    audio = pyaudio.PyAudio()
+    try:
+        stream = audio.open(format=pyaudio.paInt16, channels=config['channels'],
+                            rate=config['sample_rate'], input=True, output=True,
+                            input_device_index=config['device'][0],
+                            output_device_index=config['device'][1],
+                            frames_per_buffer=config['block_size'], stream_callback=callback)
+        try:
+            stream.start_stream()
+            yield (stream.get_input_latency(), stream.get_output_latency())
+        finally:
+            stream.stop_stream()
+            stream.close()
+    finally:
+        audio.terminate()
+
+
+@contextmanager
+def clock_stream(config, target, stats):
+    """Sin dispositivo: un hilo llama al callback al ritmo del bloque.
+
+    Entra ruido suave y la salida se descarta. Sirve para medir el motor
+    (benchmark.py --suite worker) y probarlo sin tarjeta de sonido.
+    """
+    block_size = config['block_size']
+    period = block_size / config['sample_rate']
+    rng = np.random.default_rng(0)
+    indata = (rng.standard_normal((block_size, config['channels'])) * 0.1).astype(np.float32)
+    outdata = np.zeros_like(indata)
+    callback = float_callback(target, stats)
+    stop = threading.Event()
+
+    def run():
+        start = perf_counter()
+        index = 0
+        while not stop.is_set():
+            delay = start + index * period - perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            callback(indata, outdata, block_size, None, None)
+            index += 1
+
+    thread = threading.Thread(target=run, name="clock-stream", daemon=True)
+    thread.start()
+    try:
+        yield (period, period)
+    finally:
+        stop.set()
+        thread.join()
+
+
+BACKENDS = {
+    'sounddevice': sounddevice_stream,
+    'pyaudio': pyaudio_stream,
+    'clock': clock_stream,
+}
+
+
+def report(processor, worker):
+    """Métricas para la interfaz: las del callback y, si lo hay, las del hilo DSP"""
+    summary = processor.stats.summary()
+    if worker is not None:
+        summary += "\n" + worker.summary()
+    return {
+        'callback': processor.stats.snapshot(),
+        'underruns': worker.underruns if worker is not None else 0,
+        'summary': summary,
+    }
+
+
+def publish_primed(processor, chain, block_size):
+    """Compila la cadena, la ceba con un bloque de silencio y la publica.
+
+    Como en PresetBank: el primer bloque del plan en el callback ya no diseña
+    filtros ni reserva buffers (el motor arranca sin nada en caché).
+    """
+    plan = processor.compile_plan(chain)
+    plan.prime(block_size)
+    processor.publish(plan)
+
+
+def serve(config, control, status):
+    """Abre el stream y atiende los mensajes de control hasta 'stop'"""
+    block_size = config['block_size']
+    processor = AudioProcessor(sample_rate=config['sample_rate'], crossfade=config['crossfade'],
+                               channels=config['channels'], block_size=block_size)
+    publish_primed(processor, config['chain'], block_size)
+    processor.scratch.get('crossfade', block_size)  # buffer del fundido entre planes
+    # Con margen, el callback del motor solo copia y el DSP corre en un hilo
+    # del motor (un bloque lento no deja al dispositivo sin salida)
+    worker = None
+    if config['margin']:
+        worker = DSPWorker(processor, block_size, config['margin'])
+        worker.start()
+    parent = multiprocessing.parent_process()
+    # Antes de abrir el stream: la recolección inicial retiene el GIL un buen rato
+    pause_gc(config['gc'])
+    try:
+        with BACKENDS[config['backend']](config, worker or processor, processor.stats) as latency:
+            status.send(('ready', latency))
+            next_report = 0.0
+            while True:
+                message = control.receive()
+                while message is not None:
+                    if message[0] == 'chain':
+                        publish_primed(processor, message[1], block_size)
+                    elif message[0] == 'param':
+                        processor.set_param(*message[1:])
+                    elif message[0] == 'stop':
+                        return
+                    message = control.receive()
+
+                now = perf_counter()
+                if now >= next_report:
+                    status.send(('stats', report(processor, worker)))
+                    next_report = now + REPORT_INTERVAL
+                    # Si la interfaz murió sin avisar, no quedarse huérfano
+                    if parent is not None and not parent.is_alive():
+                        return
+                time.sleep(CONTROL_POLL)
+    finally:
+        resume_gc(config['gc'])
+        if worker is not None:
+            worker.stop()
+
+
+def run_engine(config):
+    """Punto de entrada del proceso DSP (ver DSPProcess.start)"""
+    control = MessageRing(*config['control'])
+    status = MessageRing(*config['status'])
+    try:
+        serve(config, control, status)
+    except Exception as e:
+        # Dispositivo ocupado, backend sin instalar... que la interfaz lo muestre
+        status.send(('error', f"{type(e).__name__}: {e}"))
+    finally:
+        control.close()
+        status.close()
@@ -0,0 +1,240 @@
+"""
+Motor de audio en un proceso aparte: stream y DSP sin GIL compartido con Tk
+"""
+import multiprocessing
+import pickle
+import sys
+import time
+from multiprocessing import shared_memory
+from time import perf_counter
+import numpy as np
+from dsp_worker import RingBuffer, DSPWorker
+
+
+class SharedRing(RingBuffer):
+    """RingBuffer con datos y contadores en un bloque de memoria compartida.
+
+    El que la crea (name=None) es su dueño y la libera con close(unlink=True);
+    el otro proceso se conecta con el mismo nombre, capacidad, canales y tipo
+    (spec()). Entre procesos no hay GIL que ordene las escrituras: los
+    contadores son enteros de 64 bits alineados (se escriben de una vez) y
+    cada lado publica el suyo después de copiar los datos, como en
+    RingBuffer; en x86 el orden de las escrituras se respeta.
+    """
+
+    HEADER = 16  # dos contadores int64
+
+    def __init__(self, capacity, channels=1, dtype=np.float32, name=None):
+        dtype = np.dtype(dtype)
+        if name is None:
+            size = self.HEADER + capacity * channels * dtype.itemsize
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        counters = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf)
+        buffer = np.ndarray((capacity, channels), dtype=dtype, buffer=self.shm.buf,
+                            offset=self.HEADER)
+        if name is None:
+            counters[:] = 0
+        super().__init__(capacity, channels, dtype, buffer, counters)
+
+    def spec(self):
+        """Argumentos para conectarse desde el otro proceso"""
+        return (self.capacity, self.buffer.shape[1], self.buffer.dtype.str, self.shm.name)
+
+    def close(self, unlink=False):
+        """Suelta la memoria compartida (unlink: la borra, solo el dueño)"""
+        if self.shm is None:
+            return
+        # Los arrays apuntan a shm.buf: hay que soltarlos antes de cerrar
+        self.buffer = None
+        self.counters = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
+
+
+class MessageRing(SharedRing):
+    """Cola de mensajes (objetos pickle) sobre una SharedRing de bytes.
+
+    Cada mensaje se escribe entero (longitud + datos) en una sola write, así
+    que el lector nunca ve medio mensaje. Si no cabe, send() lo descarta y
+    devuelve False (DSPProcess.send reintenta). No es para el camino de audio: reserva al serializar.
+    """
+
+    def __init__(self, capacity, name=None):
+        super().__init__(capacity, 1, np.uint8, name)
+
+    def spec(self):
+        return (self.capacity, self.shm.name)
+
+    def send(self, message):
+        payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+        frame = np.frombuffer(len(payload).to_bytes(4, 'little') + payload, dtype=np.uint8)
+        if self.space() < len(frame):
+            return False
+        self.write(frame[:, np.newaxis])
+        return True
+
+    def receive(self):
+        """Siguiente mensaje, o None si no hay"""
+        if self.available() < 4:
+            return None
+        header = np.empty((4, 1), dtype=np.uint8)
+        self.read(header)
+        payload = np.empty((int.from_bytes(header.tobytes(), 'little'), 1), dtype=np.uint8)
+        self.read(payload)
+        return pickle.loads(payload.tobytes())
+
+
+class DSPProcess:
+    """Stream y DSP en otro proceso, con su propio intérprete.
+
+    El proceso del motor (dsp_engine.py) abre el stream de PortAudio y
+    procesa en su propio callback, directamente o con un hilo DSP del motor
+    si margin > 0. Ningún bloque de audio pasa por este proceso: la interfaz
+    solo envía mensajes de control (set_chain, set_param, stop) y lee las
+    métricas que el motor le manda, así que los redibujados del editor y la
+    ventana de propiedades nunca retienen el GIL que necesita el callback.
+    El `processor` local sigue siendo la referencia de formato, cadena y
+    latencia, pero no procesa.
+    """
+
+    LABEL = "Proceso DSP"
+    MESSAGE_BYTES = 1 << 16  # por cola de mensajes
+    START_TIMEOUT = 15.0     # segundos para que el stream del motor esté abierto
+    SEND_TIMEOUT = 0.5       # segundos esperando sitio en la cola de control
+
+    def __init__(self, processor, block_size, margin=0, device=(None, None), latency='high',
+                 backend='sounddevice', gc_mode='freeze'):
+        self.processor = processor
+        self.block_size = block_size
+        self.margin = max(0, min(int(margin or 0), DSPWorker.MAX_MARGIN))
+        self.device = device
+        self.stream_latency = latency  # 'low'/'high' para sounddevice
+        self.backend = backend         # 'sounddevice', 'pyaudio' o 'clock' (sin dispositivo)
+        self.gc_mode = gc_mode
+        self.device_latency = (None, None)  # (entrada, salida) del stream del motor
+        self.control = None  # interfaz -> motor
+        self.status = None   # motor -> interfaz
+        self._snapshot = None
+        self._process = None
+        self.running = False
+
+    @property
+    def latency(self):
+        """Latencia añadida por el margen del hilo DSP del motor, en segundos"""
+        return self.margin * self.block_size / self.processor.sample_rate
+
+    def start(self):
+        """Arranca el motor y espera a que su stream esté abierto.
+
+        Lanza RuntimeError con el motivo si el motor no llega a abrirlo.
+        """
+        import dsp_engine
+
+        self.control = MessageRing(self.MESSAGE_BYTES)
+        self.status = MessageRing(self.MESSAGE_BYTES)
+        config = {
+            'control': self.control.spec(),
+            'status': self.status.spec(),
+            'sample_rate': self.processor.sample_rate,
+            'channels': self.processor.channels,
+            'crossfade': self.processor.crossfade,
+            'chain': self.processor.chain,
+            'block_size': self.block_size,
+            'margin': self.margin,
+            'backend': self.backend,
+            'device': self.device,
+            'latency': self.stream_latency,
+            'gc': self.gc_mode,
+        }
+        # spawn también en Linux: hacer fork de un proceso con Tk y PortAudio
+        # no es seguro
+        context = multiprocessing.get_context('spawn')
+        self._process = context.Process(target=dsp_engine.run_engine, args=(config,),
+                                        name="dsp-engine", daemon=True)
+        # spawn vuelve a importar en el hijo el __main__ del padre (la app,
+        # con Tk): que importe el del motor. Process.start lo lee en el acto.
+        main = sys.modules['__main__']
+        sys.modules['__main__'] = dsp_engine
+        try:
+            self._process.start()
+        finally:
+            sys.modules['__main__'] = main
+
+        deadline = perf_counter() + self.START_TIMEOUT
+        while True:
+            message = self.status.receive()
+            if message is not None and message[0] == 'ready':
+                self.device_latency = message[1]
+                break
+            if message is not None and message[0] == 'error':
+                self.stop()
+                raise RuntimeError(f"El proceso DSP no arrancó: {message[1]}")
+            if not self._process.is_alive() or perf_counter() > deadline:
+                self.stop()
+                raise RuntimeError("El proceso DSP no arrancó")
+            time.sleep(0.01)
+        self.running = True
+
+    def stop(self):
+        self.running = False
+        if self._process is not None:
+            self.control.send(('stop',))
+            self._process.join(timeout=2.0)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+            self._process = None
+        for ring in (self.control, self.status):
+            if ring is not None:
+                ring.close(unlink=True)
+        self.control = self.status = None
+
+    def set_chain(self, chain):
+        self.processor.set_chain(chain)
+        self.send(('chain', chain))
+
+    def set_param(self, node_id, name, value):
+        # Los nodos, solo en el motor: el procesador local no procesa y nunca
+        # vaciaría la cola. Su cadena sí lo guarda para el próximo arranque
+        self.processor.record_param(node_id, name, value)
+        self.send(('param', node_id, name, value))
+
+    def send(self, message):
+        """Envía un mensaje de control al motor.
+
+        Si la cola está llena reintenta, con esperas cada vez más largas,
+        mientras el motor la vacía. Lanza RuntimeError si el motor no está
+        vivo o no hay sitio en SEND_TIMEOUT: el mensaje no se pierde en
+        silencio.
+        """
+        deadline = perf_counter() + self.SEND_TIMEOUT
+        wait = 0.001
+        while not self.control.send(message):
+            if self._process is None or not self._process.is_alive():
+                raise RuntimeError(f"El proceso DSP no está en marcha ('{message[0]}' sin enviar)")
+            if perf_counter() > deadline:
+                raise RuntimeError(f"Cola de control llena: '{message[0]}' sin enviar")
+            time.sleep(wait)
+            wait = min(wait * 2, 0.05)
+
+    def snapshot(self):
+        """Últimas métricas que envió el motor: 'callback' (CallbackStats.snapshot),
+        'underruns' del hilo DSP y 'summary' en texto; None hasta el primer envío"""
+        if self.status is not None:
+            message = self.status.receive()
+            while message is not None:
+                if message[0] == 'stats':
+                    self._snapshot = message[1]
+                message = self.status.receive()
+        return self._snapshot
+
+    def summary(self):
+        """Texto corto para la interfaz: métricas del callback del motor"""
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return f"{self.LABEL}: esperando métricas"
+        return f"{self.LABEL}: stream y DSP en el motor\n{snapshot['summary']}"
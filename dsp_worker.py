@@ -0,0 +1,254 @@
+"""
+DSP fuera del callback de PortAudio: colas circulares sin locks y un hilo de proceso
+"""
+import threading
+import time
+from time import perf_counter
+import numpy as np
+from callback_stats import CallbackStats
+from effects import Scratch
+
+
+class RingBuffer:
+    """Cola circular de frames float32 para un productor y un consumidor (SPSC).
+
+    Sin locks: el productor solo avanza `written` y el consumidor solo
+    `consumed`, y cada uno publica su contador después de copiar los datos.
+    Con el GIL, asignar un entero es atómico, así que el otro hilo nunca ve
+    un contador adelantado respecto a los datos. La memoria se reserva al
+    crearla; write/read solo copian con slicing.
+
+    `buffer` y `counters` permiten poner datos y contadores en memoria
+    compartida entre procesos (ver dsp_process.py); por defecto son arrays
+    propios.
+    """
+
+    def __init__(self, capacity, channels=1, dtype=np.float32, buffer=None, counters=None):
+        self.capacity = capacity
+        if buffer is None:
+            buffer = np.zeros((capacity, channels), dtype=dtype)
+        if counters is None:
+            counters = np.zeros(2, dtype=np.int64)
+        self.buffer = buffer
+        # [frames escritos (solo el productor), frames leídos (solo el consumidor)]
+        self.counters = counters
+
+    @property
+    def written(self):
+        return int(self.counters[0])
+
+    @written.setter
+    def written(self, value):
+        self.counters[0] = value
+
+    @property
+    def consumed(self):
+        return int(self.counters[1])
+
+    @consumed.setter
+    def consumed(self, value):
+        self.counters[1] = value
+
+    def available(self):
+        """Frames listos para leer"""
+        return self.written - self.consumed
+
+    def space(self):
+        """Frames que caben sin pisar datos no leídos"""
+        return self.capacity - (self.written - self.consumed)
+
+    def write(self, data):
+        """Copia hasta len(data) frames; devuelve cuántos cupieron"""
+        n = min(len(data), self.space())
+        start = self.written % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            self.buffer[start:end] = data[:n]
+        else:
+            split = self.capacity - start
+            self.buffer[start:] = data[:split]
+            self.buffer[:end - self.capacity] = data[split:n]
+        self.written += n
+        return n
+
+    def skip(self, count):
+        """Descarta hasta count frames sin copiarlos; devuelve cuántos"""
+        count = min(count, self.available())
+        self.consumed += count
+        return count
+
+    def read(self, out):
+        """Copia en out hasta len(out) frames; devuelve cuántos había"""
+        n = min(len(out), self.available())
+        start = self.consumed % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            out[:n] = self.buffer[start:end]
+        else:
+            split = self.capacity - start
+            out[:split] = self.buffer[start:]
+            out[split:n] = self.buffer[:end - self.capacity]
+        self.consumed += n
+        return n
+
+
+class DSPWorker:
+    """Ejecuta el AudioProcessor en un hilo propio, desacoplado del callback.
+
+    El callback solo copia: la entrada a una cola y la salida desde otra.
+    El hilo DSP procesa bloque a bloque en cuanto hay uno completo. La cola
+    de salida arranca con `margin` bloques de silencio: es la latencia
+    añadida y, a cambio, el margen que tiene el DSP para recuperarse de un
+    bloque lento (GIL ocupado por la interfaz, un pico de carga) sin que el
+    callback se quede sin audio. Si aun así falta, el callback rellena con
+    silencio, cuenta un hueco (underrun) y descarta después esos frames
+    cuando llegan tarde, para que la latencia no crezca con cada hueco.
+    Los frames de entrada que no caben (overrun) nunca saldrán: su hueco
+    se rellena sin descartar nada después, o la latencia encogería.
+    """
+
+    LABEL = "Hilo DSP"
+    MAX_MARGIN = 8   # bloques
+    POLLS = 8        # veces por bloque que el hilo DSP mira la entrada
+
+    def __init__(self, processor, block_size, margin=2, rings=None):
+        self.processor = processor
+        self.block_size = block_size
+        self.margin = max(1, min(int(margin), self.MAX_MARGIN))
+        channels = processor.channels
+
+        # Colas de entrada y salida; las subclases pueden pasar las suyas
+        if rings is None:
+            capacity = self.ring_capacity(block_size, self.margin)
+            rings = (RingBuffer(capacity, channels), RingBuffer(capacity, channels))
+        self.input, self.output = rings
+        self._block = np.zeros((block_size, channels), dtype=np.float32)
+        self._result = np.zeros((block_size, channels), dtype=np.float32)
+        self.scratch = Scratch(channels)  # adaptador int16
+
+        # Tiempos del hilo DSP (plazo = duración de un bloque)
+        self.stats = CallbackStats(processor.sample_rate)
+        self.underruns = 0  # callbacks que no encontraron salida suficiente
+        self.overruns = 0   # callbacks cuya entrada no cupo en la cola
+        self._late = 0      # frames rellenados con silencio, a descartar
+        self._dropped = 0   # frames de entrada perdidos, que nunca saldrán
+
+        # El hilo DSP mira la entrada POLLS veces por bloque en vez de que el
+        # callback lo despierte: Event.set() toma un lock, y una escritura
+        # en un pipe suelta el GIL en pleno callback
+        self._poll = block_size / processor.sample_rate / self.POLLS
+        self._thread = None
+        self.running = False
+
+    @staticmethod
+    def ring_capacity(block_size, margin):
+        """Frames por cola: el margen más holgura para callbacks de tamaño irregular"""
+        return (margin + 4) * block_size
+
+    @property
+    def latency(self):
+        """Latencia añadida por el margen, en segundos"""
+        return self.margin * self.block_size / self.processor.sample_rate
+
+    def prime(self):
+        """Llena la salida con el margen de silencio (antes de arrancar)"""
+        self.output.write(np.zeros((self.margin * self.block_size, self.processor.channels),
+                                   dtype=np.float32))
+
+    def start(self):
+        """Ceba la salida con el margen de silencio y arranca el hilo DSP"""
+        self.prime()
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, name="dsp-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def set_chain(self, chain):
+        """Igual que AudioProcessor.set_chain (el hilo comparte el procesador)"""
+        self.processor.set_chain(chain)
+
+    def set_param(self, node_id, name, value):
+        """Igual que AudioProcessor.set_param"""
+        self.processor.set_param(node_id, name, value)
+
+    def pump(self):
+        """Procesa todos los bloques completos que quepan en la salida"""
+        block = self._block
+        n = self.block_size
+        while self.input.available() >= n and self.output.space() >= n:
+            start = perf_counter()
+            self.input.read(block)
+            try:
+                np.clip(self.processor.run(block), -1.0, 1.0, out=self._result)
+            except Exception as e:
+                # El bloque sale sin procesar: la cola de salida no se vacía
+                self.stats.record_error(e)
+                np.clip(block, -1.0, 1.0, out=self._result)
+            self.output.write(self._result)
+            self.stats.record(perf_counter() - start, n)
+
+    def _loop(self):
+        while self.running:
+            try:
+                self.pump()
+            except Exception as e:
+                # Un fallo no debe terminar el hilo: el callback se quedaría sin audio
+                self.stats.record_error(e)
+            time.sleep(self._poll)
+
+    # Lado del callback: solo copias, sin DSP
+
+    def process_into(self, indata, outdata):
+        """Igual que AudioProcessor.process_into, pero a través de las colas"""
+        written = self.input.write(indata)
+        if written < len(indata):
+            self.overruns += 1
+            self._dropped += len(indata) - written
+        if self._late:
+            self._late -= self.output.skip(self._late)
+        count = self.output.read(outdata)
+        if count < len(outdata):
+            outdata[count:] = 0
+            self.underruns += 1
+            missing = len(outdata) - count
+            lost = min(missing, self._dropped)
+            self._dropped -= lost
+            self._late += missing - lost
+
+    def process(self, audio_data):
+        """Adaptador int16 (bytes entrelazados) para PyAudio"""
+        if len(audio_data) == 0:
+            return audio_data
+
+        pcm = np.frombuffer(audio_data, dtype=np.int16).reshape(-1, self.processor.channels)
+        n = len(pcm)
+        audio = self.scratch.get('input', n)
+        audio[:] = pcm
+        audio *= 1 / 32768.0
+        output = self.scratch.get('output', n)
+        self.process_into(audio, output)
+        output *= 32768.0
+        np.clip(output, -32768, 32767, out=output)
+        pcm = self.scratch.get('pcm', n, np.int16)
+        pcm[:] = output
+        return pcm.tobytes()
+
+    def snapshot(self):
+        """Métricas del DSP (CallbackStats.snapshot)"""
+        return self.stats.snapshot()
+
+    def summary(self):
+        """Texto corto para la interfaz"""
+        stats = self.snapshot()
+        text = (f"{self.LABEL}: margen {self.margin} bloques (+{self.latency * 1000:.1f} ms) · "
+                f"carga media {stats['mean_load'] * 100:.0f}% · "
+                f"peor {stats['worst_load'] * 100:.0f}% · "
+                f"huecos {self.underruns} · desbordes {self.overruns}")
+        if stats['errors']:
+            text += f"\n⚠️ Error en el DSP: {stats['last_error']}"
+        return text
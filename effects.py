@@ -0,0 +1,1719 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import kernels
+from wav_io import read_wav
+
+# scipy.signal tarda más de un segundo en importarse: se importa al diseñar
+# el primer filtro (load_signal), nunca en el hilo de audio
+signal = None
+_sosfilt = None
+_signal_lock = threading.Lock()
+
+
+def load_signal():
+    """Importa scipy.signal (y el núcleo in-place de sosfilt) la primera vez"""
+    global signal, _sosfilt
+    with _signal_lock:
+        if signal is None:
+            from scipy import signal as module
+            try:
+                # Núcleo in-place de sosfilt: filtra sobre un buffer preasignado sin copias
+                from scipy.signal._sosfilt import _sosfilt
+            except ImportError:
+                _sosfilt = None
+            signal = module
+    return signal
+
+
+def prewarm():
+    """Carga por adelantado scipy.signal y los núcleos JIT.
+
+    Las apps la lanzan en un hilo tras mostrar la ventana, para que el
+    primer efecto que se añada no congele la interfaz.
+    """
+    load_signal()
+    for name in kernels.KERNELS:
+        kernels.load(name)
+
+
+def sosfilt_inplace(sos, x, zi):
+    """Filtra x (float64, forma (canales, n)) in-place y actualiza zi (canales, secciones, 2)"""
+    if _sosfilt is not None:
+        _sosfilt(sos, x, zi)
+    else:
+        for channel in range(len(x)):
+            x[channel], zi[channel] = signal.sosfilt(sos, x[channel], zi=zi[channel])
+
+
+def one_pole_sos(coef):
+    """Paso bajo de un polo y = (1 - c) x + c y[n-1] como una sección SOS"""
+    load_signal()  # la filtra sosfilt_inplace
+    return np.array([[1 - coef, 0.0, 0.0, 1.0, -coef, 0.0]])
+
+
+def set_one_pole(sos, coef):
+    """Cambia en su sitio el coeficiente de una sección de one_pole_sos (sin reservar)"""
+    sos[0, 0] = 1 - coef
+    sos[0, 4] = -coef
+
+
+class Scratch:
+    """Buffers de trabajo preasignados, por nombre.
+
+    get(name, n) devuelve una vista (n, canales) y solo reserva memoria la
+    primera vez o cuando llega un bloque mayor que cualquiera anterior: tras
+    el primer bloque (calentamiento) el proceso no crea arrays nuevos.
+    Cada operación trabaja en un solo dtype y sobre operandos de la misma
+    forma; mezclar float32 y float64, o difundir un vector sobre un bloque
+    de varios canales, hace que el ufunc reserve buffers intermedios, así
+    que se copia antes (x[:] = y, que sí difunde sin reservar).
+    """
+
+    def __init__(self, channels=1):
+        self.channels = channels
+        self.buffers = {}
+
+    def get(self, name, n, dtype=np.float32):
+        buffer = self.buffers.get(name)
+        if buffer is None or len(buffer) < n:
+            buffer = self.buffers[name] = np.zeros((n, self.channels), dtype=dtype)
+        return buffer[:n]
+
+    def rows(self, name, n):
+        """Buffer float64 (canales, n) contiguo, el formato de sosfilt_inplace"""
+        size = self.channels * n
+        buffer = self.buffers.get(name)
+        if buffer is None or len(buffer) < size:
+            buffer = self.buffers[name] = np.zeros(size)
+        return buffer[:size].reshape(self.channels, n)
+
+    def shared(self, name, n, dtype=np.float32):
+        """Buffer 1-D de n muestras común a todos los canales (rampas, índices)"""
+        buffer = self.buffers.get(name)
+        if buffer is None or len(buffer) < n:
+            buffer = self.buffers[name] = np.zeros(n, dtype=dtype)
+        return buffer[:n]
+
+    def arange(self, n):
+        """0, 1, ..., n - 1 en float64, sin recalcularlo en cada bloque"""
+        buffer = self.buffers.get('arange')
+        if buffer is None or len(buffer) < n:
+            buffer = self.buffers['arange'] = np.arange(float(n))
+        return buffer[:n]
+
+
+class Effect:
+    """Nodo de efecto compilado.
+
+    Los parámetros, coeficientes y el estado se resuelven una sola vez en
+    ``prepare``/``reset``; ``process`` solo hace aritmética sobre el bloque,
+    con ``out=`` sobre buffers de ``self.scratch``. El resultado es una vista
+    de un buffer del nodo (o la propia entrada): vale hasta la siguiente
+    llamada a ``process``.
+
+    Los bloques tienen forma (muestras, canales), el mismo entrelazado que
+    PortAudio y los WAV: cada operación se aplica a todos los canales a la
+    vez, cualquier tramo de tiempo es contiguo en memoria y el estado
+    (líneas de retardo, memoria de filtros) se reserva por canal al crear el
+    nodo. Un bloque 1-D se procesa como mono.
+
+    Los efectos con recursión por muestra pueden usar núcleos JIT
+    (kernels.py, listados en ``jit_kernels``); con el backend NumPy
+    ``self.jit[nombre]`` es None y se usa el camino vectorizado, con el
+    mismo resultado.
+
+    set_param no cambia el parámetro de golpe: fija un objetivo al que
+    advance() se acerca bloque a bloque en SMOOTHING segundos. Los
+    coeficientes escalares listados en ``ramped`` se interpolan además
+    muestra a muestra dentro del bloque (pasan a ser arrays mientras dura
+    la rampa, en buffers del nodo: ver ramp), así que no hay saltos
+    audibles ni reservas por bloque.
+
+    Los parámetros de ``designed`` rediseñan un filtro SOS. plan_ramp
+    diseña de antemano, en el hilo que cambia el parámetro, los
+    RAMP_STEPS pasos de su rampa; en el hilo de audio advance() solo cambia
+    a coeficientes ya diseñados (ver SosFilter.design).
+    """
+
+    defaults = {}
+
+    # Identificador del nodo en el editor (lo asigna compile_chain)
+    id = None
+
+    SMOOTHING = 0.03  # segundos para llegar a un valor nuevo
+
+    # Coeficientes calculados en prepare que se interpolan por muestra
+    ramped = ()
+
+    # Latencia algorítmica en muestras
+    latency = 0
+
+    # Atributos con el estado entre bloques (ver adopt)
+    state = ()
+
+    # Núcleos de kernels.py que usa el efecto
+    jit_kernels = ()
+
+    # Parámetros que cambian la forma del nodo (filtros, estado): no tienen
+    # rampa y solo cambian recompilando la cadena, con fundido
+    structural = ()
+
+    # Parámetros que rediseñan un filtro -> rejilla de sus valores en plena
+    # rampa (los pasos caen en ella y reutilizan diseños de FILTER_CACHE)
+    designed = {}
+
+    RAMP_STEPS = 8  # diseños por rampa de un parámetro de `designed`
+
+    def __init__(self, params, sample_rate=44100, channels=1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.params = dict(self.defaults)
+        self.params.update(params or {})
+        self.targets = {}    # nombre -> (objetivo, avance por muestra)
+        self.ramp_end = {}   # coeficientes rampeados -> valor final escalar
+        self.ramp_plans = {}  # parámetro de `designed` -> (objetivo, distancia entre pasos)
+        self.scratch = Scratch(channels)
+        self.ramps = Scratch(channels)  # rampas por muestra de `ramped` (ver ramp)
+        # Se cargan aquí (compilación o caché de disco), nunca en el callback
+        self.jit = {name: kernels.load(name) for name in self.jit_kernels}
+        self.prepare()
+        self.reset()
+
+    # Efecto lineal e invariante sin latencia que transfer() describe como
+    # ganancia + SOS: chain_optimizer.py funde los contiguos en LinearStage
+    linear = False
+
+    @classmethod
+    def is_identity(cls, params):
+        """True si con estos parámetros (defaults incluidos) devuelve la entrada tal cual"""
+        return False
+
+    @classmethod
+    def for_block(cls, params, block_size):
+        """Parámetros para un stream de bloques de block_size muestras (None si no se sabe)"""
+        return params
+
+    @classmethod
+    def transfer(cls, params, sample_rate):
+        """(ganancia, secciones SOS o None) de un efecto lineal"""
+        raise NotImplementedError
+
+    def prepare(self):
+        """Calcula coeficientes a partir de self.params (sin tocar el estado)"""
+
+    def reset(self):
+        """Inicializa el estado entre bloques (buffers, memoria de filtros)"""
+
+    def adopt(self, other):
+        """Hereda el estado de otro nodo del mismo tipo (solo asigna referencias)"""
+        for name in self.state:
+            setattr(self, name, getattr(other, name))
+
+    def set_param(self, name, value):
+        """Fija el objetivo de un parámetro; se alcanza con una rampa (hilo de audio)"""
+        if name not in self.params or name in self.structural:
+            return
+        distance = abs(float(value) - self.params[name])
+        if distance:
+            self.targets[name] = (float(value), distance / (self.SMOOTHING * self.sample_rate))
+
+    def advance(self, n):
+        """Avanza las rampas un bloque de n muestras; devuelve False al terminar"""
+        if self.ramp_end:
+            # El bloque anterior usó rampas por muestra: dejar los valores finales
+            for name, value in self.ramp_end.items():
+                setattr(self, name, value)
+            self.ramp_end = {}
+        if not self.targets:
+            return False
+
+        for name, (target, rate) in list(self.targets.items()):
+            current = self.params[name]
+            if abs(target - current) <= rate * n:
+                self.params[name] = target
+                del self.targets[name]
+            elif target > current:
+                self.params[name] = current + rate * n
+            else:
+                self.params[name] = current - rate * n
+
+        start = {name: getattr(self, name) for name in self.ramped}
+        self.prepare()
+        for name, begin in start.items():
+            end = getattr(self, name)
+            if end != begin:
+                setattr(self, name, self.ramp(name, begin, end, n))
+                self.ramp_end[name] = end
+        return True
+
+    def ramp_line(self, name, begin, end, n):
+        """begin -> end en n muestras (sin begin, con end), float64 en el buffer `name`"""
+        line = self.ramps.shared(name, n, np.float64)
+        np.multiply(self.ramps.arange(n + 1)[1:], (end - begin) / n, out=line)
+        line += begin
+        return line
+
+    def reserve(self, n):
+        """Reserva los buffers de un bloque de n muestras (ProcessingPlan.prime).
+
+        Aquí las rampas; los efectos que no tocan sus buffers mientras
+        están en neutro (y así no los reserva el bloque de silencio) lo
+        amplían.
+        """
+        for name in self.ramped:
+            value = getattr(self, name)
+            self.ramp(name, value, value, n)
+
+    def ramp(self, name, begin, end, n):
+        """Rampa por muestra del coeficiente `name` para un bloque de n muestras.
+
+        Por defecto (muestras, canales) float32, la forma de los bloques: se
+        aplica con out= sin difundir ni convertir (ver Scratch). Vale hasta
+        la siguiente llamada; los efectos que la usan en otra forma la
+        redefinen.
+        """
+        ramp = self.ramps.get(name, n)
+        ramp[:] = self.ramp_line('line', begin, end, n)[:, np.newaxis]
+        return ramp
+
+    def plan_ramp(self, name, value):
+        """Diseña fuera del hilo de audio los filtros de la rampa hacia `value`.
+
+        Lo llama AudioProcessor.set_param en el hilo que mueve el parámetro,
+        antes de encolar el cambio. La rampa pasa por RAMP_STEPS valores de
+        diseño (el último es `value`) y sus coeficientes quedan en el
+        SosFilter del nodo. Si hay otro parámetro de diseño en rampa se
+        toma su objetivo: el diseño final siempre está hecho.
+        """
+        self.plan_ramps({name: value}, self.params)
+
+    def plan_ramps(self, targets, starts):
+        """Como plan_ramp para varios parámetros que salen a la vez de `starts`.
+
+        Con el mismo SMOOTHING todas las rampas llegan juntas, así que el
+        paso k de cada una coincide con el paso k de las demás.
+        """
+        ramps = {}
+        for name, value in targets.items():
+            if name not in self.designed or name in self.structural:
+                continue
+            target = float(value)
+            # Lectura sin lock: en plena rampa puede ir un bloque por detrás
+            distance = target - starts[name]
+            if distance:
+                ramps[name] = (target, abs(distance) / self.RAMP_STEPS, 1 if distance > 0 else -1)
+        if not ramps:
+            return
+        # El objetivo de otra rampa puede estar aún en la cola: el de su plan
+        values = {other: self.ramp_plans[other][0] if other in self.ramp_plans
+                  else self.params[other] for other in self.designed}
+        designs = {}
+        for index in range(self.RAMP_STEPS + 1):
+            for name, (target, spacing, direction) in ramps.items():
+                values[name] = self.ramp_point(name, target, direction * index, spacing)
+            sos_filter, key, designer = self.filter_design(values)
+            if key not in designs:
+                designs[key] = sos_filter.prepare_sos(designer())
+        # Primero los diseños y luego los pasos: advance() nunca redondea a
+        # una rejilla cuyos diseños no estén publicados
+        sos_filter.designs = designs
+        for name, (target, spacing, _) in ramps.items():
+            self.ramp_plans[name] = (target, spacing)
+
+    def plan_takeover(self, other):
+        """Diseña fuera del hilo de audio las rampas de take_over(other)"""
+        self.plan_ramps({name: self.params[name] for name in self.designed}, other.params)
+
+    def take_over(self, other):
+        """Sustituye a `other` (mismo tipo y forma) sin saltos (hilo de audio).
+
+        Hereda su estado y sus valores actuales y llega a los propios con
+        las rampas de set_param; los filtros de esas rampas los diseñó
+        plan_takeover al publicar el plan. Solo asigna referencias y
+        escalares: el primer advance() recalcula los coeficientes. Devuelve
+        True si queda alguna rampa en curso.
+        """
+        self.adopt(other)
+        targets = {name: value for name, value in self.params.items()
+                   if name not in self.structural and other.params[name] != value}
+        if not targets:
+            return False
+        for name, value in targets.items():
+            self.params[name] = other.params[name]
+            self.set_param(name, value)
+        # Los coeficientes con que sonaba `other` (el final de su rampa, si
+        # estaba en una): la rampa por muestra sale de ellos
+        for name in self.ramped:
+            setattr(self, name, other.ramp_end.get(name, getattr(other, name)))
+        return True
+
+    def ramp_point(self, name, target, index, spacing):
+        """Valor de diseño del paso `index` de una rampa hacia `target` (0 = el objetivo)"""
+        if index == 0:
+            return target
+        step = self.designed[name]
+        return round((target - index * spacing) / step) * step
+
+    def planned(self):
+        """True si alguna rampa en curso tiene sus diseños hechos (plan_ramp)"""
+        return any(name in self.ramp_plans for name in self.targets)
+
+    def design_value(self, name):
+        """Valor de `name` (de ``designed``) para diseñar un filtro.
+
+        En plena rampa cae en el paso de plan_ramp más cercano; sin plan
+        (un nodo suelto) se redondea a la rejilla de ``designed``. Así los
+        pasos intermedios reutilizan diseños de FILTER_CACHE en vez de
+        llenarla de valores que no se repiten.
+        """
+        value = self.params[name]
+        if name in self.targets:
+            target = self.targets[name][0]
+            if name in self.ramp_plans:
+                spacing = self.ramp_plans[name][1]
+                return self.ramp_point(name, target, round((target - value) / spacing), spacing)
+            step = self.designed[name]
+            value = round(value / step) * step
+        return value
+
+    def filter_design(self, values):
+        """(SosFilter, clave, diseñador) para los valores de diseño `values` ({nombre: valor})"""
+        raise NotImplementedError
+
+    def design_filter(self):
+        """Diseña el filtro de ``designed`` para los parámetros actuales (desde prepare)"""
+        values = {name: self.design_value(name) for name in self.designed}
+        sos_filter, key, designer = self.filter_design(values)
+        sos_filter.design(key, designer, hold=self.planned())
+
+    @property
+    def layout(self):
+        """Valores de los parámetros estructurales: si cambian, no se hereda el estado"""
+        return tuple(self.params[name] for name in self.structural)
+
+    def process(self, audio):
+        """Procesa un bloque float32 (escala completa = 1.0) y devuelve el resultado"""
+        if audio.ndim == 1:
+            return self.process_block(audio[:, np.newaxis])[:, 0]
+        return self.process_block(audio)
+
+    def process_block(self, audio):
+        """Procesa un bloque (muestras, canales); lo implementa cada efecto"""
+        raise NotImplementedError
+
+
+class SosFilter:
+    """Filtro IIR en secciones de segundo orden con memoria entre bloques.
+
+    Los coeficientes solo se rediseñan cuando cambia la clave de diseño, y
+    el estado ``zi`` se conserva mientras la cascada mantenga su forma.
+    ``designs`` guarda los diseños de una rampa hechos de antemano
+    (Effect.plan_ramp): cambiar a uno de ellos solo asigna referencias.
+
+    Si la cascada es la concatenación de varias etapas que se activan o
+    desactivan según la clave, `layout(clave)` da sus (etapa, secciones):
+    al cambiar de forma, las etapas que siguen conservan su memoria.
+    """
+
+    def __init__(self, channels=1, layout=None):
+        self.channels = channels
+        self.layout = layout
+        self.sos = None
+        self.zi = None
+        self.key = None
+        self.designs = {}  # clave -> SOS (o None) diseñadas fuera del hilo de audio
+        self.states = {}   # secciones -> zi reservado para esa forma de cascada
+        self.scratch = Scratch(channels)
+
+    def design(self, key, designer, hold=False):
+        """Rediseña con designer() solo si key cambió.
+
+        Si la clave está en ``designs`` no se diseña nada. Con `hold` (una
+        rampa con plan) una clave que falta no se diseña en el hilo de
+        audio: se mantienen los coeficientes actuales hasta el siguiente paso.
+        """
+        if key == self.key:
+            return
+        if key in self.designs:
+            sos = self.designs[key]
+        elif hold:
+            return
+        else:
+            sos = designer()
+        self.set_sos(sos, key)
+
+    def prepare_sos(self, sos):
+        """SOS listas para set_sos sin copias, con su zi ya reservado (fuera del hilo de audio)"""
+        if sos is None or len(sos) == 0:
+            return None
+        if len(sos) not in self.states:
+            self.states[len(sos)] = np.zeros((self.channels, len(sos), 2))
+        return np.ascontiguousarray(sos, dtype=np.float64)
+
+    def set_sos(self, sos, key=None):
+        """Cambia los coeficientes conservando el estado si es posible"""
+        sos = self.prepare_sos(sos)
+        previous, previous_key = self.zi, self.key
+        self.key = key
+        if sos is None:
+            self.sos = None
+            self.zi = None
+            return
+        if previous is None or previous.shape[1] != len(sos):
+            # Otra forma de cascada: solo las etapas que siguen conservan su memoria
+            self.zi = self.states[len(sos)]
+            self.zi[:] = 0
+            if previous is not None and self.layout is not None:
+                self.carry(previous, self.layout(previous_key), self.layout(key))
+        self.sos = sos
+
+    def carry(self, previous, old_layout, new_layout):
+        """Copia a self.zi la memoria de las etapas presentes en ambas cascadas"""
+        rows = {}
+        row = 0
+        for stage, count in old_layout:
+            rows[stage] = row
+            row += count
+        row = 0
+        for stage, count in new_layout:
+            if stage in rows:
+                self.zi[:, row:row + count] = previous[:, rows[stage]:rows[stage] + count]
+            row += count
+
+    def reset(self):
+        if self.zi is not None:
+            self.zi[:] = 0
+
+    def adopt(self, other):
+        """Hereda memoria y coeficientes de otro filtro si la cascada tiene la misma forma.
+
+        Si sus parámetros son otros, el siguiente design() cambia desde los heredados.
+        """
+        if self.zi is not None and other.zi is not None and other.zi.shape == self.zi.shape:
+            self.zi = other.zi
+            self.sos = other.sos
+            self.key = other.key
+
+    def process(self, audio, out):
+        """Filtra audio escribiendo en out (puede ser el propio audio)"""
+        if self.sos is None:
+            return audio
+        work = self.scratch.rows('work', len(audio))
+        work[:] = audio.T
+        sosfilt_inplace(self.sos, work, self.zi)
+        out[:] = work.T
+        return out
+
+
+class FilterCache:
+    """Caché LRU de coeficientes diseñados compartida por todo el proceso.
+
+    La clave son los parámetros de diseño (tipo, orden, cortes,
+    frecuencia...), así que los nodos de distintos presets, y un slider
+    que vuelve a un valor ya visitado, reutilizan el mismo array. Los
+    arrays se comparten entre filtros: nadie debe modificarlos. El lock
+    solo protege el diccionario; el diseño se hace fuera de él.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, designer):
+        """Coeficientes de `key`, diseñados con designer() si no están"""
+        with self._lock:
+            sos = self._entries.get(key)
+            if sos is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return sos
+            self.misses += 1
+        sos = designer()
+        with self._lock:
+            self._entries[key] = sos
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return sos
+
+    def clear(self):
+        """Vacía la caché y pone a cero los contadores"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {'size': len(self._entries), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses}
+
+
+FILTER_CACHE = FilterCache()
+# Espectros de respuestas al impulso (ver Convolution): pocos y grandes
+IR_CACHE = FilterCache(maxsize=8)
+
+
+def _cutoffs(cutoff):
+    """Corte(s) como clave de caché (las bandas pasan una lista)"""
+    return tuple(cutoff) if isinstance(cutoff, (list, tuple)) else cutoff
+
+
+def butter_sos(order, cutoff, btype, sample_rate):
+    """Butterworth en formato SOS (de FILTER_CACHE)"""
+    return FILTER_CACHE.get(
+        ('butter', order, _cutoffs(cutoff), btype, sample_rate),
+        lambda: load_signal().butter(order, cutoff, btype, fs=sample_rate, output='sos'))
+
+
+def boost_sos(sos, gain):
+    """Convierte la etapa x + gain * H(x) en secciones SOS equivalentes"""
+    signal = load_signal()
+    b, a = signal.sos2tf(sos)
+    return signal.tf2sos(a + gain * b, a)
+
+
+def boosted_butter_sos(order, cutoff, btype, gain, sample_rate):
+    """Etapa x + gain * H(x) sobre un Butterworth (de FILTER_CACHE)"""
+    return FILTER_CACHE.get(
+        ('boost', order, _cutoffs(cutoff), btype, gain, sample_rate),
+        lambda: boost_sos(butter_sos(order, cutoff, btype, sample_rate), gain))
+
+
+class Equalizer(Effect):
+    """Ecualizador de 3 bandas.
+
+    Cada banda activa es una etapa x + g * H(x); todas se combinan en una
+    única cascada SOS con memoria entre bloques.
+    """
+
+    defaults = {'low': 0, 'mid': 0, 'high': 0}
+
+    # Graves: 0-250 Hz, Medios: 250-4000 Hz, Agudos: 4000+ Hz
+    BANDS = (('low', 250, 'lp'), ('mid', [250, 4000], 'bp'), ('high', 4000, 'hp'))
+
+    # Secciones SOS de cada banda (orden 2; el pasabanda dobla el orden)
+    SECTIONS = {'low': 1, 'mid': 2, 'high': 1}
+
+    GAIN_STEP = 0.25  # dB, rejilla de las ganancias en plena rampa (ver design_value)
+
+    designed = dict.fromkeys([name for name, _, _ in BANDS], GAIN_STEP)
+
+    linear = True
+
+    def __init__(self, params, sample_rate=44100, channels=1):
+        self.filter = SosFilter(channels, self.band_layout)
+        super().__init__(params, sample_rate, channels)
+
+    @classmethod
+    def is_identity(cls, params):
+        return all(params[name] == 0 for name, _, _ in cls.BANDS)
+
+    @classmethod
+    def band_layout(cls, key):
+        """(banda, secciones) de las bandas activas en la cascada de `key`"""
+        gains = key[0]
+        return [(name, cls.SECTIONS[name]) for (name, _, _), gain in zip(cls.BANDS, gains)
+                if gain != 0]
+
+    @classmethod
+    def transfer(cls, params, sample_rate):
+        return 1.0, cls.band_sos(tuple(params[name] for name, _, _ in cls.BANDS), sample_rate)
+
+    @classmethod
+    def band_sos(cls, gains, sample_rate):
+        """Cascada de las bandas activas (ganancias en dB), o None si todas son 0"""
+        stages = [boosted_butter_sos(2, cutoff, btype, 10 ** (gain / 20) - 1, sample_rate)
+                  for (_, cutoff, btype), gain in zip(cls.BANDS, gains) if gain != 0]
+        return np.vstack(stages) if stages else None
+
+    def prepare(self):
+        self.design_filter()
+
+    def filter_design(self, values):
+        gains = tuple(values[name] for name, _, _ in self.BANDS)
+        return self.filter, (gains, self.sample_rate), lambda: self.band_sos(gains, self.sample_rate)
+
+    def reset(self):
+        self.filter.reset()
+
+    def adopt(self, other):
+        self.filter.adopt(other.filter)
+
+    def reserve(self, n):
+        super().reserve(n)
+        self.filter.scratch.rows('work', n)
+        self.scratch.get('out', n)
+
+    def process_block(self, audio):
+        if self.filter.sos is None:
+            return audio
+        return self.filter.process(audio, self.scratch.get('out', len(audio)))
+
+
+class DelayLine:
+    """Línea de retardo circular preasignada.
+
+    Lee con retardo fraccionario (interpolación lineal) y escribe bloques
+    completos con operaciones de slicing, sin bucles por muestra. Guarda
+    todos los canales en un buffer (tamaño, canales) con una sola posición
+    de escritura, así que cada lectura o escritura es una operación.
+    """
+
+    # Buffers de trabajo de las lecturas (ver reserve): (n, canales) o 1-D
+    READ_BUFFERS = (('segment', np.float32), ('read', np.float32), ('current', np.float32),
+                    ('frac', np.float32))
+    SHARED_BUFFERS = (('positions', np.float64), ('whole', np.float64), ('index', np.intp))
+
+    def __init__(self, max_delay, channels=1):
+        # +2: muestra extra para interpolar y margen para retardo máximo
+        self.size = int(np.ceil(max_delay)) + 2
+        self.buffer = np.zeros((self.size, channels), dtype=np.float32)
+        self.write_pos = 0
+        self.scratch = Scratch(channels)
+        self.reserved = 0
+
+    def reserve(self, n):
+        """Reserva ya los buffers para lecturas de hasta n muestras.
+
+        Sin esto la primera vuelta completa de la línea (que puede llegar
+        segundos después) reservaría memoria en pleno stream.
+        """
+        if n <= self.reserved:
+            return
+        self.reserved = n
+        for name, dtype in self.READ_BUFFERS:
+            self.scratch.get(name, n + 1, dtype)
+        for name, dtype in self.SHARED_BUFFERS:
+            self.scratch.shared(name, n + 1, dtype)
+        self.scratch.arange(n + 1)
+
+    def reset(self):
+        self.buffer[:] = 0
+        self.write_pos = 0
+
+    def segment(self, start, length, out=None):
+        """Devuelve buffer[start:start+length] con envoltura circular.
+
+        Sin envoltura es una vista; con ella (o si se pasa out) se copia en
+        out o en un buffer de trabajo de la línea.
+        """
+        start %= self.size
+        end = start + length
+        if end <= self.size and out is None:
+            return self.buffer[start:end]
+        if out is None:
+            out = self.scratch.get('segment', length)
+        if end <= self.size:
+            out[:] = self.buffer[start:end]
+        else:
+            split = self.size - start
+            out[:split] = self.buffer[start:]
+            out[split:] = self.buffer[:end - self.size]
+        return out
+
+    def read(self, delay, length):
+        """Lee length muestras retrasadas delay muestras (delay >= length).
+
+        El resultado es una vista del buffer o de un buffer de trabajo:
+        úsalo antes del siguiente read() o write().
+        """
+        whole = int(delay)
+        frac = float(delay - whole)
+        # seg[j] = x[t - whole - 1 + j]; la salida i interpola seg[i+1] y seg[i]
+        seg = self.segment(self.write_pos - whole - 1, length + 1)
+        if frac == 0:
+            return seg[1:]
+        # seg[1:] * (1 - frac) + seg[:-1] * frac
+        output = self.scratch.get('read', length)
+        np.subtract(seg[:-1], seg[1:], out=output)
+        output *= frac
+        output += seg[1:]
+        return output
+
+    def read_modulated(self, delays, end_offset=0):
+        """Lee con un retardo (fraccionario) distinto por muestra.
+
+        delays[i] es el retardo de la muestra i de un tramo que termina
+        end_offset muestras antes de la posición de escritura (negativo si
+        el tramo aún no se ha escrito). Los retardos son los mismos en
+        todos los canales.
+        """
+        n = len(delays)
+        scratch = self.scratch
+        positions = scratch.shared('positions', n, np.float64)
+        np.subtract(scratch.arange(n), delays, out=positions)
+        positions += self.write_pos - end_offset - n
+        whole = scratch.shared('whole', n, np.float64)
+        np.floor(positions, out=whole)
+        positions -= whole
+        frac = scratch.get('frac', n)
+        frac[:] = positions[:, np.newaxis]
+        index = scratch.shared('index', n, np.intp)
+        index[:] = whole
+
+        # current + (following - current) * frac; 'wrap' hace el módulo
+        current = scratch.get('current', n)
+        np.take(self.buffer, index, axis=0, out=current, mode='wrap')
+        index += 1
+        following = scratch.get('read', n)
+        np.take(self.buffer, index, axis=0, out=following, mode='wrap')
+        following -= current
+        following *= frac
+        following += current
+        return following
+
+    def write(self, data):
+        """Escribe un bloque y avanza la posición de escritura"""
+        length = len(data)
+        end = self.write_pos + length
+        if end <= self.size:
+            self.buffer[self.write_pos:end] = data
+        else:
+            split = self.size - self.write_pos
+            self.buffer[self.write_pos:] = data[:split]
+            self.buffer[:end - self.size] = data[split:]
+        self.write_pos = end % self.size
+
+
+def span(value, start, end):
+    """Tramo de un coeficiente que puede ser escalar o una rampa por muestra.
+
+    La rampa ya tiene la forma (muestras, canales) del bloque (Effect.ramp).
+    """
+    return value[start:end] if isinstance(value, np.ndarray) else value
+
+
+class Echo(Effect):
+    """Eco con retardo fraccionario y retroalimentación real.
+
+    La línea guarda w[n] = x[n] + feedback * w[n - D] y la salida es
+    (1 - mix) * x[n] + mix * w[n - D]. El bloque se procesa en tramos de
+    como mucho D muestras para que cada tramo sea una operación vectorial.
+    """
+
+    defaults = {'delay': 0.3, 'feedback': 0.5, 'mix': 0.5}
+
+    MAX_DELAY = 2.0  # segundos
+
+    state = ('line',)
+
+    ramped = ('delay_samples', 'feedback', 'dry', 'wet')
+
+    jit_kernels = ('echo',)
+
+    @classmethod
+    def is_identity(cls, params):
+        return params['mix'] == 0
+
+    def ramp(self, name, begin, end, n):
+        if name == 'delay_samples':
+            # Retardos por muestra, comunes a los canales (read_modulated)
+            return self.ramp_line(name, begin, end, n)
+        return super().ramp(name, begin, end, n)
+
+    def prepare(self):
+        delay = min(max(self.params['delay'], 0), self.MAX_DELAY)
+        self.delay_samples = max(delay * self.sample_rate, 1.0)
+        self.max_chunk = int(self.delay_samples)
+        self.feedback = self.params['feedback']
+        self.dry = 1 - self.params['mix']
+        self.wet = self.params['mix']
+
+    def reset(self):
+        self.line = DelayLine(self.MAX_DELAY * self.sample_rate, self.channels)
+
+    def process_block(self, audio):
+        n = len(audio)
+        self.line.reserve(n)
+        output = self.scratch.get('out', n)
+        delay = self.delay_samples
+        # Con el retardo en rampa se lee con retardo variable por muestra
+        modulated = isinstance(delay, np.ndarray)
+        max_chunk = max(int(delay.min()), 1) if modulated else self.max_chunk
+
+        kernel = self.jit['echo']
+        if kernel is not None and max_chunk < n:
+            # Retardo más corto que el bloque: en vez de muchos tramos
+            # vectoriales de pocas muestras, un solo bucle compilado
+            if not modulated:
+                delay = self.scratch.shared('delay', 1, np.float64)
+                delay[0] = self.delay_samples
+            shared = self.scratch.shared
+            self.line.write_pos = kernel(
+                self.line.buffer, self.line.write_pos, audio, output,
+                self.scratch.get('delayed', n), delay, modulated,
+                kernels.coefficient(self.dry, shared('dry', n, np.float64)),
+                kernels.coefficient(self.wet, shared('wet', n, np.float64)),
+                kernels.coefficient(self.feedback, shared('feedback', n, np.float64)),
+                max_chunk)
+            return output
+
+        pos = 0
+        while pos < n:
+            end = min(n, pos + max_chunk)
+            x = audio[pos:end]
+            if modulated:
+                delayed = self.line.read_modulated(delay[pos:end], pos - end)
+            else:
+                delayed = self.line.read(delay, end - pos)
+            # salida = x * dry + delayed * wet; línea = x + delayed * feedback
+            out = output[pos:end]
+            feed = self.scratch.get('feed', end - pos)
+            np.multiply(x, span(self.dry, pos, end), out=out)
+            np.multiply(delayed, span(self.wet, pos, end), out=feed)
+            out += feed
+            np.multiply(delayed, span(self.feedback, pos, end), out=feed)
+            feed += x
+            self.line.write(feed)
+            pos = end
+        return output
+
+
+class Reverb(Effect):
+    """Reverberación estilo Freeverb.
+
+    8 filtros comb en paralelo (con paso bajo de amortiguamiento en la
+    realimentación) seguidos de 4 allpass en serie. Todo el estado vive en
+    líneas de retardo que persisten entre bloques, así que la cola continúa
+    más allá del bloque actual. Las longitudes de retardo son fijas, de modo
+    que el coste por bloque no depende de room_size ni damping.
+    """
+
+    defaults = {'room_size': 0.5, 'damping': 0.5, 'mix': 0.3}
+
+    # Afinaciones originales de Freeverb (muestras a 44.1 kHz)
+    COMB_TUNING = (1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617)
+    ALLPASS_TUNING = (556, 441, 341, 225)
+    ALLPASS_FEEDBACK = 0.5
+    FIXED_GAIN = 0.015
+    SCALE_WET = 3.0
+
+    state = ('combs', 'allpasses', 'comb_zi')
+
+    ramped = ('dry', 'wet')
+
+    jit_kernels = ('comb', 'allpass')
+
+    def __init__(self, params, sample_rate=44100, channels=1):
+        # prepare la reescribe en su sitio: en plena rampa no se reserva
+        self.damp_sos = one_pole_sos(0.0)
+        super().__init__(params, sample_rate, channels)
+
+    @classmethod
+    def is_identity(cls, params):
+        return params['mix'] == 0
+
+    def prepare(self):
+        self.feedback = 0.7 + 0.28 * self.params['room_size']
+        self.damp = 0.4 * self.params['damping']
+        set_one_pole(self.damp_sos, self.damp)
+        self.dry = 1 - self.params['mix']
+        self.wet = self.params['mix'] * self.SCALE_WET
+
+    def reset(self):
+        scale = self.sample_rate / 44100.0
+        self.comb_delays = [max(int(d * scale), 1) for d in self.COMB_TUNING]
+        self.allpass_delays = [max(int(d * scale), 1) for d in self.ALLPASS_TUNING]
+        self.combs = [DelayLine(d, self.channels) for d in self.comb_delays]
+        self.allpasses = [DelayLine(d, self.channels) for d in self.allpass_delays]
+        # Memoria del paso bajo de cada comb, por canal
+        self.comb_zi = [np.zeros((self.channels, 1, 2)) for _ in self.comb_delays]
+
+    def process_combs(self, x, output):
+        """Suma en output la salida de los combs para un tramo <= retardo mínimo"""
+        length = len(x)
+        feed = self.scratch.get('feed', length)
+        for i, (line, delay) in enumerate(zip(self.combs, self.comb_delays)):
+            delayed = line.read(delay, length)
+            output += delayed
+            # línea = x + paso_bajo(delayed) * feedback
+            if self.damp:
+                damped = self.scratch.rows('damped', length)
+                damped[:] = delayed.T
+                sosfilt_inplace(self.damp_sos, damped, self.comb_zi[i])
+                damped *= self.feedback
+                feed[:] = damped.T
+            else:
+                np.multiply(delayed, self.feedback, out=feed)
+            feed += x
+            line.write(feed)
+
+    def process_allpass(self, line, delay, audio):
+        """Allpass de Freeverb in-place: y = w[n-D] - x, w = x + g * w[n-D]"""
+        kernel = self.jit['allpass']
+        if kernel is not None:
+            line.write_pos = kernel(line.buffer, line.write_pos, audio, delay,
+                                    self.ALLPASS_FEEDBACK)
+            return
+        n = len(audio)
+        pos = 0
+        while pos < n:
+            end = min(n, pos + delay)
+            x = audio[pos:end]
+            delayed = line.read(delay, end - pos)
+            output = self.scratch.get('allpass', end - pos)
+            np.subtract(delayed, x, out=output)
+            feed = self.scratch.get('feed', end - pos)
+            np.multiply(delayed, self.ALLPASS_FEEDBACK, out=feed)
+            feed += x
+            line.write(feed)
+            audio[pos:end] = output
+            pos = end
+
+    def process_block(self, audio):
+        n = len(audio)
+        for line in self.combs + self.allpasses:
+            line.reserve(n)
+        x = self.scratch.get('input', n)
+        np.multiply(audio, self.FIXED_GAIN, out=x)
+        reverb = self.scratch.get('reverb', n)
+        reverb.fill(0)
+
+        comb = self.jit['comb']
+        if comb is not None:
+            # Cada comb recorre el bloque entero, sin tramos
+            for i, (line, delay) in enumerate(zip(self.combs, self.comb_delays)):
+                line.write_pos = comb(line.buffer, line.write_pos, x, reverb, delay,
+                                      self.feedback, bool(self.damp), self.damp_sos[0],
+                                      self.comb_zi[i])
+        else:
+            chunk = min(self.comb_delays)
+            for pos in range(0, n, chunk):
+                end = min(n, pos + chunk)
+                self.process_combs(x[pos:end], reverb[pos:end])
+
+        for line, delay in zip(self.allpasses, self.allpass_delays):
+            self.process_allpass(line, delay, reverb)
+
+        output = self.scratch.get('out', n)
+        np.multiply(audio, span(self.dry, 0, n), out=output)
+        reverb *= span(self.wet, 0, n)
+        output += reverb
+        return output
+
+
+class Convolution(Effect):
+    """Reverb por convolución con una respuesta al impulso (IR) en WAV.
+
+    Overlap-save con particiones uniformes de B = 'partition' muestras: la
+    IR se parte en P trozos y el espectro de cada uno (FFT de 2B) se
+    calcula al crear el nodo y se guarda en IR_CACHE. Cada partición de
+    entrada se transforma una sola vez y entra en una línea de retardo de
+    espectros; la salida es la suma de los P productos espectro a espectro
+    y una FFT inversa, así que el coste por partición es O(B log B) más
+    O(P B). La entrada se acumula hasta completar una partición: la
+    latencia es exactamente B muestras. Con 'partition' 0 (por defecto) B
+    es el bloque del stream (el permitido más cercano, ver for_block): una
+    FFT por bloque y un bloque de latencia. El render offline usa
+    particiones mayores (menos FFT y menos P por muestra). Las FFT son las
+    de scipy.fft, en float32, que no tienen out=: cada partición reserva
+    sus espectros (unos KB), lo único que no sale de buffers preasignados.
+    """
+
+    defaults = {'ir': '', 'mix': 0.3, 'partition': 0}
+
+    PARTITIONS = (128, 256, 512, 1024, 2048, 4096, 8192)
+    DEFAULT_PARTITION = 256  # automática sin bloque conocido
+    MAX_SECONDS = 10.0  # las IR más largas se recortan
+
+    ramped = ('dry', 'wet')
+
+    state = ('frame', 'spectra', 'head', 'tail', 'fill')
+
+    structural = ('ir', 'partition')
+
+    @classmethod
+    def is_identity(cls, params):
+        # Con IR y mix 0 no lo es: la señal seca sale retrasada una partición
+        return not params['ir']
+
+    @classmethod
+    def for_block(cls, params, block_size):
+        if block_size and not (params or {}).get('partition'):
+            return dict(params or {}, partition=block_size)
+        return params
+
+    def prepare(self):
+        self.dry = 1 - self.params['mix']
+        self.wet = self.params['mix']
+
+    def reset(self):
+        from scipy import fft  # ligero frente a scipy.signal
+        self.rfft = fft.rfft
+        self.irfft = fft.irfft
+        size = int(self.params['partition']) or self.DEFAULT_PARTITION
+        self.partition = min(self.PARTITIONS, key=lambda allowed: abs(allowed - size))
+        path = self.params['ir']
+        self.kernel = self.load_kernel(path) if path else None
+        self.latency = self.partition if self.kernel is not None else 0
+        if self.kernel is None:
+            return
+
+        block = self.partition
+        count, bins, channels = self.kernel.shape
+        # [partición anterior, partición actual]: la ventana de la FFT
+        self.frame = np.zeros((2 * block, channels), dtype=np.float32)
+        # Línea de espectros duplicada: los P últimos son siempre contiguos
+        self.spectra = np.zeros((2 * count, bins, channels), dtype=np.complex64)
+        self.head = count - 1
+        self.tail = np.zeros((block, channels), dtype=np.float32)  # salida en curso
+        self.fill = 0
+        self.products = np.zeros_like(self.kernel)
+        self.accumulated = np.zeros((bins, channels), dtype=np.complex64)
+
+    def load_kernel(self, path):
+        """Espectros de la IR (P, B + 1, canales), invertidos en P (de IR_CACHE)"""
+        try:
+            key = ('ir', os.path.abspath(path), os.path.getmtime(path), self.sample_rate,
+                   self.partition, self.channels)
+            return IR_CACHE.get(key, lambda: self.design_kernel(path))
+        except (OSError, ValueError) as e:
+            raise ValueError(f"No se pudo cargar la respuesta al impulso '{path}': {e}") from e
+
+    def design_kernel(self, path):
+        ir, rate = read_wav(path)
+        if rate != self.sample_rate:
+            divisor = np.gcd(int(rate), int(self.sample_rate))
+            ir = load_signal().resample_poly(ir, self.sample_rate // divisor, rate // divisor,
+                                             axis=0)
+        ir = ir[:int(self.MAX_SECONDS * self.sample_rate)]
+        # Cada canal usa el de la IR con su índice (una IR mono, en todos)
+        ir = ir[:, np.arange(self.channels) % ir.shape[1]].astype(np.float64)
+        # Energía unidad en el canal más fuerte: el nivel de la cola no
+        # depende de cómo se grabó la IR
+        energy = np.sqrt((ir ** 2).sum(axis=0).max())
+        if energy > 0:
+            ir /= energy
+
+        block = self.partition
+        count = max(1, -(-len(ir) // block))
+        padded = np.zeros((count * block, self.channels))
+        padded[:len(ir)] = ir
+        parts = padded.reshape(count, block, self.channels).astype(np.float32)
+        spectra = self.rfft(parts, n=2 * block, axis=1)
+        # Invertidos: el trozo i multiplica a la partición de hace i pasos
+        return np.ascontiguousarray(spectra[::-1], dtype=np.complex64)
+
+    def adopt(self, other):
+        # Misma ruta pero otro archivo (o ninguno): no hay estado compatible
+        if (self.kernel is not None and other.kernel is not None
+                and other.kernel.shape == self.kernel.shape):
+            super().adopt(other)
+
+    def convolve(self):
+        """Procesa la partición completa de frame[B:] y deja su salida en tail"""
+        block = self.partition
+        count = len(self.kernel)
+        spectrum = self.rfft(self.frame, axis=0)
+        self.frame[:block] = self.frame[block:]
+        self.head = (self.head + 1) % count
+        self.spectra[self.head] = spectrum
+        self.spectra[self.head + count] = spectrum
+        # spectra[head + 1:head + 1 + P]: de la más antigua a la actual
+        np.multiply(self.spectra[self.head + 1:self.head + 1 + count], self.kernel,
+                    out=self.products)
+        self.products.sum(axis=0, out=self.accumulated)
+        self.tail[:] = self.irfft(self.accumulated, n=2 * block, axis=0)[block:]
+
+    def process_block(self, audio):
+        if self.kernel is None:
+            return audio
+        n = len(audio)
+        block = self.partition
+        wet = self.scratch.get('wet', n)
+        dry = self.scratch.get('dry', n)
+        pos = 0
+        while pos < n:
+            # La salida de la partición anterior sale mientras entra la
+            # actual; la señal seca se retrasa igual (frame[:B])
+            take = min(block - self.fill, n - pos)
+            end = self.fill + take
+            wet[pos:pos + take] = self.tail[self.fill:end]
+            dry[pos:pos + take] = self.frame[self.fill:end]
+            self.frame[block + self.fill:block + end] = audio[pos:pos + take]
+            self.fill = end
+            pos += take
+            if self.fill == block:
+                self.convolve()
+                self.fill = 0
+
+        dry *= span(self.dry, 0, n)
+        wet *= span(self.wet, 0, n)
+        wet += dry
+        return wet
+
+
+class PitchShift(Effect):
+    """Pitch shifter en streaming tipo WSOLA.
+
+    Dos granos leen una línea de retardo a velocidad pitch_factor,
+    desfasados media ventana, con ganancias Hann que suman 1. Cuando un
+    grano termina, su nuevo punto de lectura se elige (±SEARCH) por
+    correlación con el grano que está sonando, para que el cruce quede en
+    fase. Siempre devuelve len(audio) muestras y conserva el estado entre
+    bloques. Los granos son comunes a todos los canales (la alineación se
+    busca sobre su suma), así que la imagen estéreo no se desplaza.
+
+    Latencia algorítmica: media ventana + SEARCH (~26 ms). Presupuesto de
+    CPU: menos del 5 % de un bloque de 1024 muestras a 44.1 kHz (ver
+    benchmark.py).
+    """
+
+    defaults = {'semitones': 0, 'fine': 0}
+
+    WINDOW = 0.04   # segundos por grano
+    SEARCH = 0.006  # rango de búsqueda de alineación
+    MATCH = 0.01    # longitud del tramo comparado
+    MAX_BLOCK = 8192
+
+    state = ('line', 'delay', 'progress')
+
+    @classmethod
+    def is_identity(cls, params):
+        return params['semitones'] * 100 + params['fine'] == 0
+
+    def prepare(self):
+        total_cents = self.params['semitones'] * 100 + self.params['fine']
+        self.pitch_factor = 2 ** (total_cents / 1200)
+
+        self.window = int(self.WINDOW * self.sample_rate)
+        self.search = int(self.SEARCH * self.sample_rate)
+        self.match = int(self.MATCH * self.sample_rate)
+        self.max_delay = self.window + 2 * self.search
+
+        # Cambio de retardo por muestra y avance del grano por muestra
+        self.rate = 1 - self.pitch_factor
+        self.progress_step = abs(self.rate) / self.window
+        # Subiendo el pitch el retardo decrece desde el máximo; bajándolo crece
+        self.start_delay = self.window + self.search if self.rate < 0 else self.search
+        self.latency = 0 if self.pitch_factor == 1.0 else self.window // 2 + self.search
+
+    def reset(self):
+        self.line = DelayLine(self.max_delay + self.match + self.MAX_BLOCK, self.channels)
+        # Las lecturas de candidatos usan el buffer 'segment' de la línea
+        self.line.reserve(self.match + 2 * self.search)
+        half = 0.5 * self.window * np.sign(self.rate)
+        self.delay = np.array([self.start_delay, self.start_delay + half])
+        self.progress = np.array([0.0, 0.5])
+
+        # Buffers fijos de la búsqueda de alineación (suma de los canales);
+        # la vista de ventanas deslizantes sobre candidates se crea una vez
+        self.reference = np.zeros(self.match, dtype=np.float32)
+        self.candidates = np.zeros(self.match + 2 * self.search, dtype=np.float32)
+        self.windows = sliding_window_view(self.candidates, self.match)
+        self.corr = np.zeros(2 * self.search + 1, dtype=np.float32)
+        self.energy = np.zeros(len(self.candidates) + 1)
+        self.norm = np.zeros(2 * self.search + 1)
+        self.score = np.zeros(2 * self.search + 1)
+
+    def restart_grain(self, tap, ahead):
+        """Reinicia el grano tap alineándolo con el otro (ahead = muestras hasta write_pos)"""
+        now = self.line.write_pos - ahead
+        other = self.delay[1 - tap]
+        segment = self.line.segment(now - int(round(other)) - self.match, self.match)
+        np.sum(segment, axis=1, out=self.reference)
+
+        # candidates[j:j+match] termina en now - (start_delay + search - j)
+        segment = self.line.segment(now - self.start_delay - self.search - self.match,
+                                    len(self.candidates))
+        np.sum(segment, axis=1, out=self.candidates)
+        # Correlación por desplazamiento (= np.correlate 'valid', sin reservar)
+        np.einsum('ij,j->i', self.windows, self.reference, out=self.corr)
+
+        # Energía de cada ventana candidata (sumas acumuladas en float64)
+        energy = self.energy
+        energy[1:] = self.candidates
+        np.square(energy, out=energy)
+        np.cumsum(energy, out=energy)
+        norm = self.norm
+        np.subtract(energy[self.match:], energy[:-self.match], out=norm)
+        norm += 1e-9
+        np.sqrt(norm, out=norm)
+        score = self.score
+        score[:] = self.corr
+        score /= norm
+        best = int(np.argmax(score))
+
+        self.progress[tap] -= 1.0
+        overshoot = self.progress[tap] / self.progress_step
+        self.delay[tap] = self.start_delay + self.search - best + overshoot * self.rate
+
+    def reserve(self, n):
+        super().reserve(n)
+        if n > self.MAX_BLOCK:
+            self.scratch.get('blocks', n)
+            n = self.MAX_BLOCK
+        self.line.reserve(n)
+        self.scratch.get('out', n)
+        self.scratch.arange(n)
+        self.scratch.shared('delays', n, np.float64)
+        self.scratch.shared('phase', n, np.float64)
+        self.scratch.get('gain', n)
+
+    def process_block(self, audio):
+        n = len(audio)
+        if n > self.MAX_BLOCK:
+            output = self.scratch.get('blocks', n)
+            for i in range(0, n, self.MAX_BLOCK):
+                output[i:i + self.MAX_BLOCK] = self.process_block(audio[i:i + self.MAX_BLOCK])
+            return output
+
+        # Se escribe siempre para que la línea esté al día si se reactiva
+        self.line.write(audio)
+        if self.pitch_factor == 1.0:
+            return audio
+
+        self.line.reserve(n)
+        output = self.scratch.get('out', n)
+        # Los tramos varían con los granos: buffers al tamaño del bloque
+        ramps = self.scratch.arange(n)
+        delays_buffer = self.scratch.shared('delays', n, np.float64)
+        phase_buffer = self.scratch.shared('phase', n, np.float64)
+        gain_buffer = self.scratch.get('gain', n)
+        pos = 0
+        while pos < n:
+            for tap in (0, 1):
+                if self.progress[tap] >= 1.0:
+                    self.restart_grain(tap, n - pos)
+
+            # Tramo hasta que alguno de los granos termine
+            remaining = (1.0 - max(self.progress[0], self.progress[1])) / self.progress_step
+            length = max(1, min(n - pos, int(np.ceil(remaining))))
+            ramp = ramps[:length]
+            end_offset = n - pos - length
+
+            mixed = output[pos:pos + length]
+            delays = delays_buffer[:length]
+            phase = phase_buffer[:length]
+            gain = gain_buffer[:length]
+            for tap in (0, 1):
+                # Retardo del grano: delay + ramp * rate, acotado a la línea
+                np.multiply(ramp, self.rate, out=delays)
+                delays += self.delay[tap]
+                np.clip(delays, 0, self.max_delay, out=delays)
+                # Ganancia Hann: sin²(pi * (progress + ramp * progress_step))
+                np.multiply(ramp, self.progress_step, out=phase)
+                phase += self.progress[tap]
+                phase *= np.pi
+                np.sin(phase, out=phase)
+                np.square(phase, out=phase)
+                gain[:] = phase[:, np.newaxis]
+
+                grain = self.line.read_modulated(delays, end_offset)
+                if tap == 0:
+                    np.multiply(grain, gain, out=mixed)
+                else:
+                    grain *= gain
+                    mixed += grain
+
+            self.delay += length * self.rate
+            self.progress += length * self.progress_step
+            pos += length
+
+        return output
+
+
+class Oversampler:
+    """Sobremuestreo polifásico x L con estado, para no linealidades.
+
+    up() interpola con un FIR paso bajo (Kaiser, corte en el Nyquist de la
+    frecuencia base) descompuesto en L fases de TAPS_PER_PHASE coeficientes;
+    down() filtra con el mismo prototipo y se queda con la última muestra
+    de cada grupo de L. Ambas son un producto de matrices sobre ventanas
+    copiadas a buffers preasignados, con la historia de cada filtro
+    guardada entre bloques. Los filtros se diseñan una vez por factor.
+    Con este diezmado el retardo total es exactamente TAPS_PER_PHASE - 1
+    muestras base; align() retrasa igual la señal seca.
+    """
+
+    TAPS_PER_PHASE = 16
+    KAISER_BETA = 8.0  # ~80 dB de rechazo
+    _designs = {}      # factor -> (taps de up (K, L), taps de down (K * L,))
+
+    def __init__(self, factor, channels=1):
+        self.factor = factor
+        self.channels = channels
+        self.latency = self.TAPS_PER_PHASE - 1
+        self.up_taps, self.down_taps = self.design(factor)
+        self.scratch = Scratch(channels)
+        length = self.TAPS_PER_PHASE * factor
+        self.up_history = np.zeros((self.TAPS_PER_PHASE - 1, channels), dtype=np.float32)
+        self.down_history = np.zeros((length - 1, channels), dtype=np.float32)
+        self.dry_history = np.zeros((self.latency, channels), dtype=np.float32)
+
+    @classmethod
+    def design(cls, factor):
+        designs = cls._designs.get(factor)
+        if designs is None:
+            taps = cls.TAPS_PER_PHASE
+            prototype = load_signal().firwin(taps * factor, 1.0 / factor,
+                                            window=('kaiser', cls.KAISER_BETA))
+            # Fase p, ventana j (la más antigua primero): h[p + (K - 1 - j) L] * L
+            phases = (prototype * factor).reshape(taps, factor)[::-1]
+            designs = (np.ascontiguousarray(phases, dtype=np.float32),
+                       np.ascontiguousarray(prototype[::-1], dtype=np.float32))
+            cls._designs[factor] = designs
+        return designs
+
+    def reset(self):
+        self.up_history[:] = 0
+        self.down_history[:] = 0
+        self.dry_history[:] = 0
+
+    def adopt(self, other):
+        """Hereda la historia de los filtros si el factor es el mismo"""
+        if other.factor == self.factor and other.channels == self.channels:
+            self.up_history = other.up_history
+            self.down_history = other.down_history
+            self.dry_history = other.dry_history
+
+    def _extend(self, name, history, audio):
+        """[historia, audio] en un buffer de trabajo; guarda la historia nueva"""
+        keep = len(history)
+        extended = self.scratch.get(name, keep + len(audio))
+        extended[:keep] = history
+        extended[keep:] = audio
+        history[:] = extended[len(audio):]
+        return extended
+
+    def up(self, audio):
+        """(n, canales) -> (n * L, canales) a la frecuencia alta"""
+        n = len(audio)
+        taps = self.TAPS_PER_PHASE
+        factor = self.factor
+        channels = self.channels
+        extended = self._extend('up', self.up_history, audio)
+        windows = self.scratch.shared('up_windows', n * channels * taps).reshape(n, channels, taps)
+        windows[:] = sliding_window_view(extended, taps, axis=0)
+        phases = self.scratch.shared('up_phases', n * channels * factor)
+        np.matmul(windows.reshape(n * channels, taps), self.up_taps,
+                  out=phases.reshape(n * channels, factor))
+        high = self.scratch.get('high', n * factor)
+        high.reshape(n, factor, channels)[:] = \
+            phases.reshape(n, channels, factor).transpose(0, 2, 1)
+        return high
+
+    def down(self, high):
+        """(n * L, canales) -> (n, canales) a la frecuencia base"""
+        factor = self.factor
+        n = len(high) // factor
+        length = len(self.down_taps)
+        channels = self.channels
+        extended = self._extend('down', self.down_history, high)
+        windows = self.scratch.shared('down_windows', n * channels * length)
+        windows = windows.reshape(n, channels, length)
+        windows[:] = sliding_window_view(extended[factor - 1:], length, axis=0)[::factor]
+        output = self.scratch.get('down_out', n)
+        np.matmul(windows.reshape(n * channels, length), self.down_taps,
+                  out=output.reshape(n * channels))
+        return output
+
+    def align(self, audio):
+        """La entrada retrasada `latency` muestras, para mezclarla con down()"""
+        return self._extend('dry', self.dry_history, audio)[:len(audio)]
+
+
+class Distortion(Effect):
+    """Distorsión soft clipping con filtro de tono.
+
+    La tanh corre sobremuestreada ('oversample' = 2, 4 u 8; 1 la aplica a
+    la frecuencia base) para que los armónicos que genera por encima de
+    Nyquist se filtren en vez de plegarse como aliasing. El sobremuestreo
+    añade Oversampler.TAPS_PER_PHASE - 1 muestras de latencia.
+    """
+
+    defaults = {'drive': 0.5, 'tone': 0.5, 'mix': 0.5, 'oversample': 4}
+
+    FACTORS = (1, 2, 4, 8)
+
+    ramped = ('drive', 'dry', 'wet')
+
+    structural = ('oversample',)
+
+    TONE_STEP = 0.01  # rejilla de 'tone' en plena rampa (ver design_value)
+
+    designed = {'tone': TONE_STEP}
+
+    def __init__(self, params, sample_rate=44100, channels=1):
+        self.tone_filter = SosFilter(channels)
+        super().__init__(params, sample_rate, channels)
+
+    @classmethod
+    def is_identity(cls, params):
+        # Sobremuestreando, la señal seca sale alineada con el filtro (retrasada)
+        return params['mix'] == 0 and cls.factor(params) == 1
+
+    @classmethod
+    def factor(cls, params):
+        """Factor de sobremuestreo permitido más cercano al pedido"""
+        factor = int(params['oversample'])
+        return min(cls.FACTORS, key=lambda allowed: abs(allowed - factor))
+
+    def prepare(self):
+        self.drive = 1 + self.params['drive'] * 10
+        self.dry = 1 - self.params['mix']
+        self.wet = self.params['mix']
+
+        # El filtro de tono solo se rediseña cuando cambia 'tone'
+        self.design_filter()
+
+    def filter_design(self, values):
+        tone = values['tone']
+        return (self.tone_filter, (tone, self.sample_rate),
+                lambda: self.tone_sos(tone, self.sample_rate))
+
+    @staticmethod
+    def tone_sos(tone, sample_rate):
+        if tone < 0.5:
+            # Más graves
+            return butter_sos(2, 1000 + tone * 6000, 'lp', sample_rate)
+        # Más agudos
+        return butter_sos(2, 500 + (tone - 0.5) * 4000, 'hp', sample_rate)
+
+    def reset(self):
+        self.tone_filter.reset()
+        factor = self.factor(self.params)
+        self.oversampler = Oversampler(factor, self.channels) if factor > 1 else None
+        self.latency = self.oversampler.latency if self.oversampler else 0
+
+    def adopt(self, other):
+        self.tone_filter.adopt(other.tone_filter)
+        if self.oversampler is not None and other.oversampler is not None:
+            self.oversampler.adopt(other.oversampler)
+
+    def process_block(self, audio):
+        n = len(audio)
+        distorted = self.scratch.get('distorted', n)
+        np.multiply(audio, span(self.drive, 0, n), out=distorted)
+        dry = audio
+        if self.oversampler is not None:
+            high = self.oversampler.up(distorted)
+            np.tanh(high, out=high)
+            distorted = self.oversampler.down(high)
+            dry = self.oversampler.align(audio)
+        else:
+            np.tanh(distorted, out=distorted)
+        self.tone_filter.process(distorted, distorted)
+
+        output = self.scratch.get('out', n)
+        np.multiply(dry, span(self.dry, 0, n), out=output)
+        distorted *= span(self.wet, 0, n)
+        output += distorted
+        return output
+
+
+class Compressor(Effect):
+    """Compresor con seguidor de envolvente de ataque/liberación.
+
+    Detector de picos desacoplado: un retenedor de picos con caída
+    exponencial (liberación), calculado sin bucles como el máximo acumulado
+    de |x| * r^-n, seguido de un paso bajo de un polo (ataque) con lfilter.
+    Ambos estados pasan de un bloque al siguiente. La curva de ganancia se
+    evalúa solo sobre la envolvente, en dominio lineal:
+    (env / umbral) ^ -(1 - 1/ratio). Cada canal tiene su propia envolvente.
+    """
+
+    defaults = {'threshold': -20, 'ratio': 4, 'attack': 0.01, 'release': 0.1}
+
+    state = ('peak', 'attack_zi')
+
+    ramped = ('threshold', 'slope')
+
+    jit_kernels = ('peak_hold',)
+
+    def __init__(self, params, sample_rate=44100, channels=1):
+        # prepare corre en cada bloque de una rampa: la sección de ataque se
+        # reescribe en su sitio y los pesos se rehacen solo si cambia release
+        self.attack_sos = one_pole_sos(0.0)
+        self._weights = {}       # tamaño de tramo -> r^-(k+1), una fila por canal
+        self._weights_coef = {}  # tamaño de tramo -> r con que se calcularon
+        super().__init__(params, sample_rate, channels)
+
+    @classmethod
+    def is_identity(cls, params):
+        return params['ratio'] == 1
+
+    def ramp(self, name, begin, end, n):
+        # La curva de ganancia se aplica a la envolvente (canales, n) float64
+        rows = self.ramps.rows(name, n)
+        rows[:] = self.ramp_line('line', begin, end, n)
+        return rows
+
+    def prepare(self):
+        fs = self.sample_rate
+        self.threshold = 10 ** (self.params['threshold'] / 20)
+        self.slope = 1 - 1 / self.params['ratio']
+
+        release = max(self.params['release'], 1e-4) * fs
+        attack = max(self.params['attack'], 1e-5) * fs
+        self.release_coef = math.exp(-1 / release)
+        set_one_pole(self.attack_sos, math.exp(-1 / attack))
+
+        # r^-n crece como e^(n/release): tramos acotados para no desbordar
+        self.max_chunk = max(1, int(200 * release))
+
+    def reset(self):
+        self.peak = np.zeros(self.channels)
+        self.attack_zi = np.zeros((self.channels, 1, 2))
+
+    def peak_envelope(self, rectified):
+        """env[k] = max(|x[k]|, r * env[k-1]) in-place, sin bucle por muestra.
+
+        rectified es (canales, n); cada canal sigue su propia envolvente.
+        """
+        n = rectified.shape[1]
+        weights = self._weights.get(n)
+        if weights is None:
+            # Una fila por canal: multiplicar sin difundir no reserva buffers
+            weights = self._weights[n] = np.empty((self.channels, n))
+        if self._weights_coef.get(n) != self.release_coef:
+            row = weights[0]
+            np.negative(self.scratch.arange(n + 1)[1:], out=row)
+            np.power(self.release_coef, row, out=row)
+            weights[1:] = row
+            self._weights_coef[n] = self.release_coef
+
+        kernel = self.jit['peak_hold']
+        if kernel is not None:
+            kernel(rectified, weights, self.peak)
+            return
+
+        # v[k] = env[k] * r^-(k+1) cumple v[k] = max(|x[k]| * r^-(k+1), v[k-1]),
+        # con v[-1] = env[-1]: basta con incluirlo en la primera muestra
+        rectified *= weights
+        first = rectified[:, 0]
+        np.maximum(first, self.peak, out=first)
+        np.maximum.accumulate(rectified, axis=1, out=rectified)
+        rectified /= weights
+        self.peak[:] = rectified[:, -1]
+
+    def process_block(self, audio):
+        n = len(audio)
+        # La envolvente se calcula en float64 sobre un único buffer
+        envelope = self.scratch.rows('envelope', n)
+        envelope[:] = audio.T
+        np.abs(envelope, out=envelope)
+        for i in range(0, n, self.max_chunk):
+            self.peak_envelope(envelope[:, i:i + self.max_chunk])
+        sosfilt_inplace(self.attack_sos, envelope, self.attack_zi)
+
+        # salida = audio / (max(env, umbral) / umbral) ^ slope
+        np.maximum(envelope, self.threshold, out=envelope)
+        envelope /= self.threshold
+        np.power(envelope, self.slope, out=envelope)
+        output = self.scratch.get('out', n)
+        output[:] = envelope.T
+        np.divide(audio, output, out=output)
+        return output
+
+
+class Gain(Effect):
+    """Ganancia simple"""
+
+    defaults = {'volume': 1.0}
+
+    ramped = ('volume',)
+
+    linear = True
+
+    @classmethod
+    def is_identity(cls, params):
+        return params['volume'] == 1
+
+    @classmethod
+    def transfer(cls, params, sample_rate):
+        return float(params['volume']), None
+
+    def prepare(self):
+        self.volume = self.params['volume']
+
+    def process_block(self, audio):
+        n = len(audio)
+        return np.multiply(audio, span(self.volume, 0, n), out=self.scratch.get('out', n))
+
+
+class LinearStage(Effect):
+    """Etapas lineales contiguas (ganancias, ecualizadores) en una sola cascada SOS.
+
+    La crea chain_optimizer.py: 'stages' son las etapas originales
+    ({'type', 'params'}) y sus ganancias se pliegan en los coeficientes b
+    de la primera sección, así que el bloque se filtra una vez en lugar de
+    pasar por cada nodo. No tiene parámetros con rampa.
+    """
+
+    defaults = {'stages': ()}
+
+    structural = ('stages',)
+
+    def __init__(self, params, sample_rate=44100, channels=1):
+        self.filter = SosFilter(channels)
+        super().__init__(params, sample_rate, channels)
+
+    @classmethod
+    def is_identity(cls, params):
+        return not params['stages']
+
+    def prepare(self):
+        self.gain = 1.0
+        sections = []
+        for stage in self.params['stages']:
+            effect_class = EFFECTS[stage['type']]
+            gain, sos = effect_class.transfer(dict(effect_class.defaults, **stage['params']),
+                                              self.sample_rate)
+            self.gain *= gain
+            if sos is not None:
+                sections.append(sos)
+        if sections:
+            # vstack copia: los arrays de FILTER_CACHE no se modifican
+            sos = np.vstack(sections)
+            sos[0, :3] *= self.gain
+            self.filter.set_sos(sos)
+
+    def reset(self):
+        self.filter.reset()
+
+    def adopt(self, other):
+        self.filter.adopt(other.filter)
+
+    def process_block(self, audio):
+        out = self.scratch.get('out', len(audio))
+        if self.filter.sos is None:
+            return np.multiply(audio, self.gain, out=out)
+        return self.filter.process(audio, out)
+
+
+# Tipo de nodo -> clase de efecto
+EFFECTS = {
+    'equalizer': Equalizer,
+    'echo': Echo,
+    'reverb': Reverb,
+    'convolution': Convolution,
+    'pitch': PitchShift,
+    'distortion': Distortion,
+    'compressor': Compressor,
+    'gain': Gain,
+    'linear': LinearStage,
+}
+
+
+def compile_chain(chain, sample_rate=44100, channels=1, block_size=None):
+    """Compila una cadena de dicts {'type', 'params'[, 'id']} en nodos nuevos.
+
+    Los tipos desconocidos (p. ej. 'input'/'output') se ignoran. block_size
+    es el bloque del stream, si se conoce (ver Effect.for_block).
+    """
+    nodes = []
+    for effect in chain:
+        effect_class = EFFECTS.get(effect['type'])
+        if effect_class is not None:
+            params = effect_class.for_block(effect.get('params'), block_size)
+            node = effect_class(params, sample_rate, channels)
+            node.id = effect.get('id')
+            nodes.append(node)
+    return nodes
@@ -8,7 +8,7 @@ class VoiceFilterApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Filtro de Voz - Voice Modifier")
-        self.root.geometry("400x500")
+        self.root.geometry("400x560")
         self.root.resizable(False, False)
         
         self.voice_filter = VoiceFilter()
@@ -40,6 +40,20 @@ class VoiceFilterApp:
         self.output_device_combo = ttk.Combobox(control_frame, state="readonly")
         self.output_device_combo.pack(fill=tk.X, pady=5)
         
+        # Frecuencia y frames por bloque (bloques pequeños = menos latencia)
+        format_frame = tk.Frame(control_frame)
+        format_frame.pack(fill=tk.X, pady=5)
+        tk.Label(format_frame, text="Hz:", font=("Arial", 10)).pack(side=tk.LEFT)
+        self.rate_combo = ttk.Combobox(format_frame, state="readonly", width=8,
+                                       values=["44100", "48000"])
+        self.rate_combo.set(str(self.voice_filter.RATE))
+        self.rate_combo.pack(side=tk.LEFT, padx=5)
+        tk.Label(format_frame, text="Bloque:", font=("Arial", 10)).pack(side=tk.LEFT, padx=(10, 0))
+        self.chunk_combo = ttk.Combobox(format_frame, state="readonly", width=6,
+                                        values=["128", "256", "512", "1024", "2048"])
+        self.chunk_combo.set(str(self.voice_filter.CHUNK))
+        self.chunk_combo.pack(side=tk.LEFT, padx=5)
+        
         # Botón para actualizar dispositivos
         refresh_btn = tk.Button(
             control_frame, 
@@ -160,6 +174,7 @@ class VoiceFilterApp:
             input_device_id = self.input_devices[input_idx][0]
             output_device_id = self.output_devices[output_idx][0]
             
+            self.voice_filter.set_format(int(self.rate_combo.get()), int(self.chunk_combo.get()))
             self.voice_filter.running = True
             
             self.voice_filter.stream = self.voice_filter.p.open(
@@ -178,7 +193,10 @@ class VoiceFilterApp:
             
             self.start_btn.config(state=tk.DISABLED)
             self.stop_btn.config(state=tk.NORMAL)
-            self.status_label.config(text="Estado: Activo", fg="green")
+            stream = self.voice_filter.stream
+            latency = stream.get_input_latency() + stream.get_output_latency()
+            self.status_label.config(text=f"Estado: Activo (latencia ~{latency * 1000:.0f} ms)",
+                                     fg="green")
             
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo iniciar el filtro:\n{str(e)}")
@@ -0,0 +1,192 @@
+"""
+Voz en vivo sin interfaz gráfica: micrófono -> cadena de efectos -> altavoz
+Ejecuta: python headless.py robot
+         python headless.py preset.json --rate 48000 --block-size 256 --worker 2
+
+Usa el mismo motor que las apps (AudioProcessor, y el hilo o el proceso
+DSP si se piden) sin importar Tk. sounddevice solo se importa al abrir el
+stream o listar dispositivos: --check compila la cadena y procesa un
+bloque de silencio sin tocar ningún backend de audio (sirve para medir el
+arranque con benchmark.py --suite startup). La cadena pasa por
+chain_optimizer.py salvo con --no-optimize: aquí no hay sliders que
+necesiten cada nodo.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from time import perf_counter
+import numpy as np
+from audio_processor import AudioProcessor, pause_gc, resume_gc
+from chain_optimizer import optimize_chain
+from node_graph import GraphCycleError, load_graph, build_processing_chain
+from presets import BUILTIN_PRESETS
+
+# Módulos pesados que --check informa si llegaron a importarse
+HEAVY_MODULES = ('scipy.signal', 'numba', 'tkinter', 'sounddevice', 'pyaudio')
+STATS_INTERVAL = 5.0  # segundos entre resúmenes de métricas
+
+
+def load_chain(preset):
+    """Cadena de un preset predefinido (por id) o guardado desde el editor (.json)"""
+    if preset in BUILTIN_PRESETS:
+        return BUILTIN_PRESETS[preset]
+    if not os.path.exists(preset):
+        raise ValueError(f"No existe el preset '{preset}' "
+                         f"(predefinidos: {', '.join(BUILTIN_PRESETS)})")
+    return build_processing_chain(load_graph(preset))
+
+
+def check(processor, block_size, started):
+    """Procesa un bloque de silencio e informa del tiempo de arranque"""
+    silence = np.zeros((block_size, processor.channels), dtype=np.float32)
+    out = np.empty_like(silence)
+    processor.process_into(silence, out)
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"✅ Motor listo en {(perf_counter() - started) * 1000:.0f} ms "
+          f"({len(processor.chain)} efectos) · módulos pesados: {', '.join(loaded) or 'ninguno'}")
+
+
+def run(processor, args):
+    """Abre el stream y procesa hasta Ctrl+C (o --seconds)"""
+    if args.process:
+        # El stream lo abre el motor: aquí no hace falta sounddevice
+        return run_process(processor, args)
+    import sounddevice as sd
+
+    worker = None
+    if args.worker:
+        # Importado aquí: el modo directo no lo necesita
+        from dsp_worker import DSPWorker
+        worker = DSPWorker(processor, args.block_size, args.worker)
+        worker.start()
+    stats = processor.stats
+    target = worker or processor
+
+    def callback(indata, outdata, frames, time_info, status):
+        start = perf_counter()
+        if status:
+            stats.record_xruns(status.input_underflow, status.input_overflow,
+                               status.output_underflow, status.output_overflow)
+        try:
+            target.process_into(indata, outdata)
+        except Exception as e:
+            stats.record_error(e)
+            outdata[:] = indata
+        stats.record(perf_counter() - start, frames)
+
+    stats.reset()
+    stream = sd.Stream(samplerate=processor.sample_rate, blocksize=args.block_size,
+                       device=(args.input, args.output), channels=processor.channels,
+                       dtype=np.float32, latency='low' if args.low_latency else 'high',
+                       callback=callback)
+    print(f"🟢 Procesando {len(processor.chain)} efectos a {processor.sample_rate} Hz, "
+          f"{args.block_size} frames, {processor.channels} canales (Ctrl+C para salir)")
+    deadline = perf_counter() + args.seconds if args.seconds else None
+    pause_gc(args.gc)
+    try:
+        with stream:
+            report = processor.latency_report(args.block_size, *stream.latency,
+                                              worker.margin if worker else 0)
+            print(f"⏱️ Latencia ida y vuelta {report['round_trip'] * 1000:.1f} ms")
+            while deadline is None or perf_counter() < deadline:
+                time.sleep(STATS_INTERVAL if deadline is None
+                           else max(0.0, min(STATS_INTERVAL, deadline - perf_counter())))
+                print(stats.summary())
+                if worker is not None:
+                    print(worker.summary())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        resume_gc(args.gc)
+        if worker is not None:
+            worker.stop()
+    print("⚫ Detenido")
+
+
+def run_process(processor, args):
+    """Como run, con el stream y el DSP en el proceso del motor (dsp_engine.py)"""
+    from dsp_process import DSPProcess
+
+    engine = DSPProcess(processor, args.block_size, args.worker,
+                        device=(args.input, args.output),
+                        latency='low' if args.low_latency else 'high', gc_mode=args.gc)
+    try:
+        engine.start()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+    print(f"🟢 Procesando {len(processor.chain)} efectos a {processor.sample_rate} Hz, "
+          f"{args.block_size} frames, {processor.channels} canales en el proceso "
+          f"del motor (Ctrl+C para salir)")
+    report = processor.latency_report(args.block_size, *engine.device_latency, engine.margin)
+    print(f"⏱️ Latencia ida y vuelta {report['round_trip'] * 1000:.1f} ms")
+    deadline = perf_counter() + args.seconds if args.seconds else None
+    try:
+        while deadline is None or perf_counter() < deadline:
+            time.sleep(STATS_INTERVAL if deadline is None
+                       else max(0.0, min(STATS_INTERVAL, deadline - perf_counter())))
+            print(engine.summary())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+    print("⚫ Detenido")
+
+
+def main():
+    started = perf_counter()
+    parser = argparse.ArgumentParser(description="Voice Modifier en vivo, sin interfaz")
+    parser.add_argument('preset', nargs='?',
+                        help="Preset predefinido (deep_voice, robot...) o guardado (.json)")
+    parser.add_argument('-r', '--rate', type=int, default=44100, help="Frecuencia de muestreo")
+    parser.add_argument('-b', '--block-size', type=int, default=1024, help="Frames por bloque")
+    parser.add_argument('-c', '--channels', type=int, default=1, help="Canales procesados")
+    parser.add_argument('-i', '--input', type=int, default=None, help="Dispositivo de entrada")
+    parser.add_argument('-o', '--output', type=int, default=None, help="Dispositivo de salida")
+    parser.add_argument('--low-latency', action='store_true',
+                        help="Pide a PortAudio la latencia mínima del dispositivo")
+    parser.add_argument('--worker', type=int, default=0, metavar='BLOQUES',
+                        help="DSP en un hilo aparte con este margen de bloques")
+    parser.add_argument('--process', action='store_true',
+                        help="Stream y DSP en un proceso aparte (con --worker, también "
+                             "un hilo DSP dentro del motor)")
+    parser.add_argument('--gc', choices=['freeze', 'disable'], default='freeze',
+                        help="GC durante el stream")
+    parser.add_argument('--seconds', type=float, default=0.0,
+                        help="Detenerse tras estos segundos (0: hasta Ctrl+C)")
+    parser.add_argument('--no-optimize', action='store_true',
+                        help="No quitar nodos sin efecto ni fundir etapas lineales")
+    parser.add_argument('--check', action='store_true',
+                        help="Compilar la cadena, procesar un bloque de silencio y salir")
+    parser.add_argument('--list-devices', action='store_true',
+                        help="Listar los dispositivos de audio y salir")
+    args = parser.parse_args()
+
+    if args.list_devices:
+        import sounddevice as sd
+        print(sd.query_devices())
+        return
+
+    processor = AudioProcessor(sample_rate=args.rate, channels=args.channels,
+                               block_size=args.block_size)
+    try:
+        chain = load_chain(args.preset) if args.preset else []
+        if not args.no_optimize:
+            chain, report = optimize_chain(chain)
+            for line in report:
+                print(f"🧹 {line}")
+        processor.set_chain(chain)
+    except (ValueError, GraphCycleError) as e:
+        parser.error(str(e))
+
+    if args.check:
+        check(processor, args.block_size, started)
+    else:
+        run(processor, args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # proceso DSP en el ejecutable de PyInstaller
+    main()
@@ -0,0 +1,242 @@
+"""
+Núcleos por muestra opcionales (Numba) para los efectos recursivos
+"""
+import importlib.util
+import os
+import sys
+import threading
+import numpy as np
+
+# En el ejecutable de PyInstaller no hay __pycache__ escribible junto al
+# código: la caché de Numba va a la carpeta del usuario
+if getattr(sys, 'frozen', False) and 'NUMBA_CACHE_DIR' not in os.environ:
+    os.environ['NUMBA_CACHE_DIR'] = os.path.join(os.path.expanduser('~'), '.voice_modifier',
+                                                 'numba_cache')
+
+# Numba tarda ~0.3 s en importarse: se importa al cargar el primer núcleo
+numba = None
+
+BACKENDS = ('numba', 'numpy')
+
+
+def available():
+    """True si Numba está instalado (sin importarlo)"""
+    return importlib.util.find_spec('numba') is not None
+
+
+# VOICE_MODIFIER_JIT=0 fuerza el camino NumPy aunque Numba esté instalado
+if available() and os.environ.get('VOICE_MODIFIER_JIT', '1') != '0':
+    backend = 'numba'
+else:
+    backend = 'numpy'
+
+
+def set_backend(name):
+    """Elige 'numba' o 'numpy' para los nodos que se compilen a partir de ahora"""
+    global backend
+    if name not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {name}")
+    if name == 'numba' and not available():
+        raise ValueError("Numba no está instalado")
+    backend = name
+
+
+# Los núcleos reproducen operación a operación (mismos dtypes, mismo orden)
+# el camino NumPy de cada efecto, así que el resultado es idéntico bit a bit.
+# Los productos float32 * coeficiente se hacen en float64 y se redondean a
+# float32, igual que NumPy con una rampa float64; un coeficiente escalar se
+# pasa ya redondeado a float32 (ver coefficient), y entonces el producto en
+# float64 es exacto y coincide con el de NumPy en float32.
+
+def _at(values, k):
+    """Coeficiente k de una rampa, o el único valor si es escalar"""
+    return values[k] if values.shape[0] > 1 else values[0]
+
+
+def _echo(buffer, write_pos, audio, out, delayed, delay, modulated,
+          dry, wet, feedback, max_chunk):
+    """Echo.process_block: línea con retroalimentación, retardo fijo o en rampa.
+
+    Procesa en los mismos tramos que el camino NumPy: en cada tramo todas
+    las lecturas van antes que las escrituras. Devuelve la nueva posición
+    de escritura de la línea.
+    """
+    size, channels = buffer.shape
+    n = audio.shape[0]
+    pos = 0
+    while pos < n:
+        end = min(n, pos + max_chunk)
+        length = end - pos
+        if modulated:
+            # DelayLine.read_modulated con end_offset = pos - end
+            base = np.float64(write_pos)
+            for i in range(length):
+                position = (np.float64(i) - delay[pos + i]) + base
+                whole = np.floor(position)
+                frac = np.float32(position - whole)
+                current = np.int64(whole) % size
+                following = (np.int64(whole) + 1) % size
+                for c in range(channels):
+                    a = buffer[current, c]
+                    delayed[i, c] = (buffer[following, c] - a) * frac + a
+        else:
+            # DelayLine.read
+            whole = np.int64(delay[0])
+            frac = np.float32(delay[0] - whole)
+            older = (write_pos - whole - 1) % size
+            for i in range(length):
+                newer = older + 1 if older + 1 < size else 0
+                for c in range(channels):
+                    if frac == 0:
+                        delayed[i, c] = buffer[newer, c]
+                    else:
+                        delayed[i, c] = (buffer[older, c] - buffer[newer, c]) * frac \
+                            + buffer[newer, c]
+                older = newer
+
+        for i in range(length):
+            k = pos + i
+            dry_k = _at(dry, k)
+            wet_k = _at(wet, k)
+            feedback_k = _at(feedback, k)
+            for c in range(channels):
+                x = audio[k, c]
+                d = np.float64(delayed[i, c])
+                out[k, c] = np.float32(x * dry_k) + np.float32(d * wet_k)
+                buffer[write_pos, c] = np.float32(d * feedback_k) + x
+            write_pos = write_pos + 1 if write_pos + 1 < size else 0
+        pos = end
+    return write_pos
+
+
+def _comb(buffer, write_pos, x, output, delay, feedback, damped, sos, zi):
+    """Un comb de Reverb.process_combs sobre todo el bloque.
+
+    El paso bajo de amortiguamiento repite la sección de _sosfilt de SciPy
+    en float64. Devuelve la nueva posición de escritura.
+    """
+    size, channels = buffer.shape
+    scalar_feedback = np.float64(np.float32(feedback))
+    read = (write_pos - delay) % size
+    for k in range(x.shape[0]):
+        for c in range(channels):
+            d = buffer[read, c]
+            output[k, c] += d
+            if damped:
+                x_n = np.float64(d)
+                y = sos[0] * x_n + zi[c, 0, 0]
+                zi[c, 0, 0] = sos[1] * x_n - sos[4] * y + zi[c, 0, 1]
+                zi[c, 0, 1] = sos[2] * x_n - sos[5] * y
+                feed = np.float32(y * feedback)
+            else:
+                feed = np.float32(np.float64(d) * scalar_feedback)
+            buffer[write_pos, c] = feed + x[k, c]
+        read = read + 1 if read + 1 < size else 0
+        write_pos = write_pos + 1 if write_pos + 1 < size else 0
+    return write_pos
+
+
+def _allpass(buffer, write_pos, audio, delay, gain):
+    """Reverb.process_allpass in-place; devuelve la nueva posición de escritura"""
+    size, channels = buffer.shape
+    gain = np.float64(np.float32(gain))
+    read = (write_pos - delay) % size
+    for k in range(audio.shape[0]):
+        for c in range(channels):
+            d = buffer[read, c]
+            x = audio[k, c]
+            audio[k, c] = d - x
+            buffer[write_pos, c] = np.float32(np.float64(d) * gain) + x
+        read = read + 1 if read + 1 < size else 0
+        write_pos = write_pos + 1 if write_pos + 1 < size else 0
+    return write_pos
+
+
+def _peak_hold(rectified, weights, peak):
+    """Compressor.peak_envelope en una pasada (mismos pesos r^-(k+1))"""
+    channels, n = rectified.shape
+    for c in range(channels):
+        held = peak[c]
+        for k in range(n):
+            value = rectified[c, k] * weights[c, k]
+            held = max(value, held)
+            rectified[c, k] = held / weights[c, k]
+        peak[c] = rectified[c, n - 1]
+
+
+def _signatures():
+    """Firmas explícitas: se compila al cargar el nodo, nunca en el callback"""
+    types = numba.types
+    f32 = types.Array(types.float32, 2, 'A')
+    f32_in = types.Array(types.float32, 2, 'A', readonly=True)
+    f64_1d = types.Array(types.float64, 1, 'A')
+    f64_1d_in = types.Array(types.float64, 1, 'A', readonly=True)
+    f64_2d = types.Array(types.float64, 2, 'A')
+    f64_3d = types.Array(types.float64, 3, 'A')
+    i64 = types.int64
+    signatures = {
+        # La entrada puede ser de solo lectura (bloques de np.frombuffer)
+        'echo': [types.int64(f32, i64, f32_in, f32, f32, f64_1d_in, types.boolean,
+                             f64_1d_in, f64_1d_in, f64_1d_in, i64)],
+        'comb': [types.int64(f32, i64, f32, f32, i64, types.float64, types.boolean,
+                             f64_1d_in, f64_3d)],
+        'allpass': [types.int64(f32, i64, f32, i64, types.float64)],
+        'peak_hold': [types.void(f64_2d, f64_2d, f64_1d)],
+    }
+    return signatures
+
+
+KERNELS = {
+    'echo': _echo,
+    'comb': _comb,
+    'allpass': _allpass,
+    'peak_hold': _peak_hold,
+}
+
+_compiled = {}
+# load() puede llamarse a la vez desde la precarga y desde la interfaz
+_lock = threading.Lock()
+
+
+def _import_numba():
+    global numba, _at
+    if numba is None:
+        import numba as module
+        # njit es perezoso: _at no se compila hasta que lo usa un núcleo
+        _at = module.njit(cache=True, inline='always')(_at)
+        numba = module
+
+
+def load(name):
+    """Núcleo compilado `name`, o None con el backend NumPy.
+
+    La primera vez en la sesión lo compila o, con cache=True, lo lee de la
+    caché de disco (__pycache__ o NUMBA_CACHE_DIR): solo el primer
+    arranque tras instalar o actualizar paga la compilación. Se llama al
+    crear los nodos, fuera del hilo de audio. nogil: el núcleo suelta el
+    GIL, así que el hilo DSP no bloquea a la interfaz mientras corre.
+    """
+    if backend != 'numba':
+        return None
+    with _lock:
+        kernel = _compiled.get(name)
+        if kernel is None:
+            _import_numba()
+            kernel = numba.njit(_signatures()[name], cache=True, nogil=True)(KERNELS[name])
+            _compiled[name] = kernel
+    return kernel
+
+
+def coefficient(value, buffer):
+    """Coeficiente para un núcleo en buffer (float64, una muestra por elemento).
+
+    Una rampa (muestras, canales) float32 se copia entera (es la misma en
+    todos los canales); un escalar va a buffer[:1], redondeado a float32
+    como lo haría NumPy al operar con un bloque float32.
+    """
+    if isinstance(value, np.ndarray):
+        n = len(value)
+        buffer[:n] = value[:, 0]
+        return buffer[:n]
+    buffer[0] = np.float32(value)
+    return buffer[:1]
@@ -1,9 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import pyaudio
+import os
+import sys
 import threading
+import multiprocessing
+from time import perf_counter
 from node_editor import NodeEditor
-from audio_processor import AudioProcessor
+from audio_processor import AudioProcessor, pause_gc, resume_gc
+from effects import prewarm
+from dsp_worker import DSPWorker
+from dsp_process import DSPProcess
+from preset_bank import PresetBank, PRESET_DIR
 
 class VoiceModifierApp:
     def __init__(self, root):
@@ -20,9 +28,32 @@ class VoiceModifierApp:
         self.CHUNK = 1024
         self.FORMAT = pyaudio.paInt16
         self.CHANNELS = 1
+        self.CHANNEL_OPTIONS = (1, 2, 4)  # canales procesados (limitados por los dispositivos)
         self.RATE = 44100
+        self.RATE_OPTIONS = ("Nativa", 44100, 48000)  # "Nativa": la del micrófono elegido
+        self.CHUNK_OPTIONS = (128, 256, 512, 1024, 2048)
+        self.LOW_LATENCY_CHUNK = 128  # frames por bloque en modo baja latencia
+        # Hilo DSP: el callback solo copia y el DSP corre con un margen de
+        # bloques (más margen = más latencia y menos huecos)
+        self.WORKER_OPTIONS = ("Desactivado", 1, 2, 3, 4)
+        self.process_var = tk.BooleanVar(value=False)  # DSP en otro proceso
+        self.device_latency = (None, None)  # (entrada, salida) reportadas por PortAudio
+        self.worker = None  # DSPWorker si el DSP corre fuera del callback, DSPProcess si el stream también
+        self.STATS_REFRESH_MS = 500
+        self.GC_MODE = 'freeze'  # GC durante el stream: None, 'freeze' o 'disable'
+        self.PREWARM_DELAY_MS = 500  # scipy.signal y núcleos JIT, con la ventana ya visible
+        
+        # Presets predefinidos y del usuario, compilados de antemano
+        self.presets = PresetBank(self.processor, block_size=self.CHUNK)
+        self.presets.load_folder()
         
         self.setup_ui()
+        self.root.after(self.PREWARM_DELAY_MS, self.start_background_work)
+    
+    def start_background_work(self):
+        """Carga en segundo plano lo que necesitará el primer efecto y compila los presets"""
+        threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+        self.presets.start()
         
     def setup_ui(self):
         # Notebook para pestañas
@@ -33,7 +64,9 @@ class VoiceModifierApp:
         editor_frame = tk.Frame(notebook)
         notebook.add(editor_frame, text="🎛️ Editor de Nodos")
         
-        self.node_editor = NodeEditor(editor_frame, on_chain_update=self.on_chain_update)
+        self.node_editor = NodeEditor(editor_frame, on_chain_update=self.on_chain_update,
+                                      on_param_change=self.on_param_change,
+                                      on_preset_saved=self.on_preset_saved)
         
         # Pestaña 2: Control de Audio
         control_frame = tk.Frame(notebook, bg="#f5f5f5")
@@ -80,6 +113,50 @@ class VoiceModifierApp:
         self.output_combo = ttk.Combobox(device_frame, state="readonly", width=40)
         self.output_combo.grid(row=1, column=1, pady=5, padx=10)
         
+        tk.Label(device_frame, text="Canales:", 
+                font=("Arial", 10), bg="#f5f5f5").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.channels_combo = ttk.Combobox(device_frame, state="readonly", width=10,
+                                           values=[str(c) for c in self.CHANNEL_OPTIONS])
+        self.channels_combo.set(str(self.CHANNELS))
+        self.channels_combo.grid(row=2, column=1, sticky=tk.W, pady=5, padx=10)
+        
+        tk.Label(device_frame, text="Frecuencia (Hz):", 
+                font=("Arial", 10), bg="#f5f5f5").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.rate_combo = ttk.Combobox(device_frame, state="readonly", width=10,
+                                       values=[str(r) for r in self.RATE_OPTIONS])
+        self.rate_combo.set(str(self.RATE))
+        self.rate_combo.grid(row=3, column=1, sticky=tk.W, pady=5, padx=10)
+        
+        tk.Label(device_frame, text="Bloque (frames):", 
+                font=("Arial", 10), bg="#f5f5f5").grid(row=4, column=0, sticky=tk.W, pady=5)
+        self.chunk_combo = ttk.Combobox(device_frame, state="readonly", width=10,
+                                        values=[str(c) for c in self.CHUNK_OPTIONS])
+        self.chunk_combo.set(str(self.CHUNK))
+        self.chunk_combo.grid(row=4, column=1, sticky=tk.W, pady=5, padx=10)
+        
+        self.low_latency_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            device_frame,
+            text=f"⚡ Baja latencia (frecuencia nativa, bloques de {self.LOW_LATENCY_CHUNK})",
+            variable=self.low_latency_var,
+            font=("Arial", 10),
+            bg="#f5f5f5"
+        ).grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        tk.Label(device_frame, text="Hilo DSP (bloques):", 
+                font=("Arial", 10), bg="#f5f5f5").grid(row=6, column=0, sticky=tk.W, pady=5)
+        self.worker_combo = ttk.Combobox(device_frame, state="readonly", width=12,
+                                         values=[str(m) for m in self.WORKER_OPTIONS])
+        self.worker_combo.set(str(self.WORKER_OPTIONS[0]))
+        self.worker_combo.grid(row=6, column=1, sticky=tk.W, pady=5, padx=10)
+        tk.Checkbutton(
+            device_frame,
+            text="🧩 Audio en un proceso aparte (stream y DSP: la interfaz no le quita el GIL)",
+            variable=self.process_var,
+            font=("Arial", 10),
+            bg="#f5f5f5"
+        ).grid(row=7, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
         tk.Button(
             device_frame,
             text="🔄 Actualizar Dispositivos",
@@ -89,7 +166,7 @@ class VoiceModifierApp:
             fg="white",
             padx=20,
             pady=5
-        ).grid(row=2, column=0, columnspan=2, pady=10)
+        ).grid(row=8, column=0, columnspan=2, pady=10)
         
         # Controles
         control_frame = tk.Frame(container, bg="#f5f5f5")
@@ -134,6 +211,17 @@ class VoiceModifierApp:
         )
         self.status_label.pack(pady=20)
         
+        # Salud del callback (se refresca dos veces por segundo)
+        self.stats_label = tk.Label(
+            container,
+            text="",
+            font=("Consolas", 9),
+            bg="#f5f5f5",
+            fg="#333",
+            justify=tk.LEFT
+        )
+        self.stats_label.pack(pady=5)
+        
         # Info
         info_text = """
         ℹ️ INSTRUCCIONES:
@@ -193,7 +281,7 @@ class VoiceModifierApp:
             btn = tk.Button(
                 preset_frame,
                 text=name,
-                command=lambda p=preset_id: self.load_builtin_preset(p),
+                command=lambda p=preset_id: self.select_preset(p),
                 font=("Arial", 11),
                 bg="#673ab7",
                 fg="white",
@@ -207,66 +295,66 @@ class VoiceModifierApp:
         
         tk.Label(
             container,
-            text="Los presets cargarán automáticamente una configuración de nodos",
+            text="👤 Tus Presets",
+            font=("Arial", 12, "bold"),
+            bg="#f5f5f5"
+        ).pack(pady=(10, 0))
+        
+        self.user_preset_frame = tk.Frame(container, bg="#f5f5f5")
+        self.user_preset_frame.pack(pady=5)
+        self.refresh_user_presets()
+        
+        tk.Label(
+            container,
+            text="Los presets cargarán automáticamente una configuración de nodos\n"
+                 f"(los guardados en {PRESET_DIR} aparecen en 'Tus Presets')",
             font=("Arial", 9),
             bg="#f5f5f5",
             fg="#666"
         ).pack(pady=20)
     
-    def load_builtin_preset(self, preset_id):
-        """Carga un preset predefinido"""
-        presets = {
-            "deep_voice": [
-                {"type": "pitch", "params": {"semitones": -5, "fine": 0}},
-                {"type": "equalizer", "params": {"low": 6, "mid": -2, "high": -4}},
-                {"type": "gain", "params": {"volume": 1.2}}
-            ],
-            "chipmunk": [
-                {"type": "pitch", "params": {"semitones": 7, "fine": 0}},
-                {"type": "equalizer", "params": {"low": -6, "mid": 2, "high": 4}},
-                {"type": "compressor", "params": {"threshold": -15, "ratio": 6, "attack": 0.001, "release": 0.05}}
-            ],
-            "robot": [
-                {"type": "pitch", "params": {"semitones": -2, "fine": 0}},
-                {"type": "distortion", "params": {"drive": 0.3, "tone": 0.3, "mix": 0.4}},
-                {"type": "echo", "params": {"delay": 0.1, "feedback": 0.3, "mix": 0.2}}
-            ],
-            "ghost": [
-                {"type": "pitch", "params": {"semitones": -8, "fine": 0}},
-                {"type": "reverb", "params": {"room_size": 0.9, "damping": 0.3, "mix": 0.7}},
-                {"type": "equalizer", "params": {"low": -8, "mid": 4, "high": -6}}
-            ],
-            "radio": [
-                {"type": "equalizer", "params": {"low": -10, "mid": 6, "high": -8}},
-                {"type": "distortion", "params": {"drive": 0.2, "tone": 0.4, "mix": 0.3}},
-                {"type": "compressor", "params": {"threshold": -20, "ratio": 8, "attack": 0.005, "release": 0.1}}
-            ],
-            "rockstar": [
-                {"type": "distortion", "params": {"drive": 0.6, "tone": 0.6, "mix": 0.5}},
-                {"type": "echo", "params": {"delay": 0.25, "feedback": 0.4, "mix": 0.3}},
-                {"type": "equalizer", "params": {"low": 4, "mid": 2, "high": 3}},
-                {"type": "gain", "params": {"volume": 1.3}}
-            ],
-            "underwater": [
-                {"type": "equalizer", "params": {"low": 8, "mid": -6, "high": -10}},
-                {"type": "reverb", "params": {"room_size": 0.8, "damping": 0.7, "mix": 0.6}},
-                {"type": "pitch", "params": {"semitones": -3, "fine": 0}}
-            ],
-            "8bit": [
-                {"type": "distortion", "params": {"drive": 0.8, "tone": 0.2, "mix": 0.7}},
-                {"type": "pitch", "params": {"semitones": 4, "fine": 0}},
-                {"type": "equalizer", "params": {"low": -4, "mid": 8, "high": -6}}
-            ]
-        }
-        
-        if preset_id in presets:
-            chain = presets[preset_id]
-            # Cargar en el procesador
-            self.processor.set_chain(chain)
-            # Cargar nodos visuales en el editor
-            self.node_editor.load_chain_from_preset(chain)
-            messagebox.showinfo("Preset Cargado", 
-                f"Preset cargado con éxito!\n\nVe a la pestaña 'Editor de Nodos' para ver y editar los efectos.\nO ve a 'Control de Audio' para iniciar el procesamiento.")
+    def refresh_user_presets(self):
+        """Un botón por cada preset del usuario registrado en el banco"""
+        for widget in self.user_preset_frame.winfo_children():
+            widget.destroy()
+        
+        user_presets = self.presets.user_presets
+        if not user_presets:
+            tk.Label(self.user_preset_frame, text="(ninguno todavía)", font=("Arial", 9),
+                     bg="#f5f5f5", fg="#666").pack()
+        for i, preset_id in enumerate(user_presets):
+            tk.Button(
+                self.user_preset_frame,
+                text=preset_id.split(':', 1)[1],
+                command=lambda p=preset_id: self.select_preset(p),
+                font=("Arial", 10),
+                bg="#9575cd",
+                fg="white",
+                width=20
+            ).grid(row=i // 3, column=i % 3, padx=5, pady=5)
+    
+    def select_preset(self, preset_id):
+        """Cambia al plan precompilado del preset y muestra su grafo en el editor"""
+        try:
+            if isinstance(self.worker, DSPProcess):
+                # El motor vive en otro proceso: compila allí la cadena
+                self.worker.set_chain(self.presets.chain(preset_id))
+                graph = self.presets.graph(preset_id)
+            else:
+                graph = self.presets.select(preset_id)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Error", f"No se pudo cargar el preset:\n{str(e)}")
+            return
+        # El plan ya está publicado con los ids de este grafo: no recompilar
+        self.node_editor.show_graph(graph, update_chain=False)
+        messagebox.showinfo("Preset Cargado", 
+            f"Preset cargado con éxito!\n\nVe a la pestaña 'Editor de Nodos' para ver y editar los efectos.\nO ve a 'Control de Audio' para iniciar el procesamiento.")
+    
+    def on_preset_saved(self, filename):
+        """Los presets guardados en PRESET_DIR se compilan y aparecen en 'Tus Presets'"""
+        if os.path.dirname(os.path.abspath(filename)) == os.path.abspath(PRESET_DIR):
+            self.presets.add_file(filename)
+            self.refresh_user_presets()
     
     def refresh_devices(self):
         """Actualiza la lista de dispositivos"""
@@ -275,13 +363,15 @@ class VoiceModifierApp:
         
         for i in range(self.audio.get_device_count()):
             info = self.audio.get_device_info_by_index(i)
+            # (índice, nombre, canales máximos, frecuencia nativa)
+            rate = int(info['defaultSampleRate'])
             if info['maxInputChannels'] > 0:
-                input_devices.append((i, info['name']))
+                input_devices.append((i, info['name'], info['maxInputChannels'], rate))
             if info['maxOutputChannels'] > 0:
-                output_devices.append((i, info['name']))
+                output_devices.append((i, info['name'], info['maxOutputChannels'], rate))
         
-        self.input_combo['values'] = [name for _, name in input_devices]
-        self.output_combo['values'] = [name for _, name in output_devices]
+        self.input_combo['values'] = [name for _, name, _, _ in input_devices]
+        self.output_combo['values'] = [name for _, name, _, _ in output_devices]
         
         if input_devices:
             self.input_combo.current(0)
@@ -293,17 +383,29 @@ class VoiceModifierApp:
     
     def on_chain_update(self, chain):
         """Callback cuando se actualiza la cadena de nodos"""
-        self.processor.set_chain(chain)
+        (self.worker or self.processor).set_chain(chain)
+    
+    def on_param_change(self, node_id, name, value):
+        """Callback cuando se mueve un slider: solo cambia ese parámetro"""
+        (self.worker or self.processor).set_param(node_id, name, value)
     
     def audio_callback(self, in_data, frame_count, time_info, status):
         """Callback de audio en tiempo real"""
         if self.running:
+            start = perf_counter()
+            stats = self.processor.stats
+            if status:
+                stats.record_xruns(status & pyaudio.paInputUnderflow,
+                                   status & pyaudio.paInputOverflow,
+                                   status & pyaudio.paOutputUnderflow,
+                                   status & pyaudio.paOutputOverflow)
             try:
-                processed = self.processor.process(in_data)
-                return (processed, pyaudio.paContinue)
+                processed = (self.worker or self.processor).process(in_data)
             except Exception as e:
-                print(f"Error procesando audio: {e}")
-                return (in_data, pyaudio.paContinue)
+                stats.record_error(e)
+                processed = in_data
+            stats.record(perf_counter() - start, frame_count)
+            return (processed, pyaudio.paContinue)
         return (in_data, pyaudio.paComplete)
     
     def start_processing(self):
@@ -319,25 +421,55 @@ class VoiceModifierApp:
             input_device = self.input_devices[input_idx][0]
             output_device = self.output_devices[output_idx][0]
             
-            self.running = True
+            # Canales pedidos, limitados a lo que admiten ambos dispositivos;
+            # el procesador se recompila para el formato antes de abrir el stream
+            self.CHANNELS = min(int(self.channels_combo.get()),
+                                self.input_devices[input_idx][2],
+                                self.output_devices[output_idx][2])
+            self.RATE, self.CHUNK = self.selected_format(input_idx)
+            self.processor.configure(sample_rate=self.RATE, channels=self.CHANNELS,
+                                    block_size=self.CHUNK)
+            self.presets.configure(block_size=self.CHUNK)
             
-            self.stream = self.audio.open(
-                format=self.FORMAT,
-                channels=self.CHANNELS,
-                rate=self.RATE,
-                input=True,
-                output=True,
-                input_device_index=input_device,
-                output_device_index=output_device,
-                frames_per_buffer=self.CHUNK,
-                stream_callback=self.audio_callback
-            )
+            # Hilo DSP (margen) y/o proceso aparte, que abre él mismo el stream
+            margin = self.worker_combo.get()
+            margin = None if margin == str(self.WORKER_OPTIONS[0]) else int(margin)
+            if self.process_var.get():
+                self.worker = DSPProcess(self.processor, self.CHUNK, margin,
+                                         device=(input_device, output_device),
+                                         backend='pyaudio', gc_mode=self.GC_MODE)
+                self.worker.start()
+                self.device_latency = self.worker.device_latency
+            elif margin is not None:
+                self.worker = DSPWorker(self.processor, self.CHUNK, margin)
+                self.worker.start()
             
-            self.stream.start_stream()
+            self.running = True
+            self.processor.stats.reset()
+            
+            # Con el proceso DSP el stream ya está abierto en el motor
+            if not isinstance(self.worker, DSPProcess):
+                self.stream = self.audio.open(
+                    format=self.FORMAT,
+                    channels=self.CHANNELS,
+                    rate=self.RATE,
+                    input=True,
+                    output=True,
+                    input_device_index=input_device,
+                    output_device_index=output_device,
+                    frames_per_buffer=self.CHUNK,
+                    stream_callback=self.audio_callback
+                )
+                
+                self.stream.start_stream()
+                self.device_latency = (self.stream.get_input_latency(),
+                                       self.stream.get_output_latency())
             
             self.start_btn.config(state=tk.DISABLED)
             self.stop_btn.config(state=tk.NORMAL)
+            pause_gc(self.GC_MODE)
             self.status_label.config(text="🟢 Estado: Procesando Audio", fg="#4caf50")
+            self.update_stats()
             
             messagebox.showinfo("Iniciado", 
                 "Procesamiento de audio iniciado.\n¡Habla por el micrófono!")
@@ -345,6 +477,47 @@ class VoiceModifierApp:
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo iniciar:\n{str(e)}")
             self.running = False
+            if self.worker is not None:
+                self.worker.stop()
+                self.worker = None
+    
+    def update_stats(self):
+        """Muestra las métricas del callback mientras haya procesamiento"""
+        if not self.running:
+            return
+        if isinstance(self.worker, DSPProcess):
+            # El callback corre en el proceso del motor: sus métricas llegan por mensaje
+            text = self.worker.summary() + "\n" + self.latency_summary()
+        else:
+            text = self.processor.stats.summary() + "\n" + self.latency_summary()
+            if self.worker is not None:
+                text += "\n" + self.worker.summary()
+        self.stats_label.config(text=text)
+        self.root.after(self.STATS_REFRESH_MS, self.update_stats)
+    
+    def selected_format(self, input_idx):
+        """(frecuencia, frames por bloque) elegidos en la interfaz.
+        
+        El modo baja latencia usa la frecuencia nativa del micrófono (sin
+        remuestreo en el driver) y bloques de LOW_LATENCY_CHUNK frames.
+        """
+        native_rate = self.input_devices[input_idx][3]
+        if self.low_latency_var.get():
+            return native_rate, self.LOW_LATENCY_CHUNK
+        rate = self.rate_combo.get()
+        rate = native_rate if rate == "Nativa" else int(rate)
+        return rate, int(self.chunk_combo.get())
+    
+    def latency_summary(self):
+        """Latencia de ida y vuelta del stream (depende de la cadena: se recalcula)"""
+        margin = self.worker.margin if self.worker is not None else 0
+        report = self.processor.latency_report(self.CHUNK, *self.device_latency, margin)
+        text = (f"Latencia ida y vuelta {report['round_trip'] * 1000:.1f} ms = "
+                f"entrada {report['input'] * 1000:.1f} + salida {report['output'] * 1000:.1f} + "
+                f"efectos {report['algorithmic'] * 1000:.1f}")
+        if margin:
+            text += f" + hilo DSP {report['worker'] * 1000:.1f}"
+        return text + f" ({self.CHUNK} frames a {self.RATE} Hz)"
     
     def stop_processing(self):
         """Detiene el procesamiento"""
@@ -354,6 +527,11 @@ class VoiceModifierApp:
             self.stream.stop_stream()
             self.stream.close()
             self.stream = None
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+        
+        resume_gc(self.GC_MODE)
         
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
@@ -363,11 +541,18 @@ class VoiceModifierApp:
         """Maneja el cierre de la aplicación"""
         if self.running:
             self.stop_processing()
+        self.presets.stop()
         self.audio.terminate()
         self.root.destroy()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # proceso DSP en el ejecutable de PyInstaller
     root = tk.Tk()
     app = VoiceModifierApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
-    root.mainloop()
+    if "--startup-check" in sys.argv:
+        # benchmark.py --suite startup: dibujar la ventana y salir
+        root.update()
+        app.on_closing()
+    else:
+        root.mainloop()
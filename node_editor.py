@@ -1,33 +1,22 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, colorchooser
 import json
+import os
 import uuid
-
-class AudioNode:
-    """Representa un nodo de efecto de audio"""
-    def __init__(self, node_id, node_type, x, y, params=None):
-        self.id = node_id
-        self.type = node_type
-        self.x = x
-        self.y = y
-        self.params = params or {}
-        self.connections = []  # Lista de IDs de nodos conectados
-        
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'type': self.type,
-            'x': self.x,
-            'y': self.y,
-            'params': self.params,
-            'connections': self.connections
-        }
+from node_graph import (AudioNode, GraphCycleError, load_graph, graph_from_chain,
+                        build_processing_chain, would_create_cycle)
+from preset_bank import PRESET_DIR
 
 class NodeEditor:
     """Editor visual de nodos para crear cadenas de efectos"""
-    def __init__(self, parent, on_chain_update=None):
+    def __init__(self, parent, on_chain_update=None, on_param_change=None,
+                 on_preset_saved=None):
         self.parent = parent
         self.on_chain_update = on_chain_update
+        # Callback (node_id, param, valor) para cambios de un solo parámetro
+        self.on_param_change = on_param_change
+        # Callback (ruta) tras guardar un preset
+        self.on_preset_saved = on_preset_saved
         
         self.nodes = {}
         self.selected_node = None
@@ -73,6 +62,7 @@ class NodeEditor:
             "🎚️ Ecualizador",
             "🔉 Eco",
             "🌊 Reverb",
+            "🏛️ Convolución",
             "🎵 Pitch Shifter",
             "📢 Distorsión",
             "🔇 Compresor",
@@ -183,6 +173,7 @@ class NodeEditor:
             "🎚️ Ecualizador": "equalizer",
             "🔉 Eco": "echo",
             "🌊 Reverb": "reverb",
+            "🏛️ Convolución": "convolution",
             "🎵 Pitch Shifter": "pitch",
             "📢 Distorsión": "distortion",
             "🔇 Compresor": "compressor",
@@ -250,6 +241,11 @@ class NodeEditor:
                 "damping": 0.5,    # 0-1
                 "mix": 0.3         # 0-1
             },
+            "convolution": {
+                "ir": "",          # WAV con la respuesta al impulso
+                "mix": 0.3,        # 0-1
+                "partition": 0     # muestras (= latencia); 0 = el bloque del stream
+            },
             "pitch": {
                 "semitones": 0,  # -12 a +12
                 "fine": 0        # -100 a +100 cents
@@ -257,7 +253,8 @@ class NodeEditor:
             "distortion": {
                 "drive": 0.5,    # 0-1
                 "tone": 0.5,     # 0-1
-                "mix": 0.5       # 0-1
+                "mix": 0.5,      # 0-1
+                "oversample": 4  # 1, 2, 4 u 8
             },
             "compressor": {
                 "threshold": -20,  # dB
@@ -279,6 +276,7 @@ class NodeEditor:
             "equalizer": "#2196f3",
             "echo": "#9c27b0",
             "reverb": "#673ab7",
+            "convolution": "#3f51b5",
             "pitch": "#ff9800",
             "distortion": "#e91e63",
             "compressor": "#00bcd4",
@@ -294,6 +292,7 @@ class NodeEditor:
             "equalizer": "🎚️ EQ",
             "echo": "🔉 Eco",
             "reverb": "🌊 Reverb",
+            "convolution": "🏛️ Convolución",
             "pitch": "🎵 Pitch",
             "distortion": "📢 Distorsión",
             "compressor": "🔇 Compresor",
@@ -431,7 +430,10 @@ class NodeEditor:
                 to_node_id = tags[1]
                 from_node = self.nodes[self.connecting_from]
                 
-                if to_node_id not in from_node.connections:
+                if would_create_cycle(self.nodes, self.connecting_from, to_node_id):
+                    messagebox.showwarning("Conexión no válida",
+                        "Esa conexión crearía un ciclo: el audio no puede volver a un nodo anterior")
+                elif to_node_id not in from_node.connections:
                     from_node.connections.append(to_node_id)
                     self.redraw_all()
                     self.update_chain()
@@ -636,6 +638,12 @@ class NodeEditor:
             self.create_slider(node, "damping", "Amortiguación", 0, 1, "", 0.01)
             self.create_slider(node, "mix", "Mezcla", 0, 1, "%", 0.01)
         
+        elif node.type == "convolution":
+            self.create_file_choice(node, "ir", "Respuesta al impulso")
+            self.create_slider(node, "mix", "Mezcla", 0, 1, "%", 0.01)
+            self.create_choice(node, "partition", "Partición (latencia)",
+                               (0, 128, 256, 512, 1024, 2048), "", {0: "bloque"})
+        
         elif node.type == "pitch":
             self.create_slider(node, "semitones", "Semitonos", -12, 12, "st")
             self.create_slider(node, "fine", "Ajuste Fino", -100, 100, "¢")
@@ -644,6 +652,7 @@ class NodeEditor:
             self.create_slider(node, "drive", "Intensidad", 0, 1, "", 0.01)
             self.create_slider(node, "tone", "Tono", 0, 1, "", 0.01)
             self.create_slider(node, "mix", "Mezcla", 0, 1, "%", 0.01)
+            self.create_choice(node, "oversample", "Calidad (sobremuestreo)", (1, 2, 4, 8), "x")
         
         elif node.type == "compressor":
             self.create_slider(node, "threshold", "Umbral", -60, 0, "dB")
@@ -693,7 +702,11 @@ class NodeEditor:
         def on_change(val):
             node.params[param_name] = float(val)
             value_label.config(text=f"{float(val):.2f}{unit}")
-            self.update_chain()
+            # Solo este parámetro: sin recorrer el grafo ni recompilar la cadena
+            if self.on_param_change:
+                self.on_param_change(node.id, param_name, float(val))
+            else:
+                self.update_chain()
         
         slider = tk.Scale(
             frame,
@@ -711,40 +724,93 @@ class NodeEditor:
         )
         slider.pack(fill=tk.X, pady=2)
     
+    def create_choice(self, node, param_name, label, options, unit="", names=None):
+        """Crea un selector para un parámetro estructural (recompila la cadena).
+        
+        names da el texto de las opciones especiales (p. ej. {0: "bloque"}).
+        """
+        names = names or {}
+        frame = tk.Frame(self.props_container, bg="#2b2b2b")
+        frame.pack(fill=tk.X, pady=3, padx=8)
+        
+        tk.Label(
+            frame,
+            text=label,
+            bg="#2b2b2b", fg="white",
+            font=("Arial", 8)
+        ).pack(side=tk.LEFT)
+        
+        combo = ttk.Combobox(
+            frame,
+            values=[names.get(option, f"{option}{unit}") for option in options],
+            state="readonly",
+            width=6,
+            font=("Arial", 8)
+        )
+        current = node.params.get(param_name, options[0])
+        combo.current(options.index(current) if current in options else 0)
+        combo.pack(side=tk.RIGHT)
+        
+        def on_select(event):
+            # No tiene rampa: cambia la forma del nodo, así que se recompila
+            node.params[param_name] = options[combo.current()]
+            self.update_chain()
+        
+        combo.bind("<<ComboboxSelected>>", on_select)
+    
+    def create_file_choice(self, node, param_name, label):
+        """Crea un selector de archivo WAV para un parámetro (recompila la cadena)"""
+        from tkinter import filedialog
+        
+        frame = tk.Frame(self.props_container, bg="#2b2b2b")
+        frame.pack(fill=tk.X, pady=3, padx=8)
+        
+        tk.Label(
+            frame,
+            text=label,
+            bg="#2b2b2b", fg="white",
+            font=("Arial", 8)
+        ).pack(anchor=tk.W)
+        
+        path_label = tk.Label(
+            frame,
+            text=os.path.basename(node.params.get(param_name, "")) or "(ninguno)",
+            bg="#2b2b2b", fg="#ffeb3b",
+            font=("Arial", 8, "bold")
+        )
+        path_label.pack(side=tk.LEFT)
+        
+        def on_browse():
+            filename = filedialog.askopenfilename(
+                filetypes=[("WAV", "*.wav"), ("Todos los archivos", "*.*")]
+            )
+            if filename:
+                node.params[param_name] = filename
+                path_label.config(text=os.path.basename(filename))
+                self.update_chain()
+        
+        tk.Button(
+            frame,
+            text="📂 Elegir...",
+            command=on_browse,
+            bg="#404040", fg="white",
+            font=("Arial", 8),
+            relief=tk.FLAT
+        ).pack(side=tk.RIGHT)
+    
     def update_chain(self):
         """Actualiza la cadena de procesamiento"""
         if self.on_chain_update:
-            chain = self.build_processing_chain()
-            self.on_chain_update(chain)
+            try:
+                chain = self.build_processing_chain()
+                # Compilar puede fallar, p. ej. una IR que no se puede leer
+                self.on_chain_update(chain)
+            except (GraphCycleError, ValueError) as e:
+                messagebox.showerror("Error", str(e))
     
     def build_processing_chain(self):
-        """Construye la cadena de procesamiento ordenada"""
-        # Encontrar nodo de entrada
-        input_nodes = [n for n in self.nodes.values() if n.type == "input"]
-        if not input_nodes:
-            return []
-        
-        chain = []
-        visited = set()
-        
-        def traverse(node_id):
-            if node_id in visited or node_id not in self.nodes:
-                return
-            
-            visited.add(node_id)
-            node = self.nodes[node_id]
-            
-            if node.type != "input":
-                chain.append({
-                    'type': node.type,
-                    'params': node.params.copy()
-                })
-            
-            for next_id in node.connections:
-                traverse(next_id)
-        
-        traverse(input_nodes[0].id)
-        return chain
+        """Construye la cadena en orden topológico (ramas y mezclas incluidas)"""
+        return build_processing_chain(self.nodes)
     
     def clear_all(self):
         """Limpia todos los nodos"""
@@ -755,65 +821,35 @@ class NodeEditor:
     
     def load_chain_from_preset(self, chain):
         """Carga una cadena de efectos y crea los nodos visuales"""
-        # Limpiar nodos existentes
+        self.show_graph(graph_from_chain(chain))
+    
+    def show_graph(self, nodes, update_chain=True):
+        """Sustituye el grafo del editor por `nodes` y lo redibuja.
+        
+        Con update_chain=False no se recompila la cadena: lo usa el banco de
+        presets, que ya publicó un plan compilado para este mismo grafo.
+        """
         self.nodes.clear()
+        self.nodes.update(nodes)
+        self.selected_node = None
         
         # Limpiar panel de propiedades
         for widget in self.props_container.winfo_children():
             widget.destroy()
         
-        # Crear nodo de entrada
-        x_pos = 100
-        y_pos = 250
-        spacing = 180
-        
-        input_id = self.add_node("input", x_pos, y_pos, update_chain=False)
-        prev_id = input_id
-        x_pos += spacing
-        
-        # Crear nodos para cada efecto en la cadena
-        for effect in chain:
-            effect_type = effect['type']
-            params = effect['params']
-            
-            # Crear el nodo sin actualizar la cadena aún
-            node_id = self.add_node(effect_type, x_pos, y_pos, update_chain=False)
-            
-            # Establecer parámetros
-            if node_id in self.nodes:
-                self.nodes[node_id].params = params.copy()
-            
-            # Conectar con el nodo anterior
-            if prev_id in self.nodes:
-                self.nodes[prev_id].connections.append(node_id)
-            
-            prev_id = node_id
-            x_pos += spacing
-        
-        # Crear nodo de salida
-        output_id = self.add_node("output", x_pos, y_pos, update_chain=False)
-        
-        # Conectar último efecto con salida
-        if prev_id in self.nodes and prev_id != input_id:
-            self.nodes[prev_id].connections.append(output_id)
-        elif prev_id == input_id:
-            # Si no hay efectos, conectar entrada directamente a salida
-            self.nodes[input_id].connections.append(output_id)
-        
-        # Redibujar todo
         self.redraw_all()
         
-        # Actualizar la cadena una sola vez al final
-        self.update_chain()
-        
-        # Mostrar mensaje de confirmación (opcional)
-        # Ya no necesitamos mostrar en panel de propiedades porque ahora es flotante
+        if update_chain:
+            self.update_chain()
     
     def save_preset(self):
         """Guarda el preset actual"""
         from tkinter import filedialog
         
+        # En PRESET_DIR aparece además en la pestaña de presets, precompilado
+        os.makedirs(PRESET_DIR, exist_ok=True)
         filename = filedialog.asksaveasfilename(
+            initialdir=PRESET_DIR,
             defaultextension=".json",
             filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
         )
@@ -826,6 +862,8 @@ class NodeEditor:
             with open(filename, 'w') as f:
                 json.dump(data, f, indent=2)
             
+            if self.on_preset_saved:
+                self.on_preset_saved(filename)
             messagebox.showinfo("Éxito", "Preset guardado correctamente")
     
     def load_preset(self):
@@ -838,24 +876,7 @@ class NodeEditor:
         
         if filename:
             try:
-                with open(filename, 'r') as f:
-                    data = json.load(f)
-                
-                self.nodes.clear()
-                
-                for node_data in data['nodes']:
-                    node = AudioNode(
-                        node_data['id'],
-                        node_data['type'],
-                        node_data['x'],
-                        node_data['y'],
-                        node_data['params']
-                    )
-                    node.connections = node_data['connections']
-                    self.nodes[node.id] = node
-                
-                self.redraw_all()
-                self.update_chain()
+                self.show_graph(load_graph(filename))
                 
                 messagebox.showinfo("Éxito", "Preset cargado correctamente")
             except Exception as e:
@@ -0,0 +1,140 @@
+"""
+Grafo de nodos del editor, sin dependencias de Tk
+"""
+import json
+
+class AudioNode:
+    """Representa un nodo de efecto de audio"""
+    def __init__(self, node_id, node_type, x, y, params=None):
+        self.id = node_id
+        self.type = node_type
+        self.x = x
+        self.y = y
+        self.params = params or {}
+        self.connections = []  # Lista de IDs de nodos conectados
+        
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'x': self.x,
+            'y': self.y,
+            'params': self.params,
+            'connections': self.connections
+        }
+
+def load_graph(filename):
+    """Carga un preset guardado por el editor y devuelve {id: AudioNode}"""
+    with open(filename, 'r') as f:
+        data = json.load(f)
+    return graph_from_dicts(data['nodes'])
+
+def graph_from_dicts(node_dicts):
+    """Construye {id: AudioNode} a partir de AudioNode.to_dict() (nodos nuevos)"""
+    nodes = {}
+    for node_data in node_dicts:
+        node = AudioNode(
+            node_data['id'],
+            node_data['type'],
+            node_data['x'],
+            node_data['y'],
+            node_data['params']
+        )
+        node.connections = list(node_data['connections'])
+        nodes[node.id] = node
+    return nodes
+
+def graph_from_chain(chain, x=100, y=250, spacing=180):
+    """Grafo serie entrada -> efectos -> salida para una cadena de presets.py.
+    
+    Los ids son fijos ('input', 'fx1', 'fx2'..., 'output'): la cadena que
+    compila este grafo y los nodos que dibuja el editor comparten ids, así
+    que un plan compilado de antemano recibe los set_param del editor.
+    """
+    ids = ['input'] + [f"fx{i}" for i in range(1, len(chain) + 1)] + ['output']
+    types = ['input'] + [effect['type'] for effect in chain] + ['output']
+    params = [{}] + [dict(effect.get('params') or {}) for effect in chain] + [{}]
+    
+    nodes = {}
+    for i, (node_id, node_type) in enumerate(zip(ids, types)):
+        node = AudioNode(node_id, node_type, x + i * spacing, y, params[i])
+        if i + 1 < len(ids):
+            node.connections.append(ids[i + 1])
+        nodes[node_id] = node
+    return nodes
+
+class GraphCycleError(ValueError):
+    """El grafo tiene un ciclo: no existe un orden de ejecución"""
+    def __init__(self, node_ids):
+        self.node_ids = node_ids
+        super().__init__(f"El grafo tiene un ciclo entre los nodos: {', '.join(node_ids)}")
+
+def successors(nodes, node_id):
+    """Nodos a los que alimenta node_id (la salida y las entradas no propagan)"""
+    node = nodes[node_id]
+    if node.type == "output":
+        return []
+    return [next_id for next_id in node.connections
+            if next_id in nodes and nodes[next_id].type != "input"]
+
+def would_create_cycle(nodes, from_id, to_id):
+    """True si conectar from_id -> to_id cerraría un ciclo"""
+    pending = [to_id]
+    seen = {to_id}
+    while pending:
+        node_id = pending.pop()
+        if node_id == from_id:
+            return True
+        for next_id in successors(nodes, node_id):
+            if next_id not in seen:
+                seen.add(next_id)
+                pending.append(next_id)
+    return False
+
+def build_processing_chain(nodes):
+    """Compila {id: AudioNode} en una cadena en orden topológico.
+    
+    Cada entrada lleva 'inputs': los ids de los nodos que la alimentan
+    (None = señal de entrada). Un nodo con varias salidas abre ramas que se
+    ejecutan en paralelo; un nodo con varias entradas las mezcla. Solo se
+    incluyen los nodos alcanzables desde la entrada. Es iterativo (sin
+    límite de recursión) y lanza GraphCycleError si hay un ciclo.
+    """
+    # Encontrar nodo de entrada
+    input_nodes = [n for n in nodes.values() if n.type == "input"]
+    if not input_nodes:
+        return []
+    source = input_nodes[0].id
+    
+    # Nodos alcanzables y sus entradas, en el orden de las conexiones
+    reachable = [source]
+    inputs = {source: []}
+    for node_id in reachable:
+        for next_id in successors(nodes, node_id):
+            if next_id not in inputs:
+                inputs[next_id] = []
+                reachable.append(next_id)
+            inputs[next_id].append(node_id)
+    
+    # Orden topológico (Kahn): lo que no llega a estar listo está en un ciclo
+    pending = {node_id: len(inputs[node_id]) for node_id in reachable}
+    order = [source]
+    for node_id in order:
+        for next_id in successors(nodes, node_id):
+            pending[next_id] -= 1
+            if pending[next_id] == 0:
+                order.append(next_id)
+    if len(order) < len(reachable):
+        raise GraphCycleError([node_id for node_id in reachable if pending[node_id] > 0])
+    
+    chain = []
+    for node_id in order[1:]:
+        node = nodes[node_id]
+        chain.append({
+            'id': node.id,
+            'type': node.type,
+            'params': node.params.copy(),
+            'inputs': [None if input_id == source else input_id
+                       for input_id in inputs[node_id]]
+        })
+    return chain
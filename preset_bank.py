@@ -0,0 +1,190 @@
+"""
+Banco de presets precompilados: cambiar de preset cuesta un límite de bloque
+"""
+import os
+import queue
+import threading
+from node_graph import build_processing_chain, graph_from_chain, graph_from_dicts, load_graph
+from presets import BUILTIN_PRESETS
+
+# Presets del usuario (.json guardados desde el editor)
+PRESET_DIR = os.path.join(os.path.expanduser('~'), '.voice_modifier', 'presets')
+USER_PREFIX = 'user:'
+
+
+class PresetBank:
+    """Planes de procesamiento listos para cada preset.
+
+    Un hilo en segundo plano compila cada preset (los predefinidos y los
+    .json de PRESET_DIR) en un ProcessingPlan para el formato del procesador
+    y lo ceba con un bloque de silencio (ProcessingPlan.prime): diseño de
+    filtros, núcleos JIT, buffers de mezcla y scratch quedan resueltos fuera
+    del hilo de audio. select solo publica el plan; el hilo de audio lo
+    recoge en el siguiente límite de bloque, con el fundido corto de
+    siempre (o con rampas si la estructura es la misma) y sin crear arrays.
+
+    Un plan se publica una sola vez (sus nodos se quedan con el estado del
+    stream), así que al usarlo se compila otro en segundo plano. Si no hay
+    plan listo, o es de otro formato (ver configure), select lo compila en
+    el hilo que llama, que nunca es el de audio.
+
+    Los grafos de los presets tienen ids fijos, los mismos que recibe el
+    editor con graph(): los sliders mueven los nodos del plan publicado sin
+    recompilar nada.
+    """
+
+    def __init__(self, processor, presets=BUILTIN_PRESETS, block_size=1024):
+        self.processor = processor
+        self.block_size = block_size
+        self._graphs = {}  # id -> nodos como dicts (AudioNode.to_dict)
+        self._plans = {}   # id -> (formato, plan sin estrenar)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()  # ids pendientes de compilar (None = parar)
+        self._thread = None
+        self.hits = 0      # select con el plan ya listo
+        self.misses = 0    # select que tuvo que compilar
+        self.errors = {}   # id -> último error al compilar en segundo plano
+        for preset_id, chain in presets.items():
+            self.add(preset_id, graph_from_chain(chain))
+        self._warm_crossfade()
+
+    def start(self):
+        """Arranca el hilo que compila los presets"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._compile_loop, name="preset-bank",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo (termina antes la compilación en curso)"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def wait(self):
+        """Espera a que no quede ningún preset por compilar (hilo arrancado)"""
+        self._queue.join()
+
+    def add(self, preset_id, nodes):
+        """Registra (o sustituye) un preset a partir de su grafo {id: AudioNode}"""
+        with self._lock:
+            self._graphs[preset_id] = [node.to_dict() for node in nodes.values()]
+            self._plans.pop(preset_id, None)
+        self._queue.put(preset_id)
+
+    def add_file(self, path):
+        """Registra un preset guardado desde el editor; devuelve su id"""
+        preset_id = USER_PREFIX + os.path.splitext(os.path.basename(path))[0]
+        self.add(preset_id, load_graph(path))
+        return preset_id
+
+    def load_folder(self, folder=PRESET_DIR):
+        """Registra los .json de la carpeta; devuelve sus ids"""
+        if not os.path.isdir(folder):
+            return []
+        preset_ids = []
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith('.json'):
+                try:
+                    preset_ids.append(self.add_file(os.path.join(folder, name)))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️ Preset ignorado {name}: {e}")
+        return preset_ids
+
+    @property
+    def preset_ids(self):
+        return list(self._graphs)
+
+    @property
+    def user_presets(self):
+        """Ids de los presets del usuario, en orden de registro"""
+        return [preset_id for preset_id in self._graphs if preset_id.startswith(USER_PREFIX)]
+
+    def graph(self, preset_id):
+        """Grafo nuevo del preset para el editor (con los ids del plan)"""
+        return graph_from_dicts(self._graphs[preset_id])
+
+    def chain(self, preset_id):
+        """Cadena compilable del preset"""
+        return build_processing_chain(self.graph(preset_id))
+
+    def configure(self, block_size=None):
+        """Rehace los planes para el formato actual del procesador.
+
+        Llamar tras AudioProcessor.configure o al cambiar el tamaño de bloque:
+        los planes anteriores ya no sirven (otra frecuencia, otros canales).
+        """
+        if block_size is not None:
+            self.block_size = block_size
+        self._warm_crossfade()
+        with self._lock:
+            self._plans.clear()
+            preset_ids = list(self._graphs)
+        for preset_id in preset_ids:
+            self._queue.put(preset_id)
+
+    def ready(self, preset_id):
+        """True si select(preset_id) no tiene que compilar"""
+        with self._lock:
+            entry = self._plans.get(preset_id)
+        return entry is not None and entry[0] == self._format()
+
+    def select(self, preset_id):
+        """Publica el plan del preset y devuelve su grafo para el editor.
+
+        Lanza ValueError (GraphCycleError incluido) si el preset no compila.
+        """
+        with self._lock:
+            entry = self._plans.pop(preset_id, None)
+        if entry is not None and entry[0] == self._format():
+            plan = entry[1]
+            self.hits += 1
+        else:
+            plan = self._build(self._graphs[preset_id])
+            self.misses += 1
+        self.processor.publish(plan)
+        # El plan publicado acumula estado: preparar otro para la próxima vez
+        self._queue.put(preset_id)
+        return self.graph(preset_id)
+
+    def stats(self):
+        with self._lock:
+            ready = sum(entry[0] == self._format() for entry in self._plans.values())
+        return {'presets': len(self._graphs), 'ready': ready,
+                'hits': self.hits, 'misses': self.misses}
+
+    def _format(self):
+        return (self.processor.sample_rate, self.processor.channels, self.block_size)
+
+    def _warm_crossfade(self):
+        """Reserva el buffer del fundido del procesador (con el stream parado)"""
+        self.processor.scratch.get('crossfade', self.block_size)
+
+    def _build(self, node_dicts):
+        plan = self.processor.compile_plan(build_processing_chain(graph_from_dicts(node_dicts)))
+        plan.prime(self.block_size)
+        return plan
+
+    def _compile_loop(self):
+        while True:
+            preset_id = self._queue.get()
+            try:
+                if preset_id is None:
+                    return
+                graph = self._graphs.get(preset_id)
+                if graph is not None and not self.ready(preset_id):
+                    # Formato y grafo se toman antes de compilar: si cambian a
+                    # mitad, el plan queda viejo y no se guarda o no se usa
+                    key = self._format()
+                    try:
+                        plan = self._build(graph)
+                    except Exception as e:
+                        self.errors[preset_id] = e
+                        continue
+                    self.errors.pop(preset_id, None)
+                    with self._lock:
+                        if self._graphs.get(preset_id) is graph:
+                            self._plans[preset_id] = (key, plan)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,47 @@
+"""
+Presets predefinidos: cadenas de efectos listas para AudioProcessor
+"""
+
+BUILTIN_PRESETS = {
+    "deep_voice": [
+        {"type": "pitch", "params": {"semitones": -5, "fine": 0}},
+        {"type": "equalizer", "params": {"low": 6, "mid": -2, "high": -4}},
+        {"type": "gain", "params": {"volume": 1.2}}
+    ],
+    "chipmunk": [
+        {"type": "pitch", "params": {"semitones": 7, "fine": 0}},
+        {"type": "equalizer", "params": {"low": -6, "mid": 2, "high": 4}},
+        {"type": "compressor", "params": {"threshold": -15, "ratio": 6, "attack": 0.001, "release": 0.05}}
+    ],
+    "robot": [
+        {"type": "pitch", "params": {"semitones": -2, "fine": 0}},
+        {"type": "distortion", "params": {"drive": 0.3, "tone": 0.3, "mix": 0.4}},
+        {"type": "echo", "params": {"delay": 0.1, "feedback": 0.3, "mix": 0.2}}
+    ],
+    "ghost": [
+        {"type": "pitch", "params": {"semitones": -8, "fine": 0}},
+        {"type": "reverb", "params": {"room_size": 0.9, "damping": 0.3, "mix": 0.7}},
+        {"type": "equalizer", "params": {"low": -8, "mid": 4, "high": -6}}
+    ],
+    "radio": [
+        {"type": "equalizer", "params": {"low": -10, "mid": 6, "high": -8}},
+        {"type": "distortion", "params": {"drive": 0.2, "tone": 0.4, "mix": 0.3}},
+        {"type": "compressor", "params": {"threshold": -20, "ratio": 8, "attack": 0.005, "release": 0.1}}
+    ],
+    "rockstar": [
+        {"type": "distortion", "params": {"drive": 0.6, "tone": 0.6, "mix": 0.5}},
+        {"type": "echo", "params": {"delay": 0.25, "feedback": 0.4, "mix": 0.3}},
+        {"type": "equalizer", "params": {"low": 4, "mid": 2, "high": 3}},
+        {"type": "gain", "params": {"volume": 1.3}}
+    ],
+    "underwater": [
+        {"type": "equalizer", "params": {"low": 8, "mid": -6, "high": -10}},
+        {"type": "reverb", "params": {"room_size": 0.8, "damping": 0.7, "mix": 0.6}},
+        {"type": "pitch", "params": {"semitones": -3, "fine": 0}}
+    ],
+    "8bit": [
+        {"type": "distortion", "params": {"drive": 0.8, "tone": 0.2, "mix": 0.7}},
+        {"type": "pitch", "params": {"semitones": 4, "fine": 0}},
+        {"type": "equalizer", "params": {"low": -4, "mid": 8, "high": -6}}
+    ]
+}
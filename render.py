@@ -0,0 +1,158 @@
+"""
+Render offline de presets sobre archivos WAV, sin interfaz gráfica
+Ejecuta: python render.py preset.json voz1.wav voz2.wav carpeta/ -o renders/
+
+Cada archivo se procesa por bloques (memoria acotada sin importar su
+duración) con el mismo AudioProcessor de la aplicación, y los archivos se
+reparten entre procesos para usar todos los núcleos. Las convoluciones
+usan particiones grandes (--partition): aquí la latencia no importa y
+cada partición cuesta menos por muestra. La latencia de la cadena se
+compensa, así que la salida queda alineada con la entrada. Antes de
+procesar, chain_optimizer.py quita los nodos sin efecto y funde las
+ganancias y ecualizadores contiguos (--no-optimize para desactivarlo).
+"""
+import argparse
+import os
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from audio_processor import AudioProcessor
+from chain_optimizer import optimize_chain
+from wav_io import decode, encode
+from node_graph import GraphCycleError, load_graph, build_processing_chain
+
+OFFLINE_PARTITION = 4096  # muestras por partición de las convoluciones
+
+
+def with_partition(chain, partition):
+    """Copia de la cadena con las convoluciones a `partition` muestras por partición"""
+    return [dict(effect, params=dict(effect.get('params') or {}, partition=partition))
+            if effect.get('type') == 'convolution' else effect
+            for effect in chain]
+
+
+def render_file(chain, input_path, output_path, block_size=4096, tail=0.0):
+    """Procesa un WAV por bloques y devuelve sus estadísticas de render.
+    
+    Todos los canales se procesan a la vez y la salida conserva el número
+    de canales de la entrada.
+    """
+    start = time.perf_counter()
+    
+    with wave.open(input_path, 'rb') as src:
+        channels = src.getnchannels()
+        sample_width = src.getsampwidth()
+        rate = src.getframerate()
+        frames = src.getnframes()
+        
+        processor = AudioProcessor(sample_rate=rate, channels=channels)
+        processor.set_chain(chain)
+        # Muestras de retraso de la cadena (convolución, sobremuestreo): se
+        # descartan al principio y se procesan otras tantas al final
+        latency = round(processor.get_latency() * rate)
+        
+        with wave.open(output_path, 'wb') as dst:
+            dst.setnchannels(channels)
+            dst.setsampwidth(2)
+            dst.setframerate(rate)
+            
+            # Tras el archivo, silencio para la cola de efectos (eco, reverb)
+            silence = np.zeros((block_size, channels), dtype=np.float32)
+            remaining = int(tail * rate) + latency
+            skip = latency
+            while True:
+                data = src.readframes(block_size)
+                if data:
+                    audio = decode(data, sample_width, channels)
+                elif remaining > 0:
+                    audio = silence[:min(block_size, remaining)]
+                    remaining -= len(audio)
+                else:
+                    break
+                output = processor.run(audio)
+                if skip:
+                    dropped = min(skip, len(output))
+                    output = output[dropped:]
+                    skip -= dropped
+                dst.writeframes(encode(output))
+    
+    elapsed = time.perf_counter() - start
+    duration = frames / rate
+    return {
+        'input': input_path,
+        'output': output_path,
+        'duration': duration,
+        'elapsed': elapsed,
+        'real_time_factor': elapsed / duration if duration else 0.0,
+    }
+
+
+def collect_inputs(paths):
+    """Expande carpetas a sus archivos .wav"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith('.wav'))
+        else:
+            files.append(path)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render offline de presets de Voice Modifier")
+    parser.add_argument('preset', help="Preset guardado desde el editor (.json)")
+    parser.add_argument('inputs', nargs='+', help="Archivos .wav o carpetas")
+    parser.add_argument('-o', '--output', default='renders', help="Carpeta de salida")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="Procesos en paralelo (por defecto, uno por núcleo)")
+    parser.add_argument('-b', '--block-size', type=int, default=4096,
+                        help="Muestras por bloque")
+    parser.add_argument('--tail', type=float, default=0.0,
+                        help="Segundos extra para la cola de eco/reverb")
+    parser.add_argument('--partition', type=int, default=OFFLINE_PARTITION,
+                        help="Muestras por partición de las reverbs por convolución")
+    parser.add_argument('--no-optimize', action='store_true',
+                        help="No quitar nodos sin efecto ni fundir etapas lineales")
+    args = parser.parse_args()
+    
+    try:
+        chain = build_processing_chain(load_graph(args.preset))
+    except GraphCycleError as e:
+        parser.error(str(e))
+    chain = with_partition(chain, args.partition)
+    if not args.no_optimize:
+        chain, report = optimize_chain(chain)
+        for line in report:
+            print(f"🧹 {line}")
+    inputs = collect_inputs(args.inputs)
+    os.makedirs(args.output, exist_ok=True)
+    
+    jobs = [(chain, path, os.path.join(args.output, os.path.basename(path)),
+             args.block_size, args.tail) for path in inputs]
+    
+    print(f"🎛️ {len(chain)} efectos | {len(jobs)} archivos | {args.jobs} procesos")
+    start = time.perf_counter()
+    total_audio = 0.0
+    
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(render_file, *job): job[1] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                stats = future.result()
+            except Exception as e:
+                print(f"❌ {futures[future]}: {e}")
+                continue
+            total_audio += stats['duration']
+            print(f"✅ {stats['output']}  {stats['duration']:.1f}s de audio en "
+                  f"{stats['elapsed']:.2f}s (RTF {stats['real_time_factor']:.3f})")
+    
+    elapsed = time.perf_counter() - start
+    if elapsed:
+        print(f"\n⏱️ {total_audio:.1f}s de audio en {elapsed:.1f}s "
+              f"({total_audio / elapsed:.1f}x tiempo real)")
+
+
+if __name__ == "__main__":
+    main()
@@ -41,6 +41,456 @@ try:
 except Exception as e:
     print(f"❌ audio_processor - ERROR: {e}")
 
+try:
+    import tracemalloc
+    from benchmark import traced_block
+    from presets import BUILTIN_PRESETS
+    
+    # Tras el calentamiento, un bloque no debe crear arrays nuevos: un bloque
+    # float32 de 8192 muestras ocupa 32 KB y el margen es la cuarta parte
+    # (lo que queda son objetos pequeños de Python: vistas, escalares).
+    # Muchas reservas pequeñas cabrían en ese margen, así que también se
+    # cuentan: las que numpy recicla entre bloques no pasan de unas decenas
+    BLOCK = 8192
+    LIMIT = BLOCK
+    ALLOC_LIMIT = 64
+    rng = np.random.default_rng(0)
+    
+    worst = {}
+    counts = {}
+    for channels in (1, 2):
+        indata = (rng.standard_normal((BLOCK, channels)) * 0.1).astype(np.float32)
+        outdata = np.zeros((BLOCK, channels), dtype=np.float32)
+        for preset_id, chain in BUILTIN_PRESETS.items():
+            processor = AudioProcessor(sample_rate=44100, channels=channels)
+            processor.set_chain(chain)
+            for _ in range(4):
+                processor.process_into(indata, outdata)
+            
+            key = f"{preset_id}/{channels}ch"
+            tracemalloc.start()
+            for _ in range(8):
+                peak, count = traced_block(lambda block: processor.process_into(block, outdata),
+                                           indata)
+                worst[key] = max(worst.get(key, 0), peak)
+                counts[key] = max(counts.get(key, 0), count)
+            tracemalloc.stop()
+    
+    over = {preset_id: peak for preset_id, peak in worst.items() if peak > LIMIT}
+    assert not over, f"reservas por bloque (bytes): {over}"
+    over = {preset_id: count for preset_id, count in counts.items() if count > ALLOC_LIMIT}
+    assert not over, f"asignaciones por bloque: {over}"
+    print(f"✅ procesamiento sin reservas - OK (máximo {max(worst.values())} bytes y "
+          f"{max(counts.values())} asignaciones por bloque)")
+except Exception as e:
+    print(f"❌ procesamiento sin reservas - ERROR: {e}")
+
+try:
+    import kernels
+    from presets import BUILTIN_PRESETS
+    
+    if not kernels.available():
+        print("ℹ️ numba - no instalado (opcional): se usa el camino NumPy")
+    else:
+        # Los núcleos JIT deben dar exactamente la misma salida que NumPy
+        rng = np.random.default_rng(1)
+        blocks = [(rng.standard_normal((256, 2)) * 0.1).astype(np.float32) for _ in range(16)]
+        different = []
+        previous = kernels.backend
+        for preset_id, chain in BUILTIN_PRESETS.items():
+            outputs = []
+            for backend in kernels.BACKENDS:
+                kernels.set_backend(backend)
+                processor = AudioProcessor(sample_rate=48000, channels=2)
+                processor.set_chain(chain)
+                outputs.append(np.concatenate([processor.run(block).copy() for block in blocks]))
+            if not np.array_equal(*outputs):
+                different.append(preset_id)
+        kernels.set_backend(previous)
+        assert not different, f"salida distinta en {different}"
+        print("✅ núcleos JIT (numba) - OK (idénticos al camino NumPy)")
+except Exception as e:
+    print(f"❌ núcleos JIT - ERROR: {e}")
+
+try:
+    from effects import FILTER_CACHE, FilterCache
+    from presets import BUILTIN_PRESETS
+    
+    # Volver a un preset ya diseñado no debe diseñar ningún filtro nuevo
+    FILTER_CACHE.clear()
+    processor = AudioProcessor(sample_rate=48000)
+    for preset_id in ("radio", "underwater", "radio"):
+        misses = FILTER_CACHE.misses
+        processor.set_chain(BUILTIN_PRESETS[preset_id])
+    assert FILTER_CACHE.misses == misses and FILTER_CACHE.hits > 0, FILTER_CACHE.stats()
+    
+    # Las rampas de set_param se diseñan al llamarlo: el DSP no consulta la caché
+    block = np.zeros((256, 1), dtype=np.float32)
+    processor.set_chain([{'type': 'equalizer', 'id': 'eq', 'params': {'low': 2}},
+                         {'type': 'distortion', 'id': 'dist', 'params': {'tone': 0.2}}])
+    processor.run(block)
+    processor.set_param('eq', 'low', -6)
+    processor.set_param('eq', 'high', 4)
+    processor.set_param('dist', 'tone', 0.8)
+    lookups = FILTER_CACHE.hits + FILTER_CACHE.misses
+    for _ in range(20):
+        processor.run(block)
+    assert FILTER_CACHE.hits + FILTER_CACHE.misses == lookups, FILTER_CACHE.stats()
+    assert processor.nodes[0].filter.key == ((-6.0, 0, 4.0), 48000), processor.nodes[0].filter.key
+    
+    small = FilterCache(maxsize=2)
+    for key in range(5):
+        small.get(key, lambda: np.zeros((1, 6)))
+    assert small.stats()['size'] == 2, small.stats()
+    print(f"✅ caché de filtros - OK ({FILTER_CACHE.stats()}, rampas diseñadas fuera del DSP)")
+except Exception as e:
+    print(f"❌ caché de filtros - ERROR: {e}")
+
+try:
+    import os
+    import tempfile
+    import wave
+    from effects import Convolution
+    from wav_io import encode
+    
+    # La convolución por particiones debe coincidir con la directa, retrasada una partición
+    rng = np.random.default_rng(2)
+    ir = (rng.standard_normal((3000, 1)) * np.exp(-np.arange(3000) / 600)[:, np.newaxis] * 0.5)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "ir.wav")
+        with wave.open(path, 'wb') as dst:
+            dst.setnchannels(1)
+            dst.setsampwidth(2)
+            dst.setframerate(48000)
+            dst.writeframes(encode(ir))
+        node = Convolution({'ir': path, 'mix': 1.0, 'partition': 256}, 48000, 2)
+        # Sin partición fija se usa la del bloque del stream
+        auto = AudioProcessor(sample_rate=48000, block_size=512)
+        auto_latency = auto.compile_plan([{'type': 'convolution', 'params': {'ir': path}}]).latency
+    
+    x = (rng.standard_normal((4000, 2)) * 0.1).astype(np.float32)
+    out = np.concatenate([node.process(x[i:i + 300]).copy() for i in range(0, len(x), 300)])
+    h = np.clip(ir[:, 0] * 32768, -32768, 32767).astype(np.int16) / 32768  # como encode()
+    h /= np.sqrt((h ** 2).sum())
+    expected = np.stack([np.convolve(x[:, c], h)[:len(x) - 256] for c in range(2)], axis=1)
+    error = np.abs(out[256:] - expected).max()
+    assert node.latency == 256 and error < 1e-5, f"latencia {node.latency}, error {error}"
+    assert auto_latency == 512, f"partición automática de {auto_latency} con bloques de 512"
+    print(f"✅ convolución - OK (error {error:.1e})")
+except Exception as e:
+    print(f"❌ convolución - ERROR: {e}")
+
+try:
+    import tracemalloc
+    from benchmark import traced_block
+    from preset_bank import PresetBank
+    
+    # Con los planes ya compilados, cambiar de preset en pleno stream se
+    # resuelve en un límite de bloque y sin reservar arrays (mismo margen
+    # que el procesamiento sin reservas). Igual al pasar a una variante con
+    # la misma estructura (rampas en vez de fundido) y al mover un slider
+    BLOCK = 8192
+    ALLOC_LIMIT = 64
+    processor = AudioProcessor(sample_rate=44100)
+    bank = PresetBank(processor, block_size=BLOCK)
+    presets = bank.preset_ids
+    for preset_id in presets:
+        graph = bank.graph(preset_id)
+        for node in graph.values():
+            node.params = {name: value * 0.8 if type(value) in (int, float) else value
+                           for name, value in node.params.items()}
+        bank.add(f'{preset_id}:variante', graph)
+    bank.start()
+    bank.wait()
+    bank.stop()  # sin reposiciones en segundo plano durante la medida
+    indata = (np.random.default_rng(3).standard_normal((BLOCK, 1)) * 0.1).astype(np.float32)
+    outdata = np.zeros_like(indata)
+    for _ in range(2):
+        processor.process_into(indata, outdata)
+    
+    worst = allocations = 0
+    
+    def measure():
+        global worst, allocations
+        tracemalloc.start()
+        for _ in range(4):
+            peak, count = traced_block(lambda block: processor.process_into(block, outdata),
+                                       indata)
+            worst = max(worst, peak)
+            allocations = max(allocations, count)
+        tracemalloc.stop()
+    
+    for preset_id in presets:
+        structures = []
+        for selected in (preset_id, f'{preset_id}:variante'):
+            graph = bank.select(selected)
+            plan = processor._published
+            structures.append(plan.structure)
+            measure()
+            assert processor._active is plan, f"{selected}: el plan no entró en un bloque"
+            assert set(plan.by_id) <= set(graph), f"{selected}: ids distintos a los del editor"
+        assert structures[0] == structures[1], f"{preset_id}: la variante no entró con rampas"
+        node_id, name, value = next((node.id, name, value) for node in graph.values()
+                                    for name, value in node.params.items()
+                                    if type(value) in (int, float) and value)
+        processor.set_param(node_id, name, value / 0.8)
+        measure()
+    assert worst <= BLOCK and allocations <= ALLOC_LIMIT and bank.misses == 0, \
+        f"{worst} bytes, {allocations} asignaciones, {bank.stats()}"
+    print(f"✅ banco de presets - OK (máximo {worst} bytes y {allocations} asignaciones "
+          f"por bloque al cambiar o mover un parámetro)")
+except Exception as e:
+    print(f"❌ banco de presets - ERROR: {e}")
+
+try:
+    # Misma estructura con otros valores: sin fundido, pero con las rampas
+    # de set_param (el volumen no salta de un bloque al siguiente)
+    processor = AudioProcessor(sample_rate=48000)
+    processor.set_chain([{'type': 'gain', 'id': 'g', 'params': {'volume': 1.0}}])
+    block = np.full((256, 1), 0.5, dtype=np.float32)
+    previous = processor.run(block)[-1, 0]
+    processor.set_chain([{'type': 'gain', 'id': 'g', 'params': {'volume': 0.2}}])
+    out = np.concatenate([processor.run(block).copy() for _ in range(8)])[:, 0]
+    step = np.abs(np.diff(np.concatenate([[previous], out]))).max()
+    assert processor._fading is None and np.isclose(out[-1], 0.1) and step < 0.01, \
+        f"salto {step}, final {out[-1]}"
+    print(f"✅ cambio con la misma estructura - OK (salto máximo {step:.1e})")
+except Exception as e:
+    print(f"❌ cambio con la misma estructura - ERROR: {e}")
+
+try:
+    # set_param queda en la cadena: recompilar (configure) no deshace los sliders
+    chain = [{'type': 'gain', 'id': 'g', 'params': {'volume': 1.0}}]
+    processor = AudioProcessor(sample_rate=48000)
+    processor.set_chain(chain)
+    processor.set_param('g', 'volume', 0.2)
+    block = np.full((256, 1), 0.5, dtype=np.float32)
+    for _ in range(8):
+        processor.run(block)
+    processor.configure(block_size=1024)
+    out = processor.run(block)
+    assert np.allclose(out, 0.1), f"tras configure: {out[-1, 0]} (esperado 0.1)"
+    assert chain[0]['params']['volume'] == 1.0, "set_param modificó la cadena original"
+    print("✅ parámetros tras recompilar - OK")
+except Exception as e:
+    print(f"❌ parámetros tras recompilar - ERROR: {e}")
+
+try:
+    from effects import Echo, PitchShift
+    
+    # Los apply_* por bloques suenan como el efecto sobre toda la señal:
+    # conservan la cola del eco y el solape del pitch entre llamadas
+    processor = AudioProcessor(sample_rate=48000)
+    audio = (np.random.default_rng(4).standard_normal(24000) * 0.1).astype(np.float32)
+    error = 0.0
+    for apply, effect_class, params in ((processor.apply_echo, Echo, {'delay': 0.2}),
+                                        (processor.apply_pitch, PitchShift, {'semitones': 5})):
+        out = np.concatenate([apply(audio[i:i + 512], params).copy()
+                              for i in range(0, len(audio), 512)])
+        error = max(error, np.abs(out - effect_class(params, 48000).process(audio)).max())
+    assert error < 1e-6, f"error {error}"
+    print(f"✅ efectos sueltos por bloques - OK (error {error:.1e})")
+except Exception as e:
+    print(f"❌ efectos sueltos por bloques - ERROR: {e}")
+
+try:
+    from chain_optimizer import optimize_chain, compare_chains
+    
+    # Nodos sin efecto fuera y ganancia -> EQ -> ganancia en una cascada,
+    # sonando igual que la cadena original salvo redondeos de float32
+    chain = [
+        {'id': 'g1', 'type': 'gain', 'params': {'volume': 0.5}, 'inputs': [None]},
+        {'id': 'eq', 'type': 'equalizer', 'params': {'low': 4, 'mid': 0, 'high': -3}, 'inputs': ['g1']},
+        {'id': 'g2', 'type': 'gain', 'params': {'volume': 1.6}, 'inputs': ['eq']},
+        {'id': 'p0', 'type': 'pitch', 'params': {'semitones': 0, 'fine': 0}, 'inputs': ['g2']},
+        {'id': 'echo', 'type': 'echo', 'params': {'delay': 0.05, 'mix': 0.4}, 'inputs': ['p0']},
+        {'id': 'rev', 'type': 'reverb', 'params': {'mix': 0}, 'inputs': ['p0']},
+        {'id': 'unit', 'type': 'gain', 'params': {'volume': 1.0}, 'inputs': ['echo', 'rev']},
+        {'id': 'out', 'type': 'output', 'params': {}, 'inputs': ['unit']},
+    ]
+    optimized, report = optimize_chain(chain)
+    types = [effect['type'] for effect in optimized]
+    assert types == ['linear', 'echo', 'gain', 'output'], f"{types} {report}"
+    error = max(compare_chains(chain, optimized, 48000, channels) for channels in (1, 2))
+    assert error < 1e-5, f"error {error}"
+    print(f"✅ optimizador de cadenas - OK ({len(report)} cambios, error {error:.1e})")
+except Exception as e:
+    print(f"❌ optimizador de cadenas - ERROR: {e}")
+
+try:
+    from node_graph import AudioNode, GraphCycleError, build_processing_chain, would_create_cycle
+    
+    def graph(*links, **params):
+        nodes = {node_id: AudioNode(node_id, 'gain' if node_id.startswith('g') else node_id,
+                                    0, 0, params.get(node_id, {'volume': 1.0}))
+                 for node_id in {node_id for link in links for node_id in link}}
+        for from_id, to_id in links:
+            nodes[from_id].connections.append(to_id)
+        return nodes
+    
+    # Dos ramas que llegan a la salida se mezclan con su media
+    nodes = graph(('input', 'g1'), ('input', 'g2'), ('g1', 'output'), ('g2', 'output'),
+                  g2={'volume': 0.5})
+    processor = AudioProcessor(sample_rate=48000)
+    processor.set_chain(build_processing_chain(nodes))
+    block = np.full((256, 1), 0.4, dtype=np.float32)
+    mixed = processor.run(block)
+    assert np.allclose(mixed, 0.3), f"mezcla {mixed[0, 0]} (esperado 0.3)"
+    
+    # Un ciclo se detecta al conectar y, si llega a guardarse, al compilar
+    nodes = graph(('input', 'g1'), ('g1', 'g2'), ('g2', 'output'))
+    assert would_create_cycle(nodes, 'g2', 'g1'), "no detecta el ciclo al conectar"
+    nodes['g2'].connections.append('g1')
+    try:
+        build_processing_chain(nodes)
+        raise AssertionError("un grafo con ciclo compila")
+    except GraphCycleError as cycle:
+        assert {'g1', 'g2'} <= set(cycle.node_ids), f"nodos del ciclo: {cycle.node_ids}"
+    print("✅ grafo del editor - OK (mezcla por media y ciclos detectados)")
+except Exception as e:
+    print(f"❌ grafo del editor - ERROR: {e}")
+
+try:
+    import os
+    import tempfile
+    import wave
+    from render import render_file
+    from wav_io import encode
+    
+    # El render compensa la latencia (sobremuestreo de la distorsión): la
+    # salida dura lo mismo que la entrada, más la cola pedida
+    chain = [{'type': 'distortion', 'params': {'oversample': 4}},
+             {'type': 'echo', 'params': {'delay': 0.05}}]
+    frames = 10000
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "in.wav")
+        with wave.open(source, 'wb') as dst:
+            dst.setnchannels(2)
+            dst.setsampwidth(2)
+            dst.setframerate(48000)
+            dst.writeframes(encode(np.random.default_rng(5).standard_normal((frames, 2)) * 0.1))
+        lengths = []
+        for tail in (0.0, 0.25):
+            target = os.path.join(folder, f"out_{tail}.wav")
+            render_file(chain, source, target, block_size=4096, tail=tail)
+            with wave.open(target, 'rb') as src:
+                lengths.append((src.getnframes(), src.getnchannels()))
+    assert lengths == [(frames, 2), (frames + 12000, 2)], f"(frames, canales): {lengths}"
+    print("✅ render - OK (misma duración que la entrada)")
+except Exception as e:
+    print(f"❌ render - ERROR: {e}")
+
+try:
+    import time
+    from dsp_worker import DSPWorker
+    
+    # Una excepción en el DSP se registra y el bloque sale sin procesar:
+    # el hilo sigue vivo y la salida no se queda en silencio
+    processor = AudioProcessor(sample_rate=44100)
+    worker = DSPWorker(processor, 256, margin=1)
+    failures = iter([False, True, False, False])
+    run = processor.run
+    processor.run = lambda block: (_ for _ in ()).throw(RuntimeError("fallo")) \
+        if next(failures, False) else run(block)
+    worker.start()
+    block = np.full((256, 1), 0.25, dtype=np.float32)
+    out = np.zeros_like(block)
+    for _ in range(6):
+        worker.process_into(block, out)
+        time.sleep(0.02)
+    alive = worker._thread.is_alive()
+    worker.stop()
+    assert alive and worker.stats.errors == 1, f"vivo {alive}, errores {worker.stats.errors}"
+    assert "Error en el DSP" in worker.summary() and np.allclose(out, 0.25), worker.summary()
+    print("✅ hilo DSP ante errores - OK (error registrado, el audio sigue)")
+except Exception as e:
+    print(f"❌ hilo DSP ante errores - ERROR: {e}")
+
+try:
+    import subprocess
+    import sys
+    
+    # El motor y headless.py --check no deben arrastrar Tk, el backend de
+    # audio ni scipy.signal (se importa al diseñar el primer filtro)
+    code = ("import sys, audio_processor, dsp_process, dsp_engine, headless; "
+            "print(','.join(m for m in ('tkinter', 'sounddevice', 'pyaudio', 'scipy.signal', "
+            "'numba') if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            check=True).stdout.strip()
+    assert not loaded, f"importa al cargar: {loaded}"
+    print("✅ motor sin interfaz - OK (sin Tk, backend de audio ni scipy.signal)")
+except Exception as e:
+    print(f"❌ motor sin interfaz - ERROR: {e}")
+
+try:
+    import time
+    from dsp_process import DSPProcess
+    
+    # Stream y DSP en el proceso del motor, sobre un reloj sin dispositivo
+    processor = AudioProcessor(sample_rate=48000)
+    processor.set_chain(BUILTIN_PRESETS['robot'])
+    engine = DSPProcess(processor, 256, backend='clock')
+    engine.start()
+    try:
+        engine.set_chain(BUILTIN_PRESETS['deep_voice'] +
+                         [{'type': 'gain', 'id': 'g', 'params': {'volume': 1.0}}])
+        engine.set_param('g', 'volume', 0.3)
+        time.sleep(1.0)
+        snapshot = engine.snapshot()
+    finally:
+        engine.stop()
+    assert snapshot is not None and snapshot['callback']['callbacks'] > 100, snapshot
+    # El próximo arranque parte de processor.chain: con el valor del slider
+    restarted = {effect.get('id'): effect['params'] for effect in processor.chain}
+    assert restarted['g']['volume'] == 0.3, restarted
+    assert not snapshot['callback']['errors'], snapshot['callback']['last_error']
+    print(f"✅ proceso DSP - OK ({snapshot['callback']['callbacks']} callbacks en el motor)")
+except Exception as e:
+    print(f"❌ proceso DSP - ERROR: {e}")
+
+try:
+    import threading
+    import time
+    from dsp_process import DSPProcess, MessageRing
+    
+    # Con la cola de control llena, set_param espera a que el motor la vacíe;
+    # sin motor que la vacíe avisa, en vez de perder el mensaje
+    engine = DSPProcess(AudioProcessor(sample_rate=48000), 256)
+    engine.control = MessageRing(256)
+    try:
+        queued = 0
+        while engine.control.send(('param', 'g', 'volume', 1.0)):
+            queued += 1
+        
+        def drain():
+            time.sleep(0.05)
+            for _ in range(queued):
+                engine.control.receive()
+            time.sleep(0.2)
+        
+        engine._process = threading.Thread(target=drain)  # hace de motor
+        engine._process.start()
+        engine.set_param('g', 'volume', 0.5)
+        engine._process.join()
+        received = engine.control.receive()
+        assert received == ('param', 'g', 'volume', 0.5), received
+        
+        while engine.control.send(('param', 'g', 'volume', 1.0)):
+            pass
+        engine._process = None
+        try:
+            engine.set_param('g', 'volume', 0.25)
+            reported = False
+        except RuntimeError:
+            reported = True
+        assert reported, "set_param perdió el mensaje sin avisar"
+    finally:
+        engine._process = None
+        engine.control.close(unlink=True)
+    print(f"✅ cola de control llena - OK ({queued} mensajes; espera y avisa)")
+except Exception as e:
+    print(f"❌ cola de control llena - ERROR: {e}")
+
 print("\n" + "="*50)
 print("Resumen:")
 print("="*50)
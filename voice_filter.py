@@ -4,6 +4,7 @@ from scipy import signal
 import tkinter as tk
 from tkinter import ttk
 import threading
+from effects import PitchShift
 
 class VoiceFilter:
     def __init__(self):
@@ -14,19 +15,31 @@ class VoiceFilter:
         self.running = False
         self.filter_type = "normal"
         self.pitch_shift = 1.0
+        # Pitch shifters en streaming, uno por factor
+        self.pitch_shifters = {}
         
         self.p = pyaudio.PyAudio()
         self.stream = None
+    
+    def set_format(self, rate, chunk):
+        """Cambia frecuencia y frames por bloque (con el stream parado).
+        
+        Los pitch shifters dependen de la frecuencia: se recrean al usarse.
+        """
+        self.RATE = rate
+        self.CHUNK = chunk
+        self.pitch_shifters = {}
         
     def apply_pitch_shift(self, audio_data, shift_factor):
-        """Cambia el tono de la voz"""
+        """Cambia el tono de la voz conservando la longitud del bloque"""
         if shift_factor == 1.0:
             return audio_data
         
-        # Resample para cambiar el pitch
-        indices = np.round(np.arange(0, len(audio_data), shift_factor))
-        indices = indices[indices < len(audio_data)].astype(int)
-        return audio_data[indices]
+        shifter = self.pitch_shifters.get(shift_factor)
+        if shifter is None:
+            shifter = PitchShift({'semitones': 12 * np.log2(shift_factor)}, self.RATE)
+            self.pitch_shifters[shift_factor] = shifter
+        return shifter.process(audio_data)
     
     def apply_deep_voice(self, audio_data):
         """Aplica efecto de voz grave"""
@@ -0,0 +1,73 @@
+"""
+Conversión entre frames WAV y bloques float32 (render offline y respuestas al impulso)
+"""
+import struct
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def decode(data, sample_width, channels):
+    """Convierte frames PCM (8/16/24/32 bits) a float32 (frames, canales) en escala 1.0"""
+    if sample_width == 1:
+        audio = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        audio = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        audio = values.astype(np.float32) / 8388608
+    elif sample_width == 4:
+        audio = np.frombuffer(data, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Ancho de muestra no soportado: {sample_width} bytes")
+
+    return audio.reshape(-1, channels)
+
+
+def encode(audio):
+    """Convierte float32 (frames, canales) en escala 1.0 a frames PCM de 16 bits"""
+    return np.clip(audio * 32768, -32768, 32767).astype('<i2').tobytes()
+
+
+def read_wav(path):
+    """Lee un WAV entero: (float32 (frames, canales), frecuencia).
+
+    Acepta PCM de 8 a 32 bits y float de 32/64 bits, el formato habitual
+    de las respuestas al impulso (el módulo wave solo lee PCM).
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError("No es un archivo WAV")
+
+    fmt = samples = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk = data[pos:pos + 4]
+        size = int.from_bytes(data[pos + 4:pos + 8], 'little')
+        if chunk == b'fmt ':
+            fmt = data[pos + 8:pos + 8 + size]
+        elif chunk == b'data':
+            samples = data[pos + 8:pos + 8 + size]
+        pos += 8 + size + (size & 1)  # los bloques van alineados a 2 bytes
+    if fmt is None or samples is None:
+        raise ValueError("WAV sin bloques 'fmt ' o 'data'")
+
+    tag, channels, rate = struct.unpack('<HHI', fmt[:8])
+    bits = struct.unpack('<H', fmt[14:16])[0]
+    if tag == WAVE_FORMAT_EXTENSIBLE:
+        tag = struct.unpack('<H', fmt[24:26])[0]
+    width = bits // 8
+    samples = samples[:len(samples) - len(samples) % (width * channels)]
+
+    if tag == WAVE_FORMAT_PCM:
+        audio = decode(samples, width, channels)
+    elif tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        audio = np.frombuffer(samples, dtype=f'<f{width}').astype(np.float32).reshape(-1, channels)
+    else:
+        raise ValueError(f"Formato WAV no soportado (formato {tag}, {bits} bits)")
+    return audio, rate